@@ -1,92 +1,183 @@
 
 
+import asyncio
+import functools
 import os
 import logging
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.controllers.conversation_controller import get_conversation
-from app.tools import db_tools
+from app.controllers.conversation_context import ConversationContext
+from app.services.llm_scheduler import llm_scheduler, LLMUnavailable, LLM_TIMEOUT_S, PURPOSE_PRIORITIES
+from app.controllers.context_builder import ContextBuilder, estimate_tokens, llm_usage
+from app.tools import db_tools, async_db_tools
+from app.tools.projections import compact
+from app.utils.entity_extractor import EntityExtractor
+from app.utils.logger import logger, log_body
+from app.utils.metrics import timed, record_llm_call, TOOL_CALLS, TURN_ROUTES
+from app.utils.single_flight import SingleFlight
 import re
 
-# Set up logger
-logger = logging.getLogger("think41_chatbot")
-logger.setLevel(logging.INFO)
-if not logger.hasHandlers():
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+# Load environment variables from .env file
+load_dotenv()
+GOOGLE_GEMINI_API_KEY = os.getenv("GOOGLE_GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 
+# Identical concurrent tool lookups (same tool and params) and identical LLM prompts
+# share one in-flight call; see app/utils/single_flight.py
+TOOL_SINGLE_FLIGHT = os.getenv("TOOL_SINGLE_FLIGHT", "1") == "1"
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "1") == "1"
 
+# How a successful tool result is turned into the reply:
+#   template        - format_tool_result only, no LLM call
+#   template_polish - reply with the template now, rewrite the stored message with an LLM summary after the response
+#   llm             - llm_summarize_tool_result (second LLM round trip)
+# Override with TOOL_RESPONSE_MODES="query_order_by_id=llm,query_product_by_name=template"
+RESPONSE_MODES = ("template", "template_polish", "llm")
+TOOL_RESPONSE_MODES = {
+    "query_order_by_id": "template",
+    "query_distribution_center": "template",
+    "query_order_items": "template",
+    "query_order_summary": "template",
+    "query_inventory_by_product_id": "template_polish",
+    "query_product_stock": "template",
+    "query_product_average_cost": "template",
+    "query_product_by_name": "template_polish",
+    "search_products": "template",
+    "query_nearest_distribution_center": "template",
+    "query_user_by_email": "template_polish",
+}
 
+def load_response_modes():
+    modes = dict(TOOL_RESPONSE_MODES)
+    for item in filter(None, os.getenv("TOOL_RESPONSE_MODES", "").split(",")):
+        tool_name, _, mode = item.partition("=")
+        if mode.strip() in RESPONSE_MODES:
+            modes[tool_name.strip()] = mode.strip()
+        else:
+            logger.warning("Ignoring unknown response mode in TOOL_RESPONSE_MODES: %s", item)
+    return modes
 
 
-# Load environment variables from .env file
-load_dotenv()
-GOOGLE_GEMINI_API_KEY = os.getenv("GOOGLE_GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-
 class Think41ChatBot:
     def __init__(self):
+        # LangChain and the Gemini client are slow to import; only load them when the
+        # chatbot is built (at app startup), not when this module is imported
+        from langchain_google_genai import ChatGoogleGenerativeAI
         self.llm = ChatGoogleGenerativeAI(
             model="gemini-1.5-flash",
             google_api_key=GOOGLE_GEMINI_API_KEY,
             temperature=0.2,
+            # Retries and deadlines are handled by llm_scheduler
+            max_retries=0,
+            timeout=LLM_TIMEOUT_S,
         )
+        self.entity_extractor = EntityExtractor()
+        self.context_builder = ContextBuilder(self.llm, self.entity_extractor)
+        self.response_modes = load_response_modes()
+        self.tool_flight = SingleFlight("tool")
+        self.llm_flight = SingleFlight("llm")
+        self.response_stats = {
+            "template": 0,
+            "template_polish": 0,
+            "llm": 0,
+            "llm_calls_saved": 0,
+            "llm_calls_deferred": 0,
+            "prompt_tokens_saved": 0,
+        }
         self.tools = {
             "query_order_by_id": {
                 "pattern": r"(?:order|status).*?(?:id|ID)[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query order details by order ID",
-                "function": db_tools.query_orders_by_order_id
+                "function": db_tools.query_orders_by_order_id,
+                "async_function": async_db_tools.query_orders_by_order_id
             },
             "query_orders_by_user_id": {
                 "pattern": r"orders?.*?user[\s_]?id[\s:]*([A-Za-z0-9-]+)",
-                "description": "Query all orders by user ID",
-                "function": db_tools.query_orders_by_user_id
+                "description": "Query a user's most recent orders, a page at a time, or their order counts per status",
+                "function": db_tools.query_orders_by_user_id,
+                "async_function": async_db_tools.query_orders_by_user_id
             },
             "query_product_by_id": {
                 "pattern": r"product.*?id[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query product details by product ID",
-                "function": db_tools.query_product_by_id
+                "function": db_tools.query_product_by_id,
+                "async_function": async_db_tools.query_product_by_id
             },
             "query_product_by_name": {
                 "pattern": r"product.*?name[\s:]*['\"]?([^'\"]+)['\"]?",
                 "description": "Query product details by product name",
-                "function": db_tools.query_products_by_name
+                "function": db_tools.query_products_by_name,
+                "async_function": async_db_tools.query_products_by_name
+            },
+            "search_products": {
+                "pattern": r"(?:search|find|looking for).*?products?[\s:]*['\"]?([^'\"]+)['\"]?",
+                "description": "Search products by (part of a) name, optionally filtered by brand, category and department",
+                "function": db_tools.search_products,
+                "async_function": async_db_tools.search_products
             },
             "query_user_by_id": {
                 "pattern": r"user.*?id[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query user details by user ID",
-                "function": db_tools.query_user_by_id
+                "function": db_tools.query_user_by_id,
+                "async_function": async_db_tools.query_user_by_id
             },
             "query_user_by_email": {
                 "pattern": r"user.*?email[\s:]*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
                 "description": "Query user details by email address",
-                "function": db_tools.query_user_by_email
+                "function": db_tools.query_user_by_email,
+                "async_function": async_db_tools.query_user_by_email
             },
             "query_inventory_by_product_id": {
                 "pattern": r"(?:inventory|stock).*?product[\s_]?id[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query inventory by product ID",
-                "function": db_tools.query_inventory_by_product_id
+                "function": db_tools.query_inventory_by_product_id,
+                "async_function": async_db_tools.query_inventory_by_product_id
+            },
+            "query_product_stock": {
+                "pattern": r"(?:how\s+many|in\s+stock|which\s+(?:distribution|warehouse|dc)).*?product[\s_]?id[\s:]*([A-Za-z0-9-]+)",
+                "description": "Count the units of a product in stock and the distribution centers holding them, by product ID",
+                "function": db_tools.query_product_stock,
+                "async_function": async_db_tools.query_product_stock
+            },
+            "query_product_average_cost": {
+                "pattern": r"average\s+cost.*?product[\s_]?id[\s:]*([A-Za-z0-9-]+)",
+                "description": "Average cost of a product's inventory items, overall and of those in stock, by product ID",
+                "function": db_tools.query_product_stock,
+                "async_function": async_db_tools.query_product_stock
             },
             "query_inventory_item_by_id": {
                 "pattern": r"inventory.*?item.*?id[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query inventory item by item ID",
-                "function": db_tools.query_inventory_item_by_id
+                "function": db_tools.query_inventory_item_by_id,
+                "async_function": async_db_tools.query_inventory_item_by_id
             },
             "query_distribution_center": {
                 "pattern": r"(?:distribution|dc).*?(?:center|id)[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query distribution center details",
-                "function": db_tools.query_distribution_center_by_id
+                "function": db_tools.query_distribution_center_by_id,
+                "async_function": async_db_tools.query_distribution_center_by_id
+            },
+            "query_nearest_distribution_center": {
+                "pattern": r"(?:nearest|closest).*?(?:distribution|warehouse|dc).*?user[\s_]?id[\s:]*([A-Za-z0-9-]+)",
+                "description": "Find the distribution center nearest to a user (by user ID) or to a latitude and longitude, with distances",
+                "function": db_tools.query_nearest_distribution_center,
+                "async_function": async_db_tools.query_nearest_distribution_center
             },
             "query_order_items": {
                 "pattern": r"order.*?items.*?order[\s_]?id[\s:]*([A-Za-z0-9-]+).*?user[\s_]?id[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query order items by order ID and user ID",
-                "function": lambda oid, uid: db_tools.query_order_items_by_order_and_user(oid, uid)
+                "function": db_tools.query_order_items_by_order_and_user,
+                "async_function": async_db_tools.query_order_items_by_order_and_user
             },
             "query_order_item_by_id": {
                 "pattern": r"order.*?item.*?id[\s:]*([A-Za-z0-9-]+)",
                 "description": "Query order item by item ID",
-                "function": db_tools.query_order_item_by_id
+                "function": db_tools.query_order_item_by_id,
+                "async_function": async_db_tools.query_order_item_by_id
+            },
+            "query_order_summary": {
+                "pattern": r"order.*?(?:summary|contents?|details).*?(?:id|ID)[\s:]*([A-Za-z0-9-]+)",
+                "description": "Query an order with its items, their products and distribution centers by order ID",
+                "function": db_tools.query_order_summary,
+                "async_function": async_db_tools.query_order_summary
             }
         }
 
@@ -102,17 +193,30 @@ TOOL_CALL: [exact_tool_name] [parameters_separated_by_spaces]
 
 TOOL_CALL format examples:
 - TOOL_CALL: query_order_by_id 12345
+- TOOL_CALL: query_order_summary 12345
 - TOOL_CALL: query_product_by_name Nike Air Max
+- TOOL_CALL: search_products running shorts | brand=Nike | department=Men
 - TOOL_CALL: query_user_by_email john@email.com
 - TOOL_CALL: query_order_items 12345 67890
+- TOOL_CALL: query_orders_by_user_id 67890
+- TOOL_CALL: query_orders_by_user_id 67890 | summary
+- TOOL_CALL: query_product_stock 1234
+- TOOL_CALL: query_nearest_distribution_center 67890
+- TOOL_CALL: query_nearest_distribution_center 40.71 -74.01
 
 Available tool names (use these exactly):
 query_order_by_id
+query_order_summary
 query_product_by_name
+search_products (optional filters: brand=, category=, department=, separated by |)
 query_user_by_email
 query_inventory_by_product_id
+query_product_stock (units in stock and which distribution centers have them)
+query_product_average_cost
 query_distribution_center
+query_nearest_distribution_center (a user ID, or a latitude and longitude)
 query_order_items
+query_orders_by_user_id (most recent orders; add "| summary" for counts per status, "| before=<next_before>" for older orders)
 
 If you do not have enough information, ask the user for only the missing details. If you cannot find specific information, suggest alternative ways the user can get help.
 
@@ -120,20 +224,43 @@ Be friendly, helpful, and always refer to the company as Think41.
 """
         )
 
+    def get_context(self, user_id, conversation_id, ctx=None):
+        # Reuse the request's context when one is passed in, otherwise load it
+        return ctx or ConversationContext.load(user_id, conversation_id)
+
+    async def get_context_async(self, user_id, conversation_id, ctx=None):
+        return ctx or await ConversationContext.load_async(user_id, conversation_id)
+
     def get_conversation_history(self, user_id, conversation_id):
-        history = ""
-        if user_id and conversation_id:
-            conv = get_conversation(user_id, conversation_id)
-            if conv and "messages" in conv:
-                for msg in conv["messages"]:
-                    history += f"{msg['sender'].capitalize()}: {msg['text']}\n"
-        return history
+        return self.get_context(user_id, conversation_id).history
+
+    def build_prompt(self, message, history):
+        return f"{self.get_system_instruction()}\nConversation so far:\n{history}\nUser: {message}"
+
+    def build_summary_prompt(self, result, history, tool_name=None):
+        # Compose a prompt for the LLM to summarize the tool result in a conversational way
+        system_instruction = (
+            "You are Think41's AI customer service assistant. "
+            "Given the following database information, explain it to the user in a friendly, clear, and helpful way. "
+            "Do not show raw JSON or technical details. Use natural language and only the relevant facts."
+        )
+        return (
+            f"{system_instruction}\n"
+            f"Conversation so far:\n{history}"
+            f"\nDatabase info: {self.compact_result(tool_name, result)}\n"
+            f"User: Please explain the above info."
+        )
+
+    def compact_result(self, tool_name, result):
+        # Prompt text of a tool result: only the fields the answer needs, as key=value pairs
+        tool = self.tools.get(tool_name)
+        return compact(result, getattr(tool["function"], "collection", None) if tool else None)
 
     def parse_tool_call(self, response_text):
         # Improved regex and parameter handling
         match = re.search(r"TOOL_CALL:\s*(\w+)(?:\s+(.+))?", response_text)
         if not match:
-            logger.warning(f"Malformed TOOL_CALL: {response_text}")
+            log_body("Malformed TOOL_CALL: %s", response_text, level=logging.WARNING)
             return None, []
         tool_name = match.group(1)
         params_str = match.group(2) or ""
@@ -144,117 +271,239 @@ Be friendly, helpful, and always refer to the company as Think41.
         elif tool_name == "query_product_by_name":
             # Product name may contain spaces, take the whole string
             params = [params_str.strip()] if params_str else []
+        elif tool_name == "search_products":
+            # "<query> | brand=... | department=..."
+            params = [part.strip() for part in params_str.split("|") if part.strip()]
+        elif tool_name == "query_orders_by_user_id":
+            # "<user_id> | summary" or "<user_id> | limit=5 | before=<next_before>"
+            parts = params_str.split("|")
+            params = parts[0].split() + [part.strip() for part in parts[1:] if part.strip()]
+        elif tool_name == "query_nearest_distribution_center":
+            # "<user_id>" or "<latitude> <longitude>" (a comma between them is fine)
+            params = params_str.replace(",", " ").split()
         elif tool_name == "query_order_items":
             # Expect exactly 2 params
             params = params_str.strip().split()
             if len(params) != 2:
-                logger.warning(f"TOOL_CALL for order_items expects 2 params, got: {params}")
+                logger.warning("TOOL_CALL for order_items expects 2 params, got: %s", params)
         else:
             params = params_str.strip().split() if params_str else []
-        logger.info(f"Parsed TOOL_CALL: {tool_name} with params {params}")
+        logger.info("Parsed TOOL_CALL: %s with params %s", tool_name, params)
         return tool_name, params
 
-    def extract_info_from_context(self, message, user_id, conversation_id):
+    def extract_info_from_context(self, message, user_id, conversation_id, ctx=None):
         """
         Analyze conversation history and current message to extract actionable info for tool calls.
         Returns: (tool_name, params) or (None, [])
         """
-        history = self.get_conversation_history(user_id, conversation_id)
-        context = history + f"User: {message}\n"
-        # Order ID (must be at least 3 alphanumeric chars, not common words)
-        order_id_match = re.search(r"order[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
-        if order_id_match:
-            order_id = order_id_match.group(1)
-            # Avoid matching common words like 'is', 'it', etc.
-            if order_id.lower() not in {"is", "it", "the", "a", "an", "status", "order", "id"}:
-                logger.info(f"Order ID found in context: {order_id}")
-                return "query_order_by_id", [order_id]
-        # Product name (must be at least 3 chars, not common words)
-        product_name_match = re.search(r"product[\s\w]*name[\s:]*['\"]?([^'\"\n]{3,})['\"]?", context, re.IGNORECASE)
-        if product_name_match:
-            pname = product_name_match.group(1).strip()
-            if pname.lower() not in {"is", "it", "the", "a", "an", "name", "product"}:
-                logger.info(f"Product name found in context: {pname}")
-                return "query_product_by_name", [pname]
-        # Email
-        email_match = re.search(r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", context)
-        if email_match:
-            logger.info(f"Email found in context: {email_match.group(1)}")
-            return "query_user_by_email", [email_match.group(1)]
-        # Order items (order_id and user_id, both must be at least 3 chars, not common words)
-        oi_order_id = re.search(r"order[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
-        oi_user_id = re.search(r"user[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
-        if oi_order_id and oi_user_id:
-            oid = oi_order_id.group(1)
-            uid = oi_user_id.group(1)
-            if oid.lower() not in {"is", "it", "the", "a", "an", "status", "order", "id"} and uid.lower() not in {"is", "it", "the", "a", "an", "status", "order", "id", "user"}:
-                logger.info(f"Order items context found: order_id={oid}, user_id={uid}")
-                return "query_order_items", [oid, uid]
-        # Inventory by product_id (must be at least 3 chars, not common words)
-        product_id_match = re.search(r"product[\s_]?id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
-        if product_id_match:
-            pid = product_id_match.group(1)
-            if pid.lower() not in {"is", "it", "the", "a", "an", "id", "product"}:
-                logger.info(f"Product ID for inventory found in context: {pid}")
-                return "query_inventory_by_product_id", [pid]
-        # Distribution center by id (must be at least 3 chars, not common words)
-        dc_id_match = re.search(r"distribution[\s\w]*center[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
-        if dc_id_match:
-            dcid = dc_id_match.group(1)
-            if dcid.lower() not in {"is", "it", "the", "a", "an", "id", "center", "distribution"}:
-                logger.info(f"Distribution center ID found in context: {dcid}")
-                return "query_distribution_center", [dcid]
-        return None, []
-
-    def execute_extracted_info(self, tool_name, params, user_id=None, conversation_id=None):
-        logger.info(f"Executing tool from context: {tool_name} with params {params}")
-        return self.handle_tool_call(tool_name, params, user_id=user_id, conversation_id=conversation_id)
-
-    def handle_tool_call(self, tool_name, params, user_id=None, conversation_id=None):
+        ctx = self.get_context(user_id, conversation_id, ctx)
+        return self.match_context(ctx, message)
+
+    async def extract_info_from_context_async(self, message, user_id, conversation_id, ctx=None):
+        ctx = await self.get_context_async(user_id, conversation_id, ctx)
+        return self.match_context(ctx, message)
+
+    def match_context(self, ctx, message):
+        with timed("extract"):
+            tool_name, params = self.entity_extractor.extract(ctx, message)
+        if tool_name:
+            logger.debug("Context entities found: %s %s", tool_name, params)
+        return tool_name, params
+
+    def execute_extracted_info(self, tool_name, params, user_id=None, conversation_id=None, ctx=None):
+        logger.info("Executing tool from context: %s with params %s", tool_name, params)
+        return self.handle_tool_call(tool_name, params, user_id=user_id, conversation_id=conversation_id, ctx=ctx)
+
+    async def execute_extracted_info_async(self, tool_name, params, user_id=None, conversation_id=None, ctx=None):
+        logger.info("Executing tool from context: %s with params %s", tool_name, params)
+        return await self.handle_tool_call_async(tool_name, params, user_id=user_id, conversation_id=conversation_id, ctx=ctx)
+
+    async def prefetch_tool_calls_async(self, calls):
+        """
+        Group single-parameter tool calls by tool and load each group with one `$in`
+        query into the tool cache (see async_db_tools.prefetch). Returns
+        {tool_name: keys fetched from the database}.
+        """
+        grouped = {}
+        for tool_name, params in calls:
+            if tool_name in self.tools and len(params) == 1 and self.valid_tool_params(tool_name, params):
+                grouped.setdefault(tool_name, []).append(params[0])
+        names = list(grouped)
+        with timed("tool"):
+            fetched = await asyncio.gather(*(
+                async_db_tools.prefetch(self.tools[name]["async_function"].__name__, grouped[name]) for name in names
+            ))
+        return dict(zip(names, fetched))
+
+    def valid_tool_params(self, tool_name, params):
+        if tool_name == "query_order_items":
+            return len(params) == 2
+        if tool_name in ("search_products", "query_orders_by_user_id"):
+            return len(params) >= 1
+        if tool_name == "query_nearest_distribution_center":
+            return len(params) in (1, 2)
+        return len(params) == 1
+
+    def handle_tool_call(self, tool_name, params, user_id=None, conversation_id=None, ctx=None):
         tool = self.tools.get(tool_name)
         if not tool:
-            logger.warning(f"Tool {tool_name} not found.")
+            logger.warning("Tool %s not found.", tool_name)
             return f"Sorry, I don't have a tool named '{tool_name}'."
         try:
-            if tool_name == "query_order_items" and len(params) == 2:
-                result = tool["function"](params[0], params[1])
-            elif len(params) == 1:
-                result = tool["function"](params[0])
-            else:
+            if not self.valid_tool_params(tool_name, params):
                 return f"Invalid parameters for tool '{tool_name}'."
-            logger.info(f"Tool {tool_name} called with params {params}: {result}")
+            try:
+                with timed("tool"):
+                    result = self.execute_tool(tool_name, params)
+            except Exception:
+                TOOL_CALLS.inc(tool=tool_name, outcome="error")
+                raise
+            TOOL_CALLS.inc(tool=tool_name, outcome="hit" if result else "empty")
+            log_body("Tool %s called with params %s: %s", tool_name, params, result)
             if not result:
                 return f"No data found for {tool_name} with parameters {params}."
+            if self.response_modes.get(tool_name, "llm") != "llm":
+                return self.template_response(tool_name, result, params, self.get_context(user_id, conversation_id, ctx), polish=False)
             # Send raw info to LLM for conversational summary
-            return self.llm_summarize_tool_result(tool_name, result, params, user_id, conversation_id)
+            self.response_stats["llm"] += 1
+            return self.llm_summarize_tool_result(tool_name, result, params, user_id, conversation_id, ctx=ctx)
+        except LLMUnavailable:
+            raise
         except Exception as e:
-            logger.error(f"Error calling tool {tool_name}: {e}")
+            logger.error("Error calling tool %s: %s", tool_name, e)
             return f"Error calling tool {tool_name}: {e}"
 
-    def llm_summarize_tool_result(self, tool_name, result, params, user_id=None, conversation_id=None):
-        # Compose a prompt for the LLM to summarize the tool result in a conversational way
-        system_instruction = (
-            "You are Think41's AI customer service assistant. "
-            "Given the following database information, explain it to the user in a friendly, clear, and helpful way. "
-            "Do not show raw JSON or technical details. Use natural language and only the relevant facts."
-        )
-        history = self.get_conversation_history(user_id, conversation_id)
-        prompt = (
-            f"{system_instruction}\n"
-            f"Conversation so far:\n{history}"
-            f"\nDatabase info: {result}\n"
-            f"User: Please explain the above info."
-        )
-        logger.info(f"Prompt sent to Gemini for summarization: {prompt}")
-        response = self.llm.invoke(prompt)
-        response_text = str(response.content)
-        logger.info(f"LLM summary response: {response_text}")
+    def execute_tool(self, tool_name, params):
+        """Runs the tool; identical concurrent lookups share one database call."""
+        call = functools.partial(self.tools[tool_name]["function"], *params)
+        if TOOL_SINGLE_FLIGHT:
+            return self.tool_flight.do((tool_name, tuple(params)), call)
+        return call()
+
+    async def execute_tool_async(self, tool_name, params):
+        call = functools.partial(self.tools[tool_name]["async_function"], *params)
+        if TOOL_SINGLE_FLIGHT:
+            return await self.tool_flight.do_async((tool_name, tuple(params)), call)
+        return await call()
+
+    def invoke_llm(self, prompt, purpose):
+        """Returns the reply text; identical concurrent prompts share one call."""
+        def call():
+            response = llm_scheduler.run_sync(lambda: self.llm.invoke(prompt), PURPOSE_PRIORITIES[purpose])
+            text = str(response.content)
+            record_llm_call(purpose, *llm_usage(prompt, text, response))
+            return text
+        return self.llm_flight.do(prompt, call) if LLM_SINGLE_FLIGHT else call()
+
+    async def invoke_llm_async(self, prompt, purpose):
+        async def call():
+            response = await llm_scheduler.run(lambda: self.llm.ainvoke(prompt), PURPOSE_PRIORITIES[purpose])
+            text = str(response.content)
+            record_llm_call(purpose, *llm_usage(prompt, text, response))
+            return text
+        return await self.llm_flight.do_async(prompt, call) if LLM_SINGLE_FLIGHT else await call()
+
+    async def run_tool_async(self, tool_name, params):
+        """Returns (result, None), or (None, reply) when there is no result to answer from."""
+        tool = self.tools.get(tool_name)
+        if not tool:
+            logger.warning("Tool %s not found.", tool_name)
+            return None, f"Sorry, I don't have a tool named '{tool_name}'."
+        if not self.valid_tool_params(tool_name, params):
+            return None, f"Invalid parameters for tool '{tool_name}'."
+        try:
+            with timed("tool"):
+                result = await self.execute_tool_async(tool_name, params)
+        except Exception as e:
+            TOOL_CALLS.inc(tool=tool_name, outcome="error")
+            logger.error("Error calling tool %s: %s", tool_name, e)
+            return None, f"Error calling tool {tool_name}: {e}"
+        TOOL_CALLS.inc(tool=tool_name, outcome="hit" if result else "empty")
+        log_body("Tool %s called with params %s: %s", tool_name, params, result)
+        if not result:
+            return None, f"No data found for {tool_name} with parameters {params}."
+        return result, None
+
+    def failed(self, ctx, reply):
+        """Record a failure reply on the turn's context (the batch endpoint reports it per item)."""
+        if ctx is not None:
+            ctx.error = reply
+        return reply
+
+    async def handle_tool_call_async(self, tool_name, params, user_id=None, conversation_id=None, ctx=None):
+        result, reply = await self.run_tool_async(tool_name, params)
+        if reply is not None:
+            return self.failed(ctx, reply)
+        try:
+            if self.response_modes.get(tool_name, "llm") != "llm":
+                return self.template_response(tool_name, result, params, await self.get_context_async(user_id, conversation_id, ctx))
+            self.response_stats["llm"] += 1
+            return await self.llm_summarize_tool_result_async(tool_name, result, params, user_id, conversation_id, ctx=ctx)
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            logger.error("Error calling tool %s: %s", tool_name, e)
+            return self.failed(ctx, f"Error calling tool {tool_name}: {e}")
+
+    def llm_summarize_tool_result(self, tool_name, result, params, user_id=None, conversation_id=None, ctx=None):
+        ctx = self.get_context(user_id, conversation_id, ctx)
+        prompt = self.build_summary_prompt(result, self.context_builder.history_for(ctx), tool_name)
+        log_body("Prompt sent to Gemini for summarization: %s", prompt)
+        with timed("summarize"):
+            response_text = self.invoke_llm(prompt, "summarize")
+        log_body("LLM summary response: %s", response_text)
+        return response_text
+
+    async def llm_summarize_tool_result_async(self, tool_name, result, params, user_id=None, conversation_id=None, ctx=None, purpose="summarize"):
+        ctx = await self.get_context_async(user_id, conversation_id, ctx)
+        prompt = self.build_summary_prompt(result, self.context_builder.history_for(ctx), tool_name)
+        log_body("Prompt sent to Gemini for summarization: %s", prompt)
+        with timed("summarize"):
+            response_text = await self.invoke_llm_async(prompt, purpose)
+        log_body("LLM summary response: %s", response_text)
         return response_text
 
+    def template_response(self, tool_name, result, params, ctx, polish=True):
+        """
+        Answer from format_tool_result, skipping the summarization round trip. Only the
+        async router polishes replies after sending them; with `polish` false (the sync
+        path) template_polish tools are answered in plain template mode.
+        """
+        mode = self.response_modes[tool_name]
+        if mode == "template_polish" and not polish:
+            mode = "template"
+        self.response_stats[mode] += 1
+        if mode == "template_polish":
+            ctx.pending_polish = (tool_name, result, params)
+            self.response_stats["llm_calls_deferred"] += 1
+        else:
+            self.response_stats["llm_calls_saved"] += 1
+            self.response_stats["prompt_tokens_saved"] += estimate_tokens(self.build_summary_prompt(result, self.context_builder.history_for(ctx), tool_name))
+        return self.format_tool_result(tool_name, result, params)
+
+    async def polish_response_async(self, ctx, message_index, pending=None):
+        """Replace a stored template reply with the LLM's conversational summary."""
+        tool_name, result, params = pending or ctx.pending_polish
+        try:
+            text = await self.llm_summarize_tool_result_async(tool_name, result, params, ctx=ctx, purpose="polish")
+            await ctx.replace_message_async(message_index, text)
+        except Exception as e:
+            logger.error("Error polishing %s response: %s", tool_name, e)
+
     def format_tool_result(self, tool_name, result, params):
         # Format each tool's result for user-friendly output
         if tool_name == "query_order_by_id":
             return f"Order {params[0]} status: {result.get('status', 'Unknown')}."
+        elif tool_name == "query_order_summary":
+            lines = [f"Order {params[0]} status: {result.get('status', 'Unknown')}."]
+            for item in result.get("items") or []:
+                line = f"- {item.get('product_name') or 'Product ' + str(item.get('product_id', 'N/A'))}: {item.get('status', 'N/A')}"
+                if item.get("distribution_center"):
+                    line += f", ships from {item['distribution_center']}"
+                lines.append(line)
+            if result.get("items"):
+                lines.append(f"Total: ${result.get('total', 0):.2f}")
+            return "\n".join(lines)
         elif tool_name == "query_product_by_name":
             return (
                 f"Product: {result.get('name', 'N/A')}\n"
@@ -266,6 +515,13 @@ Be friendly, helpful, and always refer to the company as Think41.
                 f"SKU: {result.get('sku', 'N/A')}\n"
                 f"Distribution Center ID: {result.get('distribution_center_id', 'N/A')}"
             )
+        elif tool_name == "search_products":
+            lines = [
+                f"- {product.get('name', 'N/A')} ({product.get('brand', 'N/A')}, {product.get('category', 'N/A')}, "
+                f"{product.get('department', 'N/A')}): ${product.get('retail_price', 'N/A')}"
+                for product in result
+            ]
+            return "Matching products:\n" + "\n".join(lines)
         elif tool_name == "query_user_by_email":
             return (
                 f"User: {result.get('first_name', '')} {result.get('last_name', '')}\n"
@@ -282,6 +538,18 @@ Be friendly, helpful, and always refer to the company as Think41.
                 f"Created At: {result.get('created_at', 'N/A')}\n"
                 f"Sold At: {result.get('sold_at', 'N/A')}"
             )
+        elif tool_name == "query_product_stock":
+            lines = [f"Product {result['product_id']}: {result['in_stock']} units in stock ({result['sold']} sold)."]
+            lines.extend(
+                f"- {center['distribution_center'] or 'Distribution center ' + str(center['distribution_center_id'])}: {center['in_stock']} units"
+                for center in result["distribution_centers"]
+            )
+            return "\n".join(lines)
+        elif tool_name == "query_product_average_cost":
+            line = f"Product {result['product_id']}: average cost ${result['average_cost']:.2f} over {result['units']} units"
+            if result["average_in_stock_cost"] is not None:
+                line += f", ${result['average_in_stock_cost']:.2f} for the {result['in_stock']} in stock"
+            return line + "."
         elif tool_name == "query_distribution_center":
             return (
                 f"Distribution Center: {result.get('name', 'N/A')}\n"
@@ -289,6 +557,18 @@ Be friendly, helpful, and always refer to the company as Think41.
                 f"Latitude: {result.get('latitude', 'N/A')}\n"
                 f"Longitude: {result.get('longitude', 'N/A')}"
             )
+        elif tool_name == "query_nearest_distribution_center":
+            place = ", ".join(str(result[key]) for key in ("city", "state", "country") if result.get(key))
+            lines = [
+                f"Nearest distribution center{' to ' + place if place else ''}: {result['distribution_center']} "
+                f"(ID {result['distribution_center_id']}), about {result['distance_km']:.0f} km "
+                f"({result['distance_miles']:.0f} miles) away."
+            ]
+            if result.get("alternatives"):
+                lines.append("Next closest: " + ", ".join(
+                    f"{other['distribution_center']} ({other['distance_km']:.0f} km)" for other in result["alternatives"]
+                ))
+            return "\n".join(lines)
         elif tool_name == "query_order_items":
             if isinstance(result, list):
                 if not result:
@@ -304,34 +584,156 @@ Be friendly, helpful, and always refer to the company as Think41.
             # Default: pretty print dict
             return "Result: " + ", ".join(f"{k}: {v}" for k, v in result.items() if k != '_id')
 
-    def get_response(self, message, user_id=None, conversation_id=None):
+    def get_response(self, message, user_id=None, conversation_id=None, ctx=None):
         try:
+            # Load the conversation once for the whole turn
+            ctx = self.get_context(user_id, conversation_id, ctx)
             # 1. Try to extract actionable info from context first
-            tool_name, params = self.extract_info_from_context(message, user_id, conversation_id)
+            tool_name, params = self.extract_info_from_context(message, user_id, conversation_id, ctx=ctx)
             if tool_name and params:
-                logger.info(f"Context-aware tool execution: {tool_name} {params}")
-                return self.execute_extracted_info(tool_name, params, user_id=user_id, conversation_id=conversation_id)
+                TURN_ROUTES.inc(route="context")
+                logger.info("Context-aware tool execution: %s %s", tool_name, params)
+                return self.execute_extracted_info(tool_name, params, user_id=user_id, conversation_id=conversation_id, ctx=ctx)
 
             # 2. If not enough info, send to LLM
-            system_instruction = self.get_system_instruction()
-            history = self.get_conversation_history(user_id, conversation_id)
-            prompt = f"{system_instruction}\nConversation so far:\n{history}\nUser: {message}"
-            logger.info(f"Prompt sent to Gemini: {prompt}")
-            response = self.llm.invoke(prompt)
-            response_text = str(response.content)
-            logger.info(f"Gemini response: {response_text}")
+            prompt = self.build_prompt(message, self.context_builder.history_for(ctx))
+            log_body("Prompt sent to Gemini: %s", prompt)
+            with timed("llm"):
+                response_text = self.invoke_llm(prompt, "respond")
+            log_body("Gemini response: %s", response_text)
 
+            TURN_ROUTES.inc(route="tool_call" if "TOOL_CALL" in response_text else "llm")
             if "TOOL_CALL" in response_text:
-                logger.info("TOOL_CALL detected in Gemini response. Attempting to parse and call the appropriate tool.")
+                logger.debug("TOOL_CALL detected in Gemini response. Attempting to parse and call the appropriate tool.")
                 tool_name, params = self.parse_tool_call(response_text)
                 if tool_name and params:
-                    return self.handle_tool_call(tool_name, params, user_id=user_id, conversation_id=conversation_id)
+                    return self.handle_tool_call(tool_name, params, user_id=user_id, conversation_id=conversation_id, ctx=ctx)
                 else:
-                    logger.warning(f"TOOL_CALL found but could not parse tool or parameters: {response_text}")
+                    log_body("TOOL_CALL found but could not parse tool or parameters: %s", response_text, level=logging.WARNING)
                     return "Sorry, I could not understand the tool call. Please rephrase your request."
 
-            logger.info(f"Returning Gemini response to user: {response_text}")
+            log_body("Returning Gemini response to user: %s", response_text)
             return response_text
+        except LLMUnavailable:
+            raise
         except Exception as e:
-            logger.error(f"Error in Think41ChatBot.get_response: {str(e)}")
+            logger.exception("Error in Think41ChatBot.get_response: %s", e)
             return f"Error: {str(e)}"
+
+    async def get_response_async(self, message, user_id=None, conversation_id=None, ctx=None):
+        try:
+            ctx = await self.get_context_async(user_id, conversation_id, ctx)
+            ctx.error = None
+            tool_name, params = await self.extract_info_from_context_async(message, user_id, conversation_id, ctx=ctx)
+            if tool_name and params:
+                TURN_ROUTES.inc(route="context")
+                logger.info("Context-aware tool execution: %s %s", tool_name, params)
+                return await self.execute_extracted_info_async(tool_name, params, user_id=user_id, conversation_id=conversation_id, ctx=ctx)
+
+            prompt = self.build_prompt(message, self.context_builder.history_for(ctx))
+            log_body("Prompt sent to Gemini: %s", prompt)
+            with timed("llm"):
+                response_text = await self.invoke_llm_async(prompt, "respond")
+            log_body("Gemini response: %s", response_text)
+
+            TURN_ROUTES.inc(route="tool_call" if "TOOL_CALL" in response_text else "llm")
+            if "TOOL_CALL" in response_text:
+                logger.debug("TOOL_CALL detected in Gemini response. Attempting to parse and call the appropriate tool.")
+                tool_name, params = self.parse_tool_call(response_text)
+                if tool_name and params:
+                    return await self.handle_tool_call_async(tool_name, params, user_id=user_id, conversation_id=conversation_id, ctx=ctx)
+                else:
+                    log_body("TOOL_CALL found but could not parse tool or parameters: %s", response_text, level=logging.WARNING)
+                    return self.failed(ctx, "Sorry, I could not understand the tool call. Please rephrase your request.")
+
+            log_body("Returning Gemini response to user: %s", response_text)
+            return response_text
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            logger.exception("Error in Think41ChatBot.get_response_async: %s", e)
+            return self.failed(ctx, f"Error: {str(e)}")
+
+    async def stream_tool_call_async(self, tool_name, params, ctx):
+        result, reply = await self.run_tool_async(tool_name, params)
+        if reply is not None:
+            yield reply
+            return
+        if self.response_modes.get(tool_name, "llm") != "llm":
+            yield self.template_response(tool_name, result, params, ctx)
+            return
+        self.response_stats["llm"] += 1
+        prompt = self.build_summary_prompt(result, self.context_builder.history_for(ctx), tool_name)
+        log_body("Prompt streamed from Gemini for summarization: %s", prompt)
+        chunks = []
+        with timed("summarize"):
+            async for chunk in llm_scheduler.stream(lambda: self.llm.astream(prompt), PURPOSE_PRIORITIES["summarize"]):
+                chunks.append(str(chunk.content))
+                yield chunks[-1]
+        record_llm_call("summarize", *llm_usage(prompt, "".join(chunks)))
+
+    async def stream_response_async(self, message, user_id=None, conversation_id=None, ctx=None):
+        """
+        Same flow as get_response_async, but yields the reply text as the LLM produces it.
+        A TOOL_CALL is only recognised at the start of the LLM reply, where the system
+        instruction asks for it; anything else is streamed through as it arrives.
+        """
+        try:
+            ctx = await self.get_context_async(user_id, conversation_id, ctx)
+            tool_name, params = await self.extract_info_from_context_async(message, user_id, conversation_id, ctx=ctx)
+            if tool_name and params:
+                TURN_ROUTES.inc(route="context")
+                logger.info("Context-aware tool execution: %s %s", tool_name, params)
+                async for text in self.stream_tool_call_async(tool_name, params, ctx):
+                    yield text
+                return
+
+            prompt = self.build_prompt(message, self.context_builder.history_for(ctx))
+            log_body("Prompt streamed from Gemini: %s", prompt)
+            buffered = ""
+            streaming = False
+            streamed = []
+            with timed("llm"):
+                async for chunk in llm_scheduler.stream(lambda: self.llm.astream(prompt), PURPOSE_PRIORITIES["respond"]):
+                    text = str(chunk.content)
+                    streamed.append(text)
+                    if streaming:
+                        yield text
+                        continue
+                    # Hold text back until we know whether this is a TOOL_CALL
+                    buffered += text
+                    head = buffered.lstrip()
+                    if "TOOL_CALL".startswith(head) or head.startswith("TOOL_CALL"):
+                        continue
+                    streaming = True
+                    yield buffered
+            record_llm_call("respond", *llm_usage(prompt, "".join(streamed)))
+            TURN_ROUTES.inc(route="llm" if streaming or "TOOL_CALL" not in buffered else "tool_call")
+
+            if not streaming:
+                if "TOOL_CALL" in buffered:
+                    tool_name, params = self.parse_tool_call(buffered)
+                    if tool_name and params:
+                        async for text in self.stream_tool_call_async(tool_name, params, ctx):
+                            yield text
+                    else:
+                        log_body("TOOL_CALL found but could not parse tool or parameters: %s", buffered, level=logging.WARNING)
+                        yield "Sorry, I could not understand the tool call. Please rephrase your request."
+                elif buffered:
+                    yield buffered
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            logger.exception("Error in Think41ChatBot.stream_response_async: %s", e)
+            yield f"Error: {str(e)}"
+
+
+_chatbot = None
+
+
+def get_chatbot():
+    """The process-wide chatbot, built on first use (normally during app startup)."""
+    global _chatbot
+    if _chatbot is None:
+        _chatbot = Think41ChatBot()
+    return _chatbot
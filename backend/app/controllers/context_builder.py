@@ -0,0 +1,101 @@
+import os
+from app.controllers.conversation_controller import get_conversation_async, update_summary_async, flush_pending_messages
+from app.services.llm_scheduler import llm_scheduler, PURPOSE_PRIORITIES
+from app.utils.metrics import record_llm_call
+from app.utils.logger import logger
+
+# Token budget for the history part of every prompt. The most recent messages are kept
+# verbatim; anything older is represented by the rolling summary on the conversation.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Fold older messages into the summary once at least this many have fallen out of the window
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "6"))
+
+ENTITY_LABELS = {
+    "order_id": "order id",
+    "user_id": "user id",
+    "email": "email",
+    "product_name": "product name",
+    "product_id": "product id",
+    "dc_id": "distribution center id",
+}
+
+
+def estimate_tokens(text):
+    # Rough count (~4 characters per token); good enough for budgeting and metrics
+    return len(text) // 4
+
+def llm_usage(prompt, response_text, response=None):
+    """(prompt_tokens, completion_tokens), from the model's usage metadata when it reports it."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return (usage.get("input_tokens", estimate_tokens(prompt)),
+            usage.get("output_tokens", estimate_tokens(response_text)))
+
+
+class ContextBuilder:
+    """Builds the token-budgeted history text used in prompts and maintains rolling summaries."""
+
+    def __init__(self, llm, entity_extractor, budget=HISTORY_TOKEN_BUDGET):
+        self.llm = llm
+        self.entity_extractor = entity_extractor
+        self.budget = budget
+
+    def known_details(self, ctx):
+        entities = self.entity_extractor.entities_for(ctx, "")
+        details = [f"{label}: {entities[name]}" for name, label in ENTITY_LABELS.items() if name in entities]
+        return f"Known details: {', '.join(details)}\n" if details else ""
+
+    def window(self, ctx):
+        """
+        Returns (header, start): the summary/known-details text and the index into
+        ctx.lines of the oldest line that still fits in the budget. The newest line is
+        always kept.
+        """
+        header = f"Summary of earlier conversation: {ctx.summary}\n" if ctx.summary else ""
+        header += self.known_details(ctx)
+        used = estimate_tokens(header)
+        start = len(ctx.lines)
+        for line in reversed(ctx.lines):
+            used += estimate_tokens(line)
+            if used > self.budget and start < len(ctx.lines):
+                break
+            start -= 1
+        return header, start
+
+    def history_for(self, ctx):
+        header, start = self.window(ctx)
+        return header + "".join(list(ctx.lines)[start:])
+
+    def first_verbatim_index(self, ctx):
+        # Conversation-wide message index of the oldest message kept verbatim
+        _, start = self.window(ctx)
+        return ctx.message_count - len(ctx.lines) + start
+
+    def needs_summary(self, ctx):
+        return self.first_verbatim_index(ctx) - ctx.summary_upto >= SUMMARY_BATCH_SIZE
+
+    async def update_summary_async(self, ctx):
+        """Fold the messages between summary_upto and the verbatim window into the summary."""
+        upto = self.first_verbatim_index(ctx)
+        start = ctx.summary_upto
+        try:
+            await flush_pending_messages()
+            conv = await get_conversation_async(ctx.user_id, ctx.conversation_id, limit=upto - start, start=start)
+            messages = (conv or {}).get("messages", [])
+            if not messages:
+                return
+            transcript = "".join(f"{m['sender'].capitalize()}: {m['text']}\n" for m in messages)
+            prompt = (
+                "You maintain a running summary of a Think41 customer service conversation. "
+                "Update the summary with the new messages in at most a few sentences. "
+                "Keep every order id, user id, email address and product name that was mentioned.\n"
+                f"Current summary: {ctx.summary or '(none)'}\n"
+                f"New messages:\n{transcript}"
+                "Updated summary:"
+            )
+            response = await llm_scheduler.run(lambda: self.llm.ainvoke(prompt), PURPOSE_PRIORITIES["history_summary"])
+            summary = str(response.content).strip()
+            record_llm_call("history_summary", *llm_usage(prompt, summary, response))
+            if await update_summary_async(ctx.user_id, ctx.conversation_id, summary, start + len(messages), start):
+                ctx.summary, ctx.summary_upto = summary, start + len(messages)
+        except Exception as e:
+            logger.error("Error updating conversation summary: %s", e)
@@ -0,0 +1,147 @@
+import os
+from collections import OrderedDict, deque
+from app.controllers.conversation_controller import (
+    CONVERSATION_HISTORY_LIMIT,
+    get_conversation,
+    get_conversation_async,
+    save_message_to_conversation,
+    save_message_to_conversation_async,
+    set_message_text_async,
+)
+from app.utils.metrics import timed
+
+# Per-process cache of rendered history lines, keyed by (user_id, conversation_id).
+# Each entry is (message_count, deque of rendered lines) so a later turn only has to
+# fetch and render the messages added since the entry was built.
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "1024"))
+_history_cache = OrderedDict()
+
+
+def render_message(msg):
+    return f"{msg['sender'].capitalize()}: {msg['text']}\n"
+
+def _cache_get(key):
+    entry = _history_cache.get(key)
+    if entry is not None:
+        _history_cache.move_to_end(key)
+    return entry
+
+def _cache_put(key, message_count, lines):
+    _history_cache[key] = (message_count, deque(lines, maxlen=CONVERSATION_HISTORY_LIMIT))
+    _history_cache.move_to_end(key)
+    while len(_history_cache) > HISTORY_CACHE_SIZE:
+        _history_cache.popitem(last=False)
+
+def clear_history_cache():
+    _history_cache.clear()
+
+
+class ConversationContext:
+    """
+    Conversation state for a single /api/chat turn. Loaded once per request and passed
+    through the chatbot so history is fetched and rendered only once.
+    """
+
+    def __init__(self, user_id, conversation_id, lines=(), message_count=0):
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.lines = deque(lines, maxlen=CONVERSATION_HISTORY_LIMIT)
+        self.message_count = message_count
+        self._history = None
+        # Rolling summary of messages[:summary_upto], maintained by ContextBuilder
+        self.summary = ""
+        self.summary_upto = 0
+        # (tool_name, result, params) of a template reply awaiting an LLM rewrite
+        self.pending_polish = None
+        # Failure reply of the last turn (tool error, nothing found, ...), None on success
+        self.error = None
+
+    @property
+    def key(self):
+        return (self.user_id, self.conversation_id)
+
+    @property
+    def history(self):
+        if self._history is None:
+            self._history = "".join(self.lines)
+        return self._history
+
+    def _merge(self, entry, conv):
+        """
+        Build lines from a cached entry plus the messages fetched after it.
+        Returns False if the fetched window did not cover every new message.
+        """
+        if not conv:
+            # No stored document yet: a new conversation whose messages are still
+            # queued for write-behind, so the cached entry is all there is
+            if entry is not None:
+                self.lines.extend(entry[1])
+                self.message_count = entry[0]
+            return True
+        self.summary = conv.get("summary") or ""
+        self.summary_upto = conv.get("summary_upto") or 0
+        messages = conv.get("messages", [])
+        total = conv.get("message_count", len(messages))
+        if entry is not None:
+            if total - entry[0] > len(messages):
+                return False
+            # The store can trail the cache while write-behind messages are pending
+            total = max(total, entry[0])
+            self.lines.extend(entry[1])
+        self.lines.extend(render_message(m) for m in messages)
+        self.message_count = total
+        return True
+
+    @classmethod
+    def load(cls, user_id, conversation_id):
+        ctx = cls(user_id, conversation_id)
+        if not (user_id and conversation_id):
+            return ctx
+        entry = _cache_get(ctx.key)
+        start = entry[0] if entry else None
+        with timed("history_fetch"):
+            if not ctx._merge(entry, get_conversation(user_id, conversation_id, start=start)):
+                ctx = cls(user_id, conversation_id)
+                ctx._merge(None, get_conversation(user_id, conversation_id))
+        _cache_put(ctx.key, ctx.message_count, ctx.lines)
+        return ctx
+
+    @classmethod
+    async def load_async(cls, user_id, conversation_id):
+        ctx = cls(user_id, conversation_id)
+        if not (user_id and conversation_id):
+            return ctx
+        entry = _cache_get(ctx.key)
+        start = entry[0] if entry else None
+        with timed("history_fetch"):
+            if not ctx._merge(entry, await get_conversation_async(user_id, conversation_id, start=start)):
+                ctx = cls(user_id, conversation_id)
+                ctx._merge(None, await get_conversation_async(user_id, conversation_id))
+        _cache_put(ctx.key, ctx.message_count, ctx.lines)
+        return ctx
+
+    def _append(self, sender, text):
+        entry = _cache_get(self.key)
+        self.lines.append(render_message({"sender": sender, "text": text}))
+        self.message_count += 1
+        self._history = None
+        if entry is None or entry[0] == self.message_count - 1:
+            _cache_put(self.key, self.message_count, self.lines)
+        else:
+            # Another turn on this conversation wrote in between; rebuild on next load
+            _history_cache.pop(self.key, None)
+
+    def add_message(self, sender, text):
+        with timed("save"):
+            save_message_to_conversation(self.user_id, self.conversation_id, sender, text)
+        self._append(sender, text)
+
+    async def add_message_async(self, sender, text):
+        with timed("save"):
+            await save_message_to_conversation_async(self.user_id, self.conversation_id, sender, text)
+        self._append(sender, text)
+
+    async def replace_message_async(self, message_index, text):
+        await set_message_text_async(self.user_id, self.conversation_id, message_index, text)
+        # The cached rendering still holds the old text; rebuild it on the next load
+        _history_cache.pop(self.key, None)
@@ -1,36 +1,48 @@
+import os
 from datetime import datetime
-from app.services.database import db
 from app.schemas.conversation_schema import Message
-from bson import ObjectId
+from app.services.message_writer import MessageWriteBehind
+from app.services.storage import get_backend
+
+# Conversations live in the storage backend (see app/services/storage): one record per
+# conversation with its messages, message_count and rolling summary.
+# Reads only pull back the last CONVERSATION_HISTORY_LIMIT messages.
+CONVERSATION_HISTORY_LIMIT = int(os.getenv("CONVERSATION_HISTORY_LIMIT", "50"))
+
+# Writes are a single upsert with no read first. The async path can also defer them
+# to the write-behind queue (WRITE_BEHIND_ENABLED=1), started by the app on startup.
+message_writer = MessageWriteBehind(lambda batches: get_backend().push_message_batches_async(batches))
+
+async def flush_pending_messages():
+    # Call before reading back or modifying stored messages on the async path
+    if message_writer.running:
+        await message_writer.flush()
 
 
 def save_message_to_conversation(user_id: str, conversation_id: str, sender: str, text: str):
     message = Message(sender=sender, text=text, timestamp=datetime.utcnow()).dict()
-    user_doc = db.chats.find_one({"user_id": user_id})
-    if not user_doc:
-        # Create user doc with first conversation
-        db.chats.insert_one({
-            "user_id": user_id,
-            "conversations": {
-                conversation_id: {
-                    "messages": [message],
-                    "created_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        })
-    else:
-        # Upsert conversation in user's conversations
-        update_query = {"user_id": user_id}
-        update_op = {
-            f"$push": {f"conversations.{conversation_id}.messages": message},
-            f"$set": {f"conversations.{conversation_id}.updated_at": datetime.utcnow()},
-            f"$setOnInsert": {f"conversations.{conversation_id}.created_at": datetime.utcnow()}
-        }
-        db.chats.update_one(update_query, update_op, upsert=True)
-
-def get_conversation(user_id: str, conversation_id: str):
-    user_doc = db.chats.find_one({"user_id": user_id})
-    if user_doc and "conversations" in user_doc and conversation_id in user_doc["conversations"]:
-        return user_doc["conversations"][conversation_id]
-    return None
+    get_backend().push_messages(user_id, conversation_id, [message])
+
+def get_conversation(user_id: str, conversation_id: str, limit: int = CONVERSATION_HISTORY_LIMIT, start: int = None):
+    return get_backend().get_conversation(user_id, conversation_id, limit, start)
+
+
+# Async variants used by the async /api/chat route
+
+async def save_message_to_conversation_async(user_id: str, conversation_id: str, sender: str, text: str):
+    message = Message(sender=sender, text=text, timestamp=datetime.utcnow()).dict()
+    if message_writer.running:
+        await message_writer.enqueue(user_id, conversation_id, message)
+        return
+    await get_backend().push_messages_async(user_id, conversation_id, [message])
+
+async def set_message_text_async(user_id: str, conversation_id: str, message_index: int, text: str):
+    await flush_pending_messages()
+    await get_backend().set_message_text_async(user_id, conversation_id, message_index, text)
+
+async def update_summary_async(user_id: str, conversation_id: str, summary: str, summary_upto: int, previous_upto: int):
+    # Only applies if no other worker moved the summary on in the meantime
+    return await get_backend().update_summary_async(user_id, conversation_id, summary, summary_upto, previous_upto)
+
+async def get_conversation_async(user_id: str, conversation_id: str, limit: int = CONVERSATION_HISTORY_LIMIT, start: int = None):
+    return await get_backend().get_conversation_async(user_id, conversation_id, limit, start)
@@ -1,16 +1,109 @@
 # from backend.app.services.load_data import load_csv_to_mongo
-from fastapi import FastAPI
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.routers import chat_router
+from app.services.storage import get_backend
+from app.controllers.chat_controller import get_chatbot
+from app.controllers.conversation_controller import message_writer
+from app.services.message_writer import WRITE_BEHIND_ENABLED
+from app.services.llm_scheduler import LLMUnavailable
+from app.services.snapshots import (refresh_snapshots, refresh_periodically, snapshot_status,
+                                   SNAPSHOT_REFRESH_S, SNAPSHOT_WAIT_AT_STARTUP)
+from app.utils.logger import logger, request_id_var
+from app.utils.metrics import REQUEST_SECONDS, start_request_timings, server_timing_header, render_metrics
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build everything the first request needs before uvicorn starts accepting traffic,
+    # so each worker process pays its cold start up front. The in-memory snapshots are
+    # the exception: they scan whole collections, so they are built in the background
+    started = time.perf_counter()
+    app.state.ready = False
+    backend = await asyncio.to_thread(get_backend)
+    # Create any missing indexes (Mongo) or tables (SQL) (set ENSURE_INDEXES=0 to skip)
+    if os.getenv("ENSURE_INDEXES", "1") == "1":
+        await asyncio.to_thread(backend.ensure_schema)
+    await backend.warm_up_async()
+    await asyncio.to_thread(get_chatbot)
+    # In-memory indexes (product search, inventory, distribution centers); until one is
+    # built its tools build it on demand or fall back to the database
+    builder = None
+    if SNAPSHOT_WAIT_AT_STARTUP:
+        await asyncio.to_thread(refresh_snapshots, None, True)
+    else:
+        builder = asyncio.create_task(asyncio.to_thread(refresh_snapshots, None, True))
+    refresher = asyncio.create_task(refresh_periodically()) if SNAPSHOT_REFRESH_S > 0 else None
+    # Optional write-behind of chat messages; pending messages are flushed on shutdown
+    if WRITE_BEHIND_ENABLED:
+        message_writer.start()
+    app.state.ready = True
+    logger.info("Startup complete in %.2fs", time.perf_counter() - started)
+    yield
+    app.state.ready = False
+    for task in (builder, refresher):
+        if task:
+            task.cancel()
+    await message_writer.stop()
+    backend.close()
+
+
+app = FastAPI(lifespan=lifespan)
 # # Load CSV data into MongoDB on startup
 # @app.on_event("startup")
 # def startup_event():
 #     load_csv_to_mongo()
 
+# Per-stage timings of each request go out in a Server-Timing header. For streamed
+# replies the header is sent before the LLM runs, so only the stages before it appear.
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    timings = start_request_timings()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    # Label by route template (/api/chat, not each URL), so 404 probes and ids in paths
+    # cannot add series without bound
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(elapsed, path=getattr(route, "path", "unmatched"))
+    response.headers["Server-Timing"] = server_timing_header(timings, total=elapsed)
+    return response
+
+# Tag every log record of a request with its id (taken from X-Request-ID when the caller sends one)
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    request_id_var.set(request_id)
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# The LLM scheduler rejects calls when its queue is full (503), when Gemini keeps
+# rate limiting (429) or when a call misses its deadline (504)
+@app.exception_handler(LLMUnavailable)
+async def llm_unavailable(request: Request, exc: LLMUnavailable):
+    return JSONResponse({"detail": str(exc)}, status_code=exc.status_code, headers={"Retry-After": str(exc.retry_after)})
+
 app.include_router(chat_router.router, prefix="/api", tags=["Chatbot"])
 
 @app.get("/")
 def root():
     return {"message": "Welcome to the Think41 Chatbot API!"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Readiness probe: 503 until startup (schema, connection warm-up, chatbot) has finished.
+# Snapshots still building in the background are listed but do not hold it back.
+@app.get("/ready")
+def ready():
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready", "snapshots": snapshot_status()}
@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
-from app.services.database import Base
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import declarative_base
+
+# Declarative base for the SQL backend (app/services/storage/sql_backend.py)
+Base = declarative_base()
 
 class DistributionCenter(Base):
     __tablename__ = 'distribution_centers'
@@ -11,7 +14,7 @@ class DistributionCenter(Base):
 class InventoryItem(Base):
     __tablename__ = 'inventory_items'
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer)
+    product_id = Column(Integer, index=True)
     created_at = Column(DateTime)
     sold_at = Column(DateTime)
     cost = Column(Float)
@@ -25,6 +28,7 @@ class InventoryItem(Base):
 
 class OrderItem(Base):
     __tablename__ = 'order_items'
+    __table_args__ = (Index('ix_order_items_order_id_user_id', 'order_id', 'user_id'),)
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer)
     user_id = Column(Integer)
@@ -38,8 +42,9 @@ class OrderItem(Base):
 
 class Order(Base):
     __tablename__ = 'orders'
+    __table_args__ = (Index('ix_orders_user_id_created_at', 'user_id', 'created_at', 'order_id'),)
     order_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer)
+    user_id = Column(Integer, index=True)
     status = Column(String(255))
     gender = Column(String(50))
     created_at = Column(DateTime)
@@ -53,7 +58,7 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     cost = Column(Float)
     category = Column(String(255))
-    name = Column(String(255))
+    name = Column(String(255), index=True)
     brand = Column(String(255))
     retail_price = Column(Float)
     department = Column(String(255))
@@ -65,7 +70,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(255))
     last_name = Column(String(255))
-    email = Column(String(255))
+    email = Column(String(255), index=True)
     age = Column(Integer)
     gender = Column(String(50))
     state = Column(String(255))
@@ -77,3 +82,28 @@ class User(Base):
     longitude = Column(Float)
     traffic_source = Column(String(255))
     created_at = Column(DateTime)
+
+
+# Chat storage for the SQL backend (mirrors the Mongo `conversations` documents)
+
+class Conversation(Base):
+    __tablename__ = 'conversations'
+    __table_args__ = (UniqueConstraint('user_id', 'conversation_id', name='uq_conversations_user_conversation'),)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(64), nullable=False)
+    conversation_id = Column(String(64), nullable=False)
+    message_count = Column(Integer, default=0, nullable=False)
+    summary = Column(Text)
+    summary_upto = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+class ConversationMessage(Base):
+    __tablename__ = 'conversation_messages'
+    __table_args__ = (UniqueConstraint('conversation_pk', 'seq', name='uq_conversation_messages_seq'),)
+    id = Column(Integer, primary_key=True)
+    conversation_pk = Column(Integer, ForeignKey('conversations.id'), nullable=False)
+    seq = Column(Integer, nullable=False)
+    sender = Column(String(16))
+    text = Column(Text)
+    timestamp = Column(DateTime)
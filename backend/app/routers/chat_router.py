@@ -1,39 +1,159 @@
 
 
-from fastapi import APIRouter
-from app.schemas.chat_schema import ChatRequest, ChatResponse
-from app.controllers.chat_controller import Think41ChatBot
-from app.controllers.conversation_controller import save_message_to_conversation
+import asyncio
+import os
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.responses import StreamingResponse
+from app.schemas.chat_schema import ChatRequest, ChatResponse, BatchChatRequest, BatchChatItem, BatchChatResponse
+from app.controllers.chat_controller import get_chatbot
+from app.controllers.conversation_context import ConversationContext
+from app.services.llm_scheduler import LLMUnavailable
+from app.tools.tool_cache import cache_stats
+from app.utils.logger import conversation_id_var
+import json
 import uuid
 
 router = APIRouter()
 
+# /chat/batch limits: items per request, and conversations answered at the same time
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "32"))
 
 
-chatbot = Think41ChatBot()
-
 @router.post("/chat", response_model=ChatResponse)
-def chat_with_bot(request: ChatRequest):
+async def chat_with_bot(request: ChatRequest, background_tasks: BackgroundTasks):
+    chatbot = get_chatbot()
     # Generate a conversation_id if not provided
     conversation_id = request.conversation_id or str(uuid.uuid4())
+    conversation_id_var.set(conversation_id)
+
+    # Load the conversation once; it is shared by every step of this turn
+    ctx = await ConversationContext.load_async(request.user_id, conversation_id)
 
     # Save user message
-    save_message_to_conversation(
-        user_id=request.user_id,
-        conversation_id=conversation_id,
-        sender="user",
-        text=request.message
-    )
-    response_text = chatbot.get_response(
+    await ctx.add_message_async("user", request.message)
+    response_text = await chatbot.get_response_async(
         message=request.message,
-        user_id=request.user_id,
-        conversation_id=conversation_id
-    )
-    # Save bot response
-    save_message_to_conversation(
         user_id=request.user_id,
         conversation_id=conversation_id,
-        sender="bot",
-        text=response_text
+        ctx=ctx
     )
+    # Save bot response
+    await ctx.add_message_async("bot", response_text)
+    if ctx.pending_polish:
+        background_tasks.add_task(chatbot.polish_response_async, ctx, ctx.message_count - 1)
+    if chatbot.context_builder.needs_summary(ctx):
+        background_tasks.add_task(chatbot.context_builder.update_summary_async, ctx)
     return ChatResponse(response=response_text)
+
+@router.post("/chat/stream")
+async def stream_chat_with_bot(request: ChatRequest, background_tasks: BackgroundTasks):
+    """Server-sent events: one `data: {"token": ...}` event per chunk, then `event: done` with the full reply."""
+    chatbot = get_chatbot()
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    conversation_id_var.set(conversation_id)
+    ctx = await ConversationContext.load_async(request.user_id, conversation_id)
+    await ctx.add_message_async("user", request.message)
+
+    async def events():
+        chunks = []
+        try:
+            async for text in chatbot.stream_response_async(
+                message=request.message,
+                user_id=request.user_id,
+                conversation_id=conversation_id,
+                ctx=ctx
+            ):
+                chunks.append(text)
+                yield f"data: {json.dumps({'token': text})}\n\n"
+        except LLMUnavailable as e:
+            # Headers are already sent, so the rejection goes out as an event
+            yield f"event: error\ndata: {json.dumps({'status': e.status_code, 'detail': str(e), 'retry_after': e.retry_after})}\n\n"
+            return
+        response_text = "".join(chunks)
+        # Persist the bot message once the stream has completed
+        await ctx.add_message_async("bot", response_text)
+        if ctx.pending_polish:
+            background_tasks.add_task(chatbot.polish_response_async, ctx, ctx.message_count - 1)
+        if chatbot.context_builder.needs_summary(ctx):
+            background_tasks.add_task(chatbot.context_builder.update_summary_async, ctx)
+        yield f"event: done\ndata: {json.dumps({'conversation_id': conversation_id, 'response': response_text})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"X-Conversation-Id": conversation_id, "Cache-Control": "no-cache"},
+        background=background_tasks,
+    )
+
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def batch_chat_with_bot(batch: BatchChatRequest, background_tasks: BackgroundTasks):
+    """
+    Answer many messages in one call. Context extraction runs on every item first and the
+    resulting lookups are fetched with one `$in` query per tool; each item is then
+    answered like POST /chat. Items of the same conversation are answered in order,
+    different conversations concurrently. Responses come back in request order, with
+    `error` set on items that failed, including tool failures (nothing found, bad id)
+    that still get a reply.
+    """
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} messages per batch.")
+    chatbot = get_chatbot()
+    items = [BatchChatItem(conversation_id=request.conversation_id or str(uuid.uuid4())) for request in batch.requests]
+    conversations = {}
+    for index, item in enumerate(items):
+        conversations.setdefault((batch.requests[index].user_id, item.conversation_id), []).append(index)
+    contexts = {}
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def extract(key, indexes):
+        async with semaphore:
+            try:
+                contexts[key] = ctx = await ConversationContext.load_async(*key)
+            except Exception as e:
+                for index in indexes:
+                    items[index].error = f"Could not load conversation: {e}"
+                return []
+            return [chatbot.match_context(ctx, batch.requests[index].message) for index in indexes]
+
+    async def answer(key, indexes):
+        async with semaphore:
+            ctx = contexts.get(key)
+            if ctx is None:
+                return
+            conversation_id_var.set(key[1])
+            for index in indexes:
+                request = batch.requests[index]
+                try:
+                    await ctx.add_message_async("user", request.message)
+                    response_text = await chatbot.get_response_async(
+                        message=request.message,
+                        user_id=request.user_id,
+                        conversation_id=key[1],
+                        ctx=ctx
+                    )
+                    await ctx.add_message_async("bot", response_text)
+                    items[index].response = response_text
+                    items[index].error = ctx.error
+                except Exception as e:
+                    items[index].error = str(e)
+                    continue
+                if ctx.pending_polish:
+                    # Later items of the conversation may set their own pending polish
+                    background_tasks.add_task(chatbot.polish_response_async, ctx, ctx.message_count - 1, ctx.pending_polish)
+                    ctx.pending_polish = None
+            if chatbot.context_builder.needs_summary(ctx):
+                background_tasks.add_task(chatbot.context_builder.update_summary_async, ctx)
+
+    calls = await asyncio.gather(*(extract(key, indexes) for key, indexes in conversations.items()))
+    await chatbot.prefetch_tool_calls_async([call for group in calls for call in group if call[0]])
+    await asyncio.gather(*(answer(key, indexes) for key, indexes in conversations.items()))
+    return BatchChatResponse(responses=items)
+
+@router.get("/chat/stats")
+def chat_response_stats():
+    return get_chatbot().response_stats
+
+@router.get("/cache/stats")
+def tool_cache_stats():
+    return cache_stats()
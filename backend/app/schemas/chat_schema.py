@@ -7,3 +7,14 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     response: str
+
+class BatchChatRequest(BaseModel):
+    requests: list[ChatRequest]
+
+class BatchChatItem(BaseModel):
+    conversation_id: str
+    response: str | None = None
+    error: str | None = None
+
+class BatchChatResponse(BaseModel):
+    responses: list[BatchChatItem]
@@ -0,0 +1,256 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from app.utils.logger import logger
+from app.utils.metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_REJECTED
+
+# Admission control for Gemini calls. At most LLM_MAX_CONCURRENCY calls run at once;
+# up to LLM_MAX_QUEUE more wait for a slot, ordered by priority (the reply to the user
+# before summaries), and anything beyond that is rejected straight away so the API can
+# answer 503 instead of piling up requests. Every call has a deadline covering its
+# queue wait, the call itself and any retries after a rate-limit error; a streamed
+# call's deadline covers the whole stream.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_MS = int(os.getenv("LLM_RETRY_BASE_MS", "250"))
+
+PRIORITY_RESPOND = 0     # first reply of a turn, the user is waiting on it
+PRIORITY_SUMMARIZE = 1   # tool result summaries
+PRIORITY_BACKGROUND = 2  # polish and history summaries, after the response was sent
+PURPOSE_PRIORITIES = {
+    "respond": PRIORITY_RESPOND,
+    "summarize": PRIORITY_SUMMARIZE,
+    "polish": PRIORITY_BACKGROUND,
+    "history_summary": PRIORITY_BACKGROUND,
+}
+
+
+class LLMUnavailable(Exception):
+    status_code = 503
+    retry_after = 1
+
+
+class LLMOverloaded(LLMUnavailable):
+    """The wait queue is full."""
+
+
+class LLMRateLimited(LLMUnavailable):
+    """Still rate limited after LLM_MAX_RETRIES retries."""
+    status_code = 429
+    retry_after = 5
+
+
+class LLMTimeout(LLMUnavailable):
+    """The call did not finish within its deadline."""
+    status_code = 504
+
+
+def is_rate_limit(error):
+    # google.api_core ResourceExhausted / HTTP 429, without importing the Google client
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource exhausted" in text or "rate limit" in text
+
+def backoff_delay(attempt):
+    # Full jitter: uniform in [0, base * 2^attempt]
+    return random.uniform(0, LLM_RETRY_BASE_MS * (2 ** attempt) / 1000)
+
+
+class LLMScheduler:
+    """
+    Priority admission for async calls on the event loop, plus a separate pool of the
+    same size for the sync chat path (threads).
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_queue=LLM_MAX_QUEUE, timeout=LLM_TIMEOUT_S):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._seq = itertools.count()
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._sync_cond = threading.Condition()
+        self._sync_active = 0
+        self._sync_waiters = []  # heap of (priority, seq)
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters) + len(self._sync_waiters)
+
+    def _record_depth(self):
+        LLM_QUEUE_DEPTH.set(self.queue_depth)
+
+    def _reject(self, priority):
+        LLM_REJECTED.inc(reason="queue_full", priority=priority)
+        raise LLMOverloaded("Too many requests are waiting for the language model, please retry shortly.")
+
+    # Async
+
+    @asynccontextmanager
+    async def slot(self, priority=PRIORITY_RESPOND, deadline=None):
+        """Hold one of the concurrent call slots; waits in priority order until `deadline`."""
+        deadline = deadline or time.monotonic() + self.timeout
+        started = time.monotonic()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self._reject(priority)
+            future = asyncio.get_running_loop().create_future()
+            entry = (priority, next(self._seq), future)
+            heapq.heappush(self._waiters, entry)
+            self._record_depth()
+            try:
+                # A released slot is handed over directly by _release_async
+                await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - time.monotonic()))
+            except BaseException as e:
+                if future.done() and not future.cancelled():
+                    # Got the slot just as we gave up; pass it on
+                    self._release_async()
+                else:
+                    future.cancel()
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                self._record_depth()
+                if isinstance(e, asyncio.TimeoutError):
+                    LLM_REJECTED.inc(reason="deadline", priority=priority)
+                    raise LLMTimeout("Timed out waiting for the language model.") from None
+                raise
+            self._record_depth()
+        LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started, priority=priority)
+        try:
+            yield
+        finally:
+            self._release_async()
+
+    def _release_async(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def run(self, fn, priority=PRIORITY_RESPOND, timeout=None):
+        """Await fn() under a slot, retrying rate-limit errors with jittered backoff."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                async with self.slot(priority, deadline):
+                    return await asyncio.wait_for(fn(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                LLM_REJECTED.inc(reason="deadline", priority=priority)
+                raise LLMTimeout("The language model did not answer in time.") from None
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                if not is_rate_limit(e):
+                    raise
+                delay = backoff_delay(attempt)
+                if attempt == LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    LLM_REJECTED.inc(reason="rate_limited", priority=priority)
+                    raise LLMRateLimited("The language model is rate limiting us, please retry shortly.") from e
+                logger.warning("LLM rate limited (attempt %d), retrying in %.2fs", attempt + 1, delay)
+                # Sleep without holding a slot
+                await asyncio.sleep(delay)
+
+    async def stream(self, fn, priority=PRIORITY_RESPOND, timeout=None):
+        """
+        Iterate the async iterator fn() under a slot. The whole stream, queue wait
+        included, has to finish by the deadline; on expiry the stream is closed, the
+        slot released and LLMTimeout raised. Rate-limit errors are retried like run(),
+        but only before the first chunk: what was already yielded can't be taken back.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            streaming = False
+            try:
+                async with self.slot(priority, deadline):
+                    chunks = fn().__aiter__()
+                    try:
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                            except StopAsyncIteration:
+                                return
+                            streaming = True
+                            yield chunk
+                    finally:
+                        if hasattr(chunks, "aclose"):
+                            await chunks.aclose()
+            except asyncio.TimeoutError:
+                LLM_REJECTED.inc(reason="deadline", priority=priority)
+                raise LLMTimeout("The language model did not answer in time.") from None
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                if streaming or not is_rate_limit(e):
+                    raise
+                delay = backoff_delay(attempt)
+                if attempt == LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    LLM_REJECTED.inc(reason="rate_limited", priority=priority)
+                    raise LLMRateLimited("The language model is rate limiting us, please retry shortly.") from e
+                logger.warning("LLM rate limited before streaming (attempt %d), retrying in %.2fs", attempt + 1, delay)
+                await asyncio.sleep(delay)
+
+    # Sync
+
+    def run_sync(self, fn, priority=PRIORITY_RESPOND, timeout=None):
+        """Thread-based equivalent of run(). The call itself is bounded by the client timeout."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self._acquire_sync(priority, deadline)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_rate_limit(e):
+                    raise
+                delay = backoff_delay(attempt)
+                if attempt == LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    LLM_REJECTED.inc(reason="rate_limited", priority=priority)
+                    raise LLMRateLimited("The language model is rate limiting us, please retry shortly.") from e
+                logger.warning("LLM rate limited (attempt %d), retrying in %.2fs", attempt + 1, delay)
+            finally:
+                with self._sync_cond:
+                    self._sync_active -= 1
+                    self._sync_cond.notify_all()
+            time.sleep(delay)
+
+    def _acquire_sync(self, priority, deadline):
+        started = time.monotonic()
+        with self._sync_cond:
+            if len(self._sync_waiters) >= self.max_queue:
+                self._reject(priority)
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._sync_waiters, entry)
+            self._record_depth()
+            try:
+                while not (self._sync_active < self.max_concurrency and self._sync_waiters[0] == entry):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        LLM_REJECTED.inc(reason="deadline", priority=priority)
+                        raise LLMTimeout("Timed out waiting for the language model.")
+                    self._sync_cond.wait(remaining)
+                heapq.heappop(self._sync_waiters)
+                self._sync_active += 1
+            except BaseException:
+                self._sync_waiters.remove(entry)
+                heapq.heapify(self._sync_waiters)
+                self._sync_cond.notify_all()
+                raise
+            finally:
+                self._record_depth()
+        LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started, priority=priority)
+
+
+llm_scheduler = LLMScheduler()
@@ -1,6 +1,16 @@
+import argparse
 import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from app.services.database import db
+from app.services.database import get_mongo_db, STORAGE_BACKEND
+from app.services.order_summaries import refresh_order_summaries, SOURCE_COLLECTIONS
+from app.services.snapshots import refresh_snapshots
+from app.tools.db_indexes import INDEX_SPECS
+from app.tools.tool_cache import invalidate_collection
+from app.utils.logger import logger
 
 CSV_FOLDER = os.path.join(os.path.dirname(__file__), '../../dataset/archive')
 
@@ -13,18 +23,187 @@ CSV_COLLECTION_MAP = {
     'users.csv': 'users',
 }
 
-def load_csv_to_mongo():
+# Column types per collection (see readme.md data dictionary). Ids are stored as ints,
+# `*_at` columns as datetimes; everything else keeps the type pandas infers.
+INT_COLUMNS = {
+    'distribution_centers': ['id'],
+    'inventory_items': ['id', 'product_id', 'product_distribution_center_id'],
+    'order_items': ['id', 'order_id', 'user_id', 'product_id', 'inventory_item_id'],
+    'orders': ['order_id', 'user_id', 'num_of_item'],
+    'products': ['id', 'distribution_center_id'],
+    'users': ['id', 'age'],
+}
+DATETIME_COLUMNS = {
+    'distribution_centers': [],
+    'inventory_items': ['created_at', 'sold_at'],
+    'order_items': ['created_at', 'shipped_at', 'delivered_at', 'returned_at'],
+    'orders': ['created_at', 'returned_at', 'shipped_at', 'delivered_at'],
+    'products': [],
+    'users': ['created_at'],
+}
+
+# Datetime values that matched no known format, per (collection, column). They are
+# stored as null, so they are counted and logged rather than dropped silently.
+UNPARSED_DATETIMES = Counter()
+_unparsed_lock = threading.Lock()
+
+CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "10000"))
+WRITE_WORKERS = int(os.getenv("LOAD_WRITE_WORKERS", "8"))
+STAGING_SUFFIX = "__staging"
+
+
+def parse_datetimes(values, collection_name, col):
+    """
+    Parse a column of timestamps to UTC. ISO 8601 values of any precision or offset go
+    through the fast path; the rest (e.g. "2023-01-01 10:00:00 UTC") are parsed one by
+    one. Values that still fail become null and are counted in UNPARSED_DATETIMES.
+    """
+    parsed = pd.to_datetime(values, utc=True, errors='coerce', format='ISO8601')
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], utc=True, errors='coerce', format='mixed')
+        failed = parsed.isna() & values.notna()
+        if failed.any():
+            with _unparsed_lock:
+                UNPARSED_DATETIMES[(collection_name, col)] += int(failed.sum())
+            logger.warning("%d unparseable %s.%s values stored as null, e.g. %r",
+                           int(failed.sum()), collection_name, col, values[failed].iloc[0])
+    return parsed
+
+def take_unparsed(collection_name):
+    """Unparseable datetimes counted for a collection since the last call, resetting the count."""
+    with _unparsed_lock:
+        return sum(UNPARSED_DATETIMES.pop(key) for key in [k for k in UNPARSED_DATETIMES if k[0] == collection_name])
+
+def report_unparsed(collection_name):
+    unparsed = take_unparsed(collection_name)
+    if unparsed:
+        print(f"  {unparsed} '{collection_name}' datetimes matched no format and were stored as null.")
+
+def convert_chunk(df, collection_name):
+    for col in INT_COLUMNS.get(collection_name, []):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+    for col in DATETIME_COLUMNS.get(collection_name, []):
+        if col in df.columns:
+            df[col] = parse_datetimes(df[col], collection_name, col)
+    # Missing values are stored as null rather than NaN/NaT
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+def create_staging_indexes(staging, collection_name):
+    # Build indexes before the swap so the live collection is never unindexed
+    for keys, options in INDEX_SPECS.get(collection_name, []):
+        staging.create_index(keys, **options)
+
+def load_collection(csv_file, collection_name, write_pool, chunk_size=CHUNK_SIZE):
+    file_path = os.path.abspath(os.path.join(CSV_FOLDER, csv_file))
+    if not os.path.exists(file_path):
+        print(f"File not found: {file_path}")
+        return 0
+
+    staging = get_mongo_db()[collection_name + STAGING_SUFFIX]
+    staging.drop()
+    # Bound the number of chunks held in memory while writes are in flight
+    in_flight = threading.BoundedSemaphore(WRITE_WORKERS * 2)
+    futures = []
+    read = loaded = 0
+    started = time.perf_counter()
+
+    def write(records):
+        try:
+            staging.insert_many(records, ordered=False)
+            return len(records)
+        finally:
+            in_flight.release()
+
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+        records = convert_chunk(chunk, collection_name)
+        if not records:
+            continue
+        read += len(records)
+        in_flight.acquire()
+        futures.append(write_pool.submit(write, records))
+        done = [f for f in futures if f.done()]
+        for f in done:
+            loaded += f.result()
+            futures.remove(f)
+        elapsed = time.perf_counter() - started
+        print(f"  {collection_name}: {read} rows read, {loaded} written ({loaded / elapsed if elapsed else 0:.0f} rows/sec)")
+    for f in futures:
+        loaded += f.result()
+
+    if loaded:
+        create_staging_indexes(staging, collection_name)
+        staging.rename(collection_name, dropTarget=True)
+        # Drop cached tool results and refresh in-memory indexes for the old data (this
+        # process only; other processes pick up the new data as their TTLs expire and
+        # their snapshots refresh)
+        invalidate_collection(collection_name)
+        refresh_snapshots(collection_name)
+    else:
+        staging.drop()
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {loaded} records into '{collection_name}' collection in {elapsed:.1f}s "
+          f"({loaded / elapsed if elapsed else 0:.0f} rows/sec).")
+    report_unparsed(collection_name)
+    return loaded
+
+def load_csv_to_mongo(collections=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream every CSV into a staging collection in chunks, with the bulk writes of all
+    collections running in parallel, then atomically rename each staging collection
+    over the live one.
+    """
+    targets = {f: c for f, c in CSV_COLLECTION_MAP.items() if not collections or c in collections}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as write_pool, \
+            ThreadPoolExecutor(max_workers=len(targets) or 1) as readers:
+        results = list(readers.map(
+            lambda item: load_collection(item[0], item[1], write_pool, chunk_size),
+            targets.items(),
+        ))
+    total = sum(results)
+    # Bring the order summaries read model in line with the reloaded collections
+    if any(loaded and collection in SOURCE_COLLECTIONS for collection, loaded in zip(targets.values(), results)):
+        refresh_order_summaries()
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {total} records in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/sec).")
+    return total
+
+def load_csv_to_sql(collections=None, chunk_size=CHUNK_SIZE):
+    """
+    Bulk load the CSVs into the SQL backend. Each table is replaced inside a single
+    transaction, so readers see either the old rows or the new ones.
+    """
+    from app.services.storage import get_backend
+    backend = get_backend()
+    backend.ensure_schema()
+    total = 0
     for csv_file, collection_name in CSV_COLLECTION_MAP.items():
+        if collections and collection_name not in collections:
+            continue
         file_path = os.path.abspath(os.path.join(CSV_FOLDER, csv_file))
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            records = df.to_dict(orient='records')
-            if records:
-                db[collection_name].delete_many({})  # Clear existing data
-                db[collection_name].insert_many(records)
-                print(f"Loaded {len(records)} records into '{collection_name}' collection.")
-        else:
+        if not os.path.exists(file_path):
             print(f"File not found: {file_path}")
+            continue
+        started = time.perf_counter()
+        chunks = (convert_chunk(chunk, collection_name) for chunk in pd.read_csv(file_path, chunksize=chunk_size))
+        loaded = backend.load_records(collection_name, chunks)
+        invalidate_collection(collection_name)
+        refresh_snapshots(collection_name)
+        elapsed = time.perf_counter() - started
+        print(f"Loaded {loaded} records into '{collection_name}' table in {elapsed:.1f}s "
+              f"({loaded / elapsed if elapsed else 0:.0f} rows/sec).")
+        report_unparsed(collection_name)
+        total += loaded
+    return total
 
 if __name__ == "__main__":
-    load_csv_to_mongo()
+    parser = argparse.ArgumentParser(description="Load the dataset CSVs into MongoDB")
+    parser.add_argument("collections", nargs="*", help="only load these collections")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    if STORAGE_BACKEND == "sql":
+        load_csv_to_sql(collections=args.collections, chunk_size=args.chunk_size)
+    else:
+        load_csv_to_mongo(collections=args.collections, chunk_size=args.chunk_size)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+from collections import OrderedDict
+from app.utils.logger import logger
+
+# Optional write-behind for chat messages. When enabled, messages are queued in memory
+# and written in one unordered bulk write every WRITE_BEHIND_FLUSH_MS, so the user and
+# bot messages of a turn usually land in the same bulk write, off the response path.
+# At most WRITE_BEHIND_MAX_PENDING messages (or one flush interval) can be lost on a crash:
+# a full queue makes the next enqueue flush inline.
+# A failed flush keeps the messages it did not write for the next one (after a partly
+# applied bulk write, only those of the failed conversations, so none is pushed twice),
+# retried after a backoff that doubles up to WRITE_BEHIND_MAX_BACKOFF_MS. While the store
+# is down the queue stays capped at WRITE_BEHIND_MAX_PENDING by dropping the oldest
+# messages (counted in stats).
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "0") == "1"
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "500"))
+WRITE_BEHIND_MAX_BACKOFF_MS = int(os.getenv("WRITE_BEHIND_MAX_BACKOFF_MS", "10000"))
+
+
+def failed_groups(error, count):
+    """
+    Indexes of the conversation updates a failed write_batches call did not apply. An
+    unordered Mongo bulk write (pymongo's BulkWriteError, recognised without importing
+    pymongo) applies every update but the ones in its writeErrors; anything else is
+    taken to have written nothing.
+    """
+    details = getattr(error, "details", None)
+    if isinstance(details, dict) and "writeErrors" in details:
+        return {write_error["index"] for write_error in details["writeErrors"]}
+    return set(range(count))
+
+
+class MessageWriteBehind:
+    def __init__(self, write_batches, flush_interval=WRITE_BEHIND_FLUSH_MS / 1000,
+                 max_pending=WRITE_BEHIND_MAX_PENDING, max_backoff=WRITE_BEHIND_MAX_BACKOFF_MS / 1000):
+        # write_batches: async callable taking [((user_id, conversation_id), [messages]), ...]
+        self.write_batches = write_batches
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._backoff = 0.0
+        self._retry_at = 0.0  # loop time before which only an explicit flush writes
+        self._pending = []  # (user_id, conversation_id, message) in arrival order
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self.stats = {"enqueued": 0, "flushes": 0, "written": 0, "failed_flushes": 0, "dropped": 0}
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    @property
+    def backing_off(self):
+        return asyncio.get_running_loop().time() < self._retry_at
+
+    def _trim(self):
+        # Oldest messages go first; the newest turns are the ones a user will reload
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            self.stats["dropped"] += excess
+            logger.error("Write-behind queue full while the store is failing: dropped %d messages", excess)
+
+    async def enqueue(self, user_id, conversation_id, message):
+        if len(self._pending) >= self.max_pending and not self.backing_off:
+            await self.flush()
+        self._pending.append((user_id, conversation_id, message))
+        self.stats["enqueued"] += 1
+        self._trim()
+
+    async def flush(self):
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            # One update per conversation, pushing its messages in arrival order
+            grouped = OrderedDict()
+            for user_id, conversation_id, message in batch:
+                grouped.setdefault((user_id, conversation_id), []).append(message)
+            try:
+                await self.write_batches(list(grouped.items()))
+            except Exception as e:
+                # Keep the unwritten messages for the next flush rather than dropping them
+                self.stats["failed_flushes"] += 1
+                failed = failed_groups(e, len(grouped))
+                positions = {key: index for index, key in enumerate(grouped)}
+                retry = [entry for entry in batch if positions[entry[:2]] in failed]
+                self.stats["written"] += len(batch) - len(retry)
+                self._pending = retry + self._pending
+                self._trim()
+                self._backoff = min(max(self._backoff * 2, self.flush_interval), self.max_backoff)
+                self._retry_at = asyncio.get_running_loop().time() + self._backoff
+                logger.error("Write-behind flush of %d messages failed, retrying %d in %.1fs: %s",
+                             len(batch), len(retry), self._backoff, e)
+                return
+            self._backoff = self._retry_at = 0.0
+            self.stats["flushes"] += 1
+            self.stats["written"] += len(batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self.backing_off:
+                await self.flush()
@@ -0,0 +1,55 @@
+import argparse
+from datetime import datetime
+from pymongo import UpdateOne
+from app.services.database import get_mongo_db
+from app.services.storage.mongo_backend import conversation_filter
+from app.tools.db_indexes import ensure_indexes
+
+# Converts the legacy per-user `chats` documents
+# ({user_id, conversations: {<conversation_id>: {messages, created_at, updated_at}}})
+# into one `conversations` document per conversation.
+# Safe to re-run: conversations that already exist in the new collection are left untouched.
+
+def migrate_chats(batch_size: int = 500, drop_legacy: bool = False):
+    ensure_indexes(["conversations"])
+    db = get_mongo_db()
+    ops = []
+    migrated = skipped = 0
+
+    def flush():
+        nonlocal migrated, skipped
+        if ops:
+            result = db.conversations.bulk_write(ops, ordered=False)
+            migrated += result.upserted_count
+            skipped += result.matched_count
+            ops.clear()
+
+    for user_doc in db.chats.find({}, batch_size=batch_size):
+        user_id = user_doc.get("user_id")
+        for conversation_id, conv in (user_doc.get("conversations") or {}).items():
+            messages = conv.get("messages", [])
+            ops.append(UpdateOne(
+                conversation_filter(user_id, conversation_id),
+                {"$setOnInsert": {
+                    "messages": messages,
+                    "message_count": len(messages),
+                    "created_at": conv.get("created_at") or datetime.utcnow(),
+                    "updated_at": conv.get("updated_at") or datetime.utcnow(),
+                }},
+                upsert=True,
+            ))
+            if len(ops) >= batch_size:
+                flush()
+    flush()
+    print(f"Migrated {migrated} conversations ({skipped} already present).")
+
+    if drop_legacy:
+        db.chats.drop()
+        print("Dropped legacy 'chats' collection.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate per-user chats documents to per-conversation documents")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--drop-legacy", action="store_true")
+    args = parser.parse_args()
+    migrate_chats(batch_size=args.batch_size, drop_legacy=args.drop_legacy)
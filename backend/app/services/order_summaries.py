@@ -0,0 +1,132 @@
+import argparse
+import os
+import time
+from datetime import datetime
+from app.services.database import get_mongo_db
+from app.tools.db_indexes import ensure_indexes
+from app.tools.tool_cache import invalidate_collection
+
+# Read model for "where is my order and what's in it": one `order_summaries` document
+# per order with its items, each item's product and the distribution center it ships
+# from, so the chatbot answers with a single indexed find_one instead of chaining the
+# orders, order_items, products and distribution_centers lookups.
+#
+#   {order_id, user_id, status, num_of_item, created_at, shipped_at, delivered_at,
+#    returned_at, total, refreshed_at,
+#    items: [{id, product_id, status, shipped_at, delivered_at, returned_at,
+#             product_name, brand, category, department, retail_price,
+#             distribution_center_id, distribution_center}]}
+#
+# Documents are built by an aggregation over `orders` and written with $merge, a batch
+# of orders at a time, so the collection stays readable while it is refreshed.
+
+# Reloading any of these collections changes the summaries
+SOURCE_COLLECTIONS = {"orders", "order_items", "products", "distribution_centers"}
+SUMMARY_BATCH_SIZE = int(os.getenv("ORDER_SUMMARY_BATCH_SIZE", "5000"))
+
+
+def _first_match(array, field, value, name):
+    # First element of `array` whose `field` equals `value`, or null
+    return {"$arrayElemAt": [
+        {"$filter": {"input": array, "as": name, "cond": {"$eq": [f"$${name}.{field}", value]}}}, 0,
+    ]}
+
+def summary_pipeline(order_ids, refreshed_at):
+    """Aggregation building the summaries of `order_ids` and merging them into order_summaries."""
+    item = {
+        "id": "$$item.id",
+        "product_id": "$$item.product_id",
+        "status": "$$item.status",
+        "shipped_at": "$$item.shipped_at",
+        "delivered_at": "$$item.delivered_at",
+        "returned_at": "$$item.returned_at",
+        "product_name": "$$product.name",
+        "brand": "$$product.brand",
+        "category": "$$product.category",
+        "department": "$$product.department",
+        "retail_price": "$$product.retail_price",
+        "distribution_center_id": "$$product.distribution_center_id",
+        "distribution_center": {"$let": {
+            "vars": {"center": _first_match("$centers", "id", "$$product.distribution_center_id", "center")},
+            "in": "$$center.name",
+        }},
+    }
+    return [
+        {"$match": {"order_id": {"$in": list(order_ids)}}},
+        {"$lookup": {"from": "order_items", "localField": "order_id", "foreignField": "order_id", "as": "items"}},
+        {"$lookup": {"from": "products", "localField": "items.product_id", "foreignField": "id", "as": "products"}},
+        {"$lookup": {"from": "distribution_centers", "localField": "products.distribution_center_id",
+                     "foreignField": "id", "as": "centers"}},
+        {"$project": {
+            "_id": 0,
+            "order_id": 1, "user_id": 1, "status": 1, "num_of_item": 1,
+            "created_at": 1, "shipped_at": 1, "delivered_at": 1, "returned_at": 1,
+            "items": {"$map": {"input": "$items", "as": "item", "in": {"$let": {
+                "vars": {"product": _first_match("$products", "id", "$$item.product_id", "product")},
+                "in": item,
+            }}}},
+        }},
+        {"$addFields": {"total": {"$sum": "$items.retail_price"}, "refreshed_at": {"$literal": refreshed_at}}},
+        {"$merge": {"into": "order_summaries", "on": "order_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+def _refreshed_at():
+    # BSON dates have millisecond precision; truncate so the stale check below compares equal
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def build_order_summaries(order_ids, db=None):
+    """Build the summaries of a few orders, e.g. ones requested before the next refresh."""
+    (db or get_mongo_db()).orders.aggregate(summary_pipeline(order_ids, datetime.utcnow()))
+
+def refresh_order_summaries(order_ids=None, batch_size=SUMMARY_BATCH_SIZE):
+    """
+    Rebuild the summaries of `order_ids`, or of every order when None. A full refresh
+    also removes the summaries of orders that no longer exist. Returns the number of
+    orders processed.
+    """
+    db = get_mongo_db()
+    # $merge on order_id needs the unique index
+    ensure_indexes(["order_summaries"])
+    refreshed_at = _refreshed_at()
+    started = time.perf_counter()
+    if order_ids is None:
+        ids = (doc["order_id"] for doc in db.orders.find({}, {"_id": 0, "order_id": 1}).sort("order_id", 1))
+    else:
+        ids = iter(sorted(set(order_ids)))
+    processed = 0
+    while True:
+        batch = [order_id for _, order_id in zip(range(batch_size), ids)]
+        if not batch:
+            break
+        # aggregate() with $merge returns no documents; the write happens server-side
+        db.orders.aggregate(summary_pipeline(batch, refreshed_at))
+        processed += len(batch)
+    if order_ids is None:
+        db.order_summaries.delete_many({"refreshed_at": {"$lt": refreshed_at}})
+    else:
+        # Requested orders that were deleted
+        existing = set(db.orders.distinct("order_id", {"order_id": {"$in": list(set(order_ids))}}))
+        gone = [order_id for order_id in set(order_ids) if order_id not in existing]
+        if gone:
+            db.order_summaries.delete_many({"order_id": {"$in": gone}})
+    invalidate_collection("order_summaries")
+    elapsed = time.perf_counter() - started
+    print(f"Refreshed {processed} order summaries in {elapsed:.1f}s.")
+    return processed
+
+def orders_for_products(product_ids):
+    """Ids of the orders containing any of `product_ids`, e.g. after a product changed."""
+    return get_mongo_db().order_items.distinct("order_id", {"product_id": {"$in": list(product_ids)}})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the order_summaries read model")
+    parser.add_argument("--orders", type=int, nargs="*", help="only these order ids")
+    parser.add_argument("--products", type=int, nargs="*", help="only orders containing these product ids")
+    parser.add_argument("--batch-size", type=int, default=SUMMARY_BATCH_SIZE)
+    args = parser.parse_args()
+    targets = None
+    if args.orders or args.products:
+        targets = set(args.orders or []) | set(orders_for_products(args.products or []))
+    refresh_order_summaries(targets, batch_size=args.batch_size)
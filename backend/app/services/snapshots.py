@@ -0,0 +1,83 @@
+import asyncio
+import os
+import threading
+import time
+from app.tools.tool_cache import invalidate_collection
+from app.utils.logger import logger
+
+# In-memory indexes over dataset collections (product search, ...), for lookups a
+# database query cannot answer quickly. Each is built from a full scan of its
+# collection at startup and refreshed after its collection is reloaded in this process
+# (load_data) and every SNAPSHOT_REFRESH_S seconds, which picks up reloads done by other
+# processes. A refresh re-scans the collection but only re-indexes the records that
+# changed. Set SNAPSHOT_REFRESH_S=0 to only build at startup.
+# The startup build runs in the background, after the app starts serving: until a
+# snapshot is ready its tools build it on demand or fall back to the database. Set
+# SNAPSHOT_WAIT_AT_STARTUP=1 to finish the builds before serving instead.
+SNAPSHOT_REFRESH_S = float(os.getenv("SNAPSHOT_REFRESH_S", "300"))
+SNAPSHOT_WAIT_AT_STARTUP = os.getenv("SNAPSHOT_WAIT_AT_STARTUP", "0") == "1"
+
+_snapshots = []
+
+
+class Snapshot:
+    """
+    Base class: subclasses set `collection` (and `fields` to scan, default the tool
+    projection) and implement apply(records), which takes every current record and
+    returns the number of records that changed. Readers must only see complete state,
+    so apply() builds the new state aside and swaps it in.
+    """
+    collection = None
+    fields = None
+
+    def __init__(self):
+        self.ready = False
+        self.refreshed_at = None
+        self._refresh_lock = threading.Lock()
+
+    def apply(self, records):
+        raise NotImplementedError
+
+    def refresh(self):
+        from app.services.storage import get_backend
+        with self._refresh_lock:
+            started = time.perf_counter()
+            changed = self.apply(get_backend().iter_collection(self.collection, self.fields))
+            self.ready = True
+            self.refreshed_at = time.time()
+        if changed:
+            # Cached tool results may have come from the previous state
+            invalidate_collection(self.collection)
+        logger.info("Refreshed %s snapshot: %d changed records in %.3fs",
+                    type(self).__name__, changed, time.perf_counter() - started)
+        return changed
+
+
+def register(snapshot):
+    _snapshots.append(snapshot)
+    return snapshot
+
+def refresh_snapshots(collection=None, build=False):
+    """
+    Refresh the snapshots of `collection` (all when None). Snapshots that were never
+    built are skipped unless build=True, so a load_data run does not build indexes it
+    will not use.
+    """
+    for snapshot in _snapshots:
+        if collection and snapshot.collection != collection:
+            continue
+        if not snapshot.ready and not build:
+            continue
+        try:
+            snapshot.refresh()
+        except Exception:
+            logger.exception("Could not refresh %s snapshot", type(snapshot).__name__)
+
+def snapshot_status():
+    """{snapshot class name: built yet} for the readiness probe."""
+    return {type(snapshot).__name__: snapshot.ready for snapshot in _snapshots}
+
+async def refresh_periodically(interval=SNAPSHOT_REFRESH_S):
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(refresh_snapshots)
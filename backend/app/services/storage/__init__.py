@@ -0,0 +1,16 @@
+from app.services.database import STORAGE_BACKEND
+
+_backend = None
+
+
+def get_backend():
+    """The process-wide storage backend selected by STORAGE_BACKEND ("mongo" or "sql")."""
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "sql":
+            from app.services.storage.sql_backend import SqlBackend
+            _backend = SqlBackend()
+        else:
+            from app.services.storage.mongo_backend import MongoBackend
+            _backend = MongoBackend()
+    return _backend
@@ -0,0 +1,159 @@
+import asyncio
+import os
+
+TOOL_METHODS = (
+    "query_orders_by_order_id",
+    "query_orders_by_user_id",
+    "query_products_by_name",
+    "query_product_by_id",
+    "query_user_by_email",
+    "query_user_by_id",
+    "query_inventory_by_product_id",
+    "query_inventory_item_by_id",
+    "query_distribution_center_by_id",
+    "query_order_items_by_order_and_user",
+    "query_order_item_by_id",
+    "query_order_summary",
+    "query_order_status_counts",
+    "query_user_location",
+    "find_many",
+)
+CONVERSATION_METHODS = (
+    "push_messages",
+    "push_message_batches",
+    "get_conversation",
+    "set_message_text",
+    "update_summary",
+)
+# Rows per round trip when a whole collection is streamed (iter_collection)
+SCAN_BATCH_SIZE = 5000
+USER_LOCATION_FIELDS = ("id", "city", "state", "country", "latitude", "longitude")
+# Orders returned by query_orders_by_user_id when no limit is given, most recent first
+ORDER_HISTORY_LIMIT = int(os.getenv("ORDER_HISTORY_LIMIT", "10"))
+
+
+class StorageBackend:
+    """
+    Storage used by app/tools/db_tools.py and the conversation controller.
+
+    Tool lookups take already-typed arguments (ints for ids) and return plain dicts, or
+    lists of dicts for the multi-row tools. Conversations are returned as
+    {"messages": [...], "message_count", "summary", "summary_upto"}.
+
+    Every method has an `<name>_async` counterpart. By default it runs the sync method in
+    a worker thread; backends with an async driver override it.
+    """
+
+    def ensure_schema(self):
+        """Create missing tables/indexes. Safe to call on every startup."""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Open pooled connections ahead of the first request."""
+
+    async def warm_up_async(self):
+        await asyncio.to_thread(self.warm_up)
+
+    def close(self):
+        """Release connections on shutdown."""
+
+    # Tool lookups
+    def query_orders_by_order_id(self, order_id: int):
+        raise NotImplementedError
+
+    def query_orders_by_user_id(self, user_id: int, limit: int = ORDER_HISTORY_LIMIT, before=None):
+        """
+        The user's `limit` most recent orders (None for all), newest first by
+        (created_at, order_id) with undated orders last. `before`, the (created_at,
+        order_id) key of the previous page's last order, continues after it; with
+        order_id None it is a plain created_at bound.
+        """
+        raise NotImplementedError
+
+    def query_products_by_name(self, name: str):
+        raise NotImplementedError
+
+    def query_product_by_id(self, product_id: int):
+        raise NotImplementedError
+
+    def query_user_by_email(self, email: str):
+        raise NotImplementedError
+
+    def query_user_by_id(self, user_id: int):
+        raise NotImplementedError
+
+    def query_inventory_by_product_id(self, product_id: int):
+        raise NotImplementedError
+
+    def query_inventory_item_by_id(self, item_id: int):
+        raise NotImplementedError
+
+    def query_distribution_center_by_id(self, dc_id: int):
+        raise NotImplementedError
+
+    def query_order_items_by_order_and_user(self, order_id: int, user_id: int):
+        raise NotImplementedError
+
+    def query_order_item_by_id(self, order_item_id: int):
+        raise NotImplementedError
+
+    def query_order_summary(self, order_id: int):
+        """The order with its items, their products and distribution centers (see app/services/order_summaries.py)."""
+        raise NotImplementedError
+
+    def query_order_status_counts(self, user_id: int):
+        """
+        [{status, count, latest_created_at, latest_shipped_at, latest_delivered_at,
+        latest_returned_at}] over all the user's orders, most orders first, aggregated by
+        the database.
+        """
+        raise NotImplementedError
+
+    def query_user_location(self, user_id: int):
+        """{id, city, state, country, latitude, longitude} of a user (coordinates are not in the tool projection)."""
+        raise NotImplementedError
+
+    def find_many(self, collection_name: str, field: str, values: list, first: bool = False):
+        """
+        All records of a dataset collection (or order_summaries) whose `field` is one of
+        `values` (one query). With `first`, only the first record per value, picked by
+        the database like the single lookups' find_one.
+        """
+        raise NotImplementedError
+
+    def iter_collection(self, collection_name: str, fields=None):
+        """
+        Every record of a dataset collection, streamed, with only `fields` (default: the
+        tool projection). Used to build the in-memory snapshots (app/services/snapshots.py).
+        """
+        raise NotImplementedError
+
+    # Conversations
+    def push_messages(self, user_id, conversation_id, messages):
+        """Append messages to a conversation, creating it if needed."""
+        raise NotImplementedError
+
+    def push_message_batches(self, batches):
+        """batches: [((user_id, conversation_id), [messages]), ...] written together."""
+        raise NotImplementedError
+
+    def get_conversation(self, user_id, conversation_id, limit, start=None):
+        """start=None -> last `limit` messages; otherwise up to `limit` messages from index `start`."""
+        raise NotImplementedError
+
+    def set_message_text(self, user_id, conversation_id, message_index, text):
+        raise NotImplementedError
+
+    def update_summary(self, user_id, conversation_id, summary, summary_upto, previous_upto):
+        """Store the rolling summary if summary_upto is still previous_upto. Returns True if applied."""
+        raise NotImplementedError
+
+
+def _threaded(method_name):
+    async def method(self, *args, **kwargs):
+        return await asyncio.to_thread(getattr(self, method_name), *args, **kwargs)
+    method.__name__ = f"{method_name}_async"
+    return method
+
+for _name in TOOL_METHODS + CONVERSATION_METHODS:
+    setattr(StorageBackend, f"{_name}_async", _threaded(_name))
@@ -0,0 +1,312 @@
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from app.services.database import get_mongo_db, get_async_db, close_clients, MONGO_MIN_POOL_SIZE
+from app.services.order_summaries import build_order_summaries, summary_pipeline
+from app.services.storage.base import StorageBackend, SCAN_BATCH_SIZE, USER_LOCATION_FIELDS, ORDER_HISTORY_LIMIT
+from app.tools.projections import mongo_projection
+
+
+def location_projection():
+    return {"_id": 0, **{field: 1 for field in USER_LOCATION_FIELDS}}
+
+def user_orders_filter(user_id, before=None):
+    # `before` is the (created_at, order_id) key of the previous page's last order
+    # (see app/tools/order_history.py); undated orders sort after every dated one
+    query = {"user_id": user_id}
+    if before is None:
+        return query
+    created_at, order_id = before
+    if order_id is None:
+        query["created_at"] = {"$lt": created_at}
+    elif created_at is None:
+        query.update({"created_at": None, "order_id": {"$lt": order_id}})
+    else:
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "order_id": {"$lt": order_id}},
+            {"created_at": None},
+        ]
+    return query
+
+# Newest first, undated orders (null sorts lowest) last; order_id breaks ties so pages are stable
+USER_ORDERS_SORT = [("created_at", -1), ("order_id", -1)]
+
+def status_counts_pipeline(user_id):
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": "$status",
+            "count": {"$sum": 1},
+            "latest_created_at": {"$max": "$created_at"},
+            "latest_shipped_at": {"$max": "$shipped_at"},
+            "latest_delivered_at": {"$max": "$delivered_at"},
+            "latest_returned_at": {"$max": "$returned_at"},
+        }},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$project": {
+            "_id": 0, "status": "$_id", "count": 1, "latest_created_at": 1,
+            "latest_shipped_at": 1, "latest_delivered_at": 1, "latest_returned_at": 1,
+        }},
+    ]
+
+def first_per_value_pipeline(field, values, projection):
+    # find_one for every value in one round trip: one document per value leaves the server
+    pipeline = [
+        {"$match": {field: {"$in": values}}},
+        {"$group": {"_id": f"${field}", "doc": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$doc"}},
+    ]
+    if projection:
+        pipeline.append({"$project": projection})
+    return pipeline
+
+def conversation_filter(user_id, conversation_id):
+    return {"user_id": user_id, "conversation_id": conversation_id}
+
+def message_update(messages):
+    now = datetime.utcnow()
+    return {
+        "$push": {"messages": {"$each": messages}},
+        "$inc": {"message_count": len(messages)},
+        "$set": {"updated_at": now},
+        "$setOnInsert": {"created_at": now},
+    }
+
+def history_projection(limit, start=None):
+    # start=None -> last `limit` messages; otherwise up to `limit` messages from index `start`
+    window = -limit if start is None else [start, limit]
+    return {"_id": 0, "messages": {"$slice": window}}
+
+def summary_filter(user_id, conversation_id, previous_upto):
+    filter_query = conversation_filter(user_id, conversation_id)
+    filter_query["summary_upto"] = previous_upto if previous_upto else {"$in": [0, None]}
+    return filter_query
+
+def summary_update(summary, summary_upto):
+    return {"$set": {"summary": summary, "summary_upto": summary_upto}}
+
+def message_text_update(message_index, text):
+    return {"$set": {f"messages.{message_index}.text": text, "updated_at": datetime.utcnow()}}
+
+
+class MongoBackend(StorageBackend):
+    """
+    MongoDB storage. Each conversation is one document in `conversations`:
+    {user_id, conversation_id, messages: [...], message_count, created_at, updated_at,
+     summary, summary_upto}  (summary covers messages[:summary_upto], see context_builder)
+    """
+
+    def __init__(self):
+        self.db = get_mongo_db()
+        self.async_db = get_async_db()
+
+    def ensure_schema(self):
+        from app.tools.db_indexes import ensure_indexes
+        return ensure_indexes()
+
+    def warm_up(self):
+        self.db.command("ping")
+
+    async def warm_up_async(self):
+        # Concurrent pings make the async pool open MONGO_MIN_POOL_SIZE connections now
+        await asyncio.to_thread(self.warm_up)
+        await asyncio.gather(*(self.async_db.command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE))))
+
+    def close(self):
+        close_clients()
+
+    # Tool lookups
+
+    def query_orders_by_order_id(self, order_id):
+        return self.db.orders.find_one({"order_id": order_id}, mongo_projection("orders"))
+
+    def query_orders_by_user_id(self, user_id, limit=ORDER_HISTORY_LIMIT, before=None):
+        # Served in index order by the (user_id, created_at) index; one batch per page
+        cursor = self.db.orders.find(user_orders_filter(user_id, before), mongo_projection("orders"),
+                                     sort=USER_ORDERS_SORT, limit=limit or 0, batch_size=limit or SCAN_BATCH_SIZE)
+        return list(cursor)
+
+    def query_products_by_name(self, name):
+        return self.db.products.find_one({"name": name}, mongo_projection("products"))
+
+    def query_product_by_id(self, product_id):
+        return self.db.products.find_one({"id": product_id}, mongo_projection("products"))
+
+    def query_user_by_email(self, email):
+        return self.db.users.find_one({"email": email}, mongo_projection("users"))
+
+    def query_user_by_id(self, user_id):
+        return self.db.users.find_one({"id": user_id}, mongo_projection("users"))
+
+    def query_inventory_by_product_id(self, product_id):
+        return self.db.inventory_items.find_one({"product_id": product_id}, mongo_projection("inventory_items"))
+
+    def query_inventory_item_by_id(self, item_id):
+        return self.db.inventory_items.find_one({"id": item_id}, mongo_projection("inventory_items"))
+
+    def query_distribution_center_by_id(self, dc_id):
+        return self.db.distribution_centers.find_one({"id": dc_id}, mongo_projection("distribution_centers"))
+
+    def query_order_items_by_order_and_user(self, order_id, user_id):
+        return list(self.db.order_items.find({"order_id": order_id, "user_id": user_id}, mongo_projection("order_items")))
+
+    def query_order_item_by_id(self, order_item_id):
+        return self.db.order_items.find_one({"id": order_item_id}, mongo_projection("order_items"))
+
+    def query_order_summary(self, order_id):
+        summaries = self._order_summaries([order_id])
+        return summaries[0] if summaries else None
+
+    def _order_summaries(self, order_ids):
+        projection = mongo_projection("order_summaries")
+        found = list(self.db.order_summaries.find({"order_id": {"$in": order_ids}}, projection))
+        missing = list(set(order_ids) - {doc["order_id"] for doc in found})
+        if missing:
+            # Orders added since the last refresh: build their summaries now. Ids with no
+            # order never reach the $merge, so looking up a wrong id stays a read
+            missing = self.db.orders.distinct("order_id", {"order_id": {"$in": missing}})
+        if missing:
+            build_order_summaries(missing, self.db)
+            found += self.db.order_summaries.find({"order_id": {"$in": missing}}, projection)
+        return found
+
+    def query_order_status_counts(self, user_id):
+        return list(self.db.orders.aggregate(status_counts_pipeline(user_id)))
+
+    def query_user_location(self, user_id):
+        return self.db.users.find_one({"id": user_id}, location_projection())
+
+    def find_many(self, collection_name, field, values, first=False):
+        if collection_name == "order_summaries":
+            return self._order_summaries(list(values))
+        if first:
+            return list(self.db[collection_name].aggregate(
+                first_per_value_pipeline(field, list(values), mongo_projection(collection_name))))
+        return list(self.db[collection_name].find({field: {"$in": list(values)}}, mongo_projection(collection_name)))
+
+    async def query_orders_by_order_id_async(self, order_id):
+        return await self.async_db.orders.find_one({"order_id": order_id}, mongo_projection("orders"))
+
+    async def query_orders_by_user_id_async(self, user_id, limit=ORDER_HISTORY_LIMIT, before=None):
+        cursor = self.async_db.orders.find(user_orders_filter(user_id, before), mongo_projection("orders"),
+                                           sort=USER_ORDERS_SORT, limit=limit or 0, batch_size=limit or SCAN_BATCH_SIZE)
+        return await cursor.to_list(length=limit)
+
+    async def query_products_by_name_async(self, name):
+        return await self.async_db.products.find_one({"name": name}, mongo_projection("products"))
+
+    async def query_product_by_id_async(self, product_id):
+        return await self.async_db.products.find_one({"id": product_id}, mongo_projection("products"))
+
+    async def query_user_by_email_async(self, email):
+        return await self.async_db.users.find_one({"email": email}, mongo_projection("users"))
+
+    async def query_user_by_id_async(self, user_id):
+        return await self.async_db.users.find_one({"id": user_id}, mongo_projection("users"))
+
+    async def query_inventory_by_product_id_async(self, product_id):
+        return await self.async_db.inventory_items.find_one({"product_id": product_id}, mongo_projection("inventory_items"))
+
+    async def query_inventory_item_by_id_async(self, item_id):
+        return await self.async_db.inventory_items.find_one({"id": item_id}, mongo_projection("inventory_items"))
+
+    async def query_distribution_center_by_id_async(self, dc_id):
+        return await self.async_db.distribution_centers.find_one({"id": dc_id}, mongo_projection("distribution_centers"))
+
+    async def query_order_items_by_order_and_user_async(self, order_id, user_id):
+        cursor = self.async_db.order_items.find({"order_id": order_id, "user_id": user_id}, mongo_projection("order_items"))
+        return await cursor.to_list(length=None)
+
+    async def query_order_item_by_id_async(self, order_item_id):
+        return await self.async_db.order_items.find_one({"id": order_item_id}, mongo_projection("order_items"))
+
+    async def query_order_summary_async(self, order_id):
+        summaries = await self._order_summaries_async([order_id])
+        return summaries[0] if summaries else None
+
+    async def _order_summaries_async(self, order_ids):
+        projection = mongo_projection("order_summaries")
+        found = await self.async_db.order_summaries.find({"order_id": {"$in": order_ids}}, projection).to_list(length=None)
+        missing = list(set(order_ids) - {doc["order_id"] for doc in found})
+        if missing:
+            missing = await self.async_db.orders.distinct("order_id", {"order_id": {"$in": missing}})
+        if missing:
+            await self.async_db.orders.aggregate(summary_pipeline(missing, datetime.utcnow())).to_list(length=None)
+            found += await self.async_db.order_summaries.find({"order_id": {"$in": missing}}, projection).to_list(length=None)
+        return found
+
+    async def query_order_status_counts_async(self, user_id):
+        return await self.async_db.orders.aggregate(status_counts_pipeline(user_id)).to_list(length=None)
+
+    async def query_user_location_async(self, user_id):
+        return await self.async_db.users.find_one({"id": user_id}, location_projection())
+
+    async def find_many_async(self, collection_name, field, values, first=False):
+        if collection_name == "order_summaries":
+            return await self._order_summaries_async(list(values))
+        if first:
+            cursor = self.async_db[collection_name].aggregate(
+                first_per_value_pipeline(field, list(values), mongo_projection(collection_name)))
+            return await cursor.to_list(length=None)
+        return await self.async_db[collection_name].find({field: {"$in": list(values)}}, mongo_projection(collection_name)).to_list(length=None)
+
+    def iter_collection(self, collection_name, fields=None):
+        projection = {"_id": 0, **{field: 1 for field in fields}} if fields else mongo_projection(collection_name)
+        return self.db[collection_name].find({}, projection, batch_size=SCAN_BATCH_SIZE)
+
+    # Conversations: single upserts, no read before write
+
+    def push_messages(self, user_id, conversation_id, messages):
+        self.db.conversations.update_one(
+            conversation_filter(user_id, conversation_id), message_update(messages), upsert=True
+        )
+
+    def push_message_batches(self, batches):
+        self.db.conversations.bulk_write(self._batch_ops(batches), ordered=False)
+
+    def get_conversation(self, user_id, conversation_id, limit, start=None):
+        return self.db.conversations.find_one(
+            conversation_filter(user_id, conversation_id), history_projection(limit, start)
+        )
+
+    def set_message_text(self, user_id, conversation_id, message_index, text):
+        self.db.conversations.update_one(
+            conversation_filter(user_id, conversation_id), message_text_update(message_index, text)
+        )
+
+    def update_summary(self, user_id, conversation_id, summary, summary_upto, previous_upto):
+        result = self.db.conversations.update_one(
+            summary_filter(user_id, conversation_id, previous_upto), summary_update(summary, summary_upto)
+        )
+        return result.modified_count == 1
+
+    async def push_messages_async(self, user_id, conversation_id, messages):
+        await self.async_db.conversations.update_one(
+            conversation_filter(user_id, conversation_id), message_update(messages), upsert=True
+        )
+
+    async def push_message_batches_async(self, batches):
+        await self.async_db.conversations.bulk_write(self._batch_ops(batches), ordered=False)
+
+    async def get_conversation_async(self, user_id, conversation_id, limit, start=None):
+        return await self.async_db.conversations.find_one(
+            conversation_filter(user_id, conversation_id), history_projection(limit, start)
+        )
+
+    async def set_message_text_async(self, user_id, conversation_id, message_index, text):
+        await self.async_db.conversations.update_one(
+            conversation_filter(user_id, conversation_id), message_text_update(message_index, text)
+        )
+
+    async def update_summary_async(self, user_id, conversation_id, summary, summary_upto, previous_upto):
+        result = await self.async_db.conversations.update_one(
+            summary_filter(user_id, conversation_id, previous_upto), summary_update(summary, summary_upto)
+        )
+        return result.modified_count == 1
+
+    def _batch_ops(self, batches):
+        return [
+            UpdateOne(conversation_filter(user_id, conversation_id), message_update(messages), upsert=True)
+            for (user_id, conversation_id), messages in batches
+        ]
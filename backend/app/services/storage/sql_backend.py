@@ -0,0 +1,274 @@
+from datetime import datetime
+from sqlalchemy import create_engine, func, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app.services.database import SQL_DATABASE_URL
+from app.models.models import (
+    Base,
+    DistributionCenter, InventoryItem, OrderItem, Order, Product, User,
+    Conversation, ConversationMessage,
+)
+from app.services.storage.base import StorageBackend, SCAN_BATCH_SIZE, USER_LOCATION_FIELDS, ORDER_HISTORY_LIMIT
+from app.tools.projections import tool_fields
+
+# Dataset collection name -> SQLAlchemy model
+MODELS = {
+    "distribution_centers": DistributionCenter,
+    "inventory_items": InventoryItem,
+    "order_items": OrderItem,
+    "orders": Order,
+    "products": Product,
+    "users": User,
+}
+ORDER_SUMMARY_FIELDS = ("order_id", "user_id", "status", "num_of_item", "created_at", "shipped_at", "delivered_at", "returned_at")
+
+
+class SqlBackend(StorageBackend):
+    """SQLAlchemy storage on the models in app/models/models.py (SQLite by default)."""
+
+    def __init__(self, url=SQL_DATABASE_URL):
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, connect_args=connect_args)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    def ensure_schema(self):
+        Base.metadata.create_all(self.engine)
+
+    def warm_up(self):
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+
+    def close(self):
+        self.engine.dispose()
+
+    def _select(self, model):
+        # Only the projected columns of dataset tables (see app/tools/projections.py)
+        fields = tool_fields(model.__tablename__)
+        columns = [getattr(model, field) for field in fields] if fields else model.__table__.columns
+        return select(*columns)
+
+    def _first(self, model, *criteria):
+        with self.Session() as session:
+            row = session.execute(self._select(model).where(*criteria).limit(1)).mappings().first()
+            return dict(row) if row else None
+
+    def _all(self, model, *criteria):
+        with self.Session() as session:
+            return [dict(row) for row in session.execute(self._select(model).where(*criteria)).mappings()]
+
+    # Tool lookups
+
+    def query_orders_by_order_id(self, order_id):
+        return self._first(Order, Order.order_id == order_id)
+
+    def query_orders_by_user_id(self, user_id, limit=ORDER_HISTORY_LIMIT, before=None):
+        # Same keyset order as the Mongo backend: newest first, undated orders last
+        criteria = [Order.user_id == user_id]
+        if before is not None:
+            created_at, order_id = before
+            if order_id is None:
+                criteria.append(Order.created_at < created_at)
+            elif created_at is None:
+                criteria += [Order.created_at.is_(None), Order.order_id < order_id]
+            else:
+                criteria.append(or_(tuple_(Order.created_at, Order.order_id) < (created_at, order_id),
+                                    Order.created_at.is_(None)))
+        query = (self._select(Order).where(*criteria)
+                 .order_by(Order.created_at.desc().nulls_last(), Order.order_id.desc()).limit(limit))
+        with self.Session() as session:
+            return [dict(row) for row in session.execute(query).mappings()]
+
+    def query_products_by_name(self, name):
+        return self._first(Product, Product.name == name)
+
+    def query_product_by_id(self, product_id):
+        return self._first(Product, Product.id == product_id)
+
+    def query_user_by_email(self, email):
+        return self._first(User, User.email == email)
+
+    def query_user_by_id(self, user_id):
+        return self._first(User, User.id == user_id)
+
+    def query_inventory_by_product_id(self, product_id):
+        return self._first(InventoryItem, InventoryItem.product_id == product_id)
+
+    def query_inventory_item_by_id(self, item_id):
+        return self._first(InventoryItem, InventoryItem.id == item_id)
+
+    def query_distribution_center_by_id(self, dc_id):
+        return self._first(DistributionCenter, DistributionCenter.id == dc_id)
+
+    def query_order_items_by_order_and_user(self, order_id, user_id):
+        return self._all(OrderItem, OrderItem.order_id == order_id, OrderItem.user_id == user_id)
+
+    def query_order_item_by_id(self, order_item_id):
+        return self._first(OrderItem, OrderItem.id == order_item_id)
+
+    def query_order_status_counts(self, user_id):
+        query = (
+            select(
+                Order.status, func.count().label("count"),
+                func.max(Order.created_at).label("latest_created_at"),
+                func.max(Order.shipped_at).label("latest_shipped_at"),
+                func.max(Order.delivered_at).label("latest_delivered_at"),
+                func.max(Order.returned_at).label("latest_returned_at"),
+            )
+            .where(Order.user_id == user_id)
+            .group_by(Order.status)
+            .order_by(func.count().desc(), Order.status)
+        )
+        with self.Session() as session:
+            return [dict(row) for row in session.execute(query).mappings()]
+
+    def query_user_location(self, user_id):
+        with self.Session() as session:
+            row = session.execute(
+                select(*(getattr(User, field) for field in USER_LOCATION_FIELDS)).where(User.id == user_id)
+            ).mappings().first()
+            return dict(row) if row else None
+
+    def query_order_summary(self, order_id):
+        summaries = self._order_summaries([order_id])
+        return summaries[0] if summaries else None
+
+    def _order_summaries(self, order_ids):
+        # Same documents as the Mongo order_summaries read model, joined on read
+        items_query = (
+            select(
+                OrderItem.order_id, OrderItem.id, OrderItem.product_id, OrderItem.status,
+                OrderItem.shipped_at, OrderItem.delivered_at, OrderItem.returned_at,
+                Product.name.label("product_name"), Product.brand, Product.category, Product.department,
+                Product.retail_price, Product.distribution_center_id,
+                DistributionCenter.name.label("distribution_center"),
+            )
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .outerjoin(DistributionCenter, DistributionCenter.id == Product.distribution_center_id)
+            .where(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.id)
+        )
+        with self.Session() as session:
+            orders = [dict(row) for row in session.execute(
+                select(*(getattr(Order, field) for field in ORDER_SUMMARY_FIELDS)).where(Order.order_id.in_(order_ids))
+            ).mappings()]
+            items = {}
+            for row in session.execute(items_query).mappings():
+                item = dict(row)
+                items.setdefault(item.pop("order_id"), []).append(item)
+        for order in orders:
+            order["items"] = items.get(order["order_id"], [])
+            order["total"] = sum(item["retail_price"] or 0 for item in order["items"])
+        return orders
+
+    def find_many(self, collection_name, field, values, first=False):
+        if collection_name == "order_summaries":
+            return self._order_summaries(list(values))
+        model = MODELS[collection_name]
+        column = getattr(model, field)
+        if first:
+            # The lowest primary key per value, the row the single lookup's first() returns
+            key = model.__mapper__.primary_key[0]
+            return self._all(model, key.in_(select(func.min(key)).where(column.in_(list(values))).group_by(column)))
+        return self._all(model, column.in_(list(values)))
+
+    def iter_collection(self, collection_name, fields=None):
+        model = MODELS[collection_name]
+        query = select(*(getattr(model, field) for field in fields)) if fields else self._select(model)
+        with self.Session() as session:
+            for row in session.execute(query.execution_options(yield_per=SCAN_BATCH_SIZE)).mappings():
+                yield dict(row)
+
+    # Conversations
+
+    def _conversation(self, session, user_id, conversation_id):
+        return session.scalars(select(Conversation).where(
+            Conversation.user_id == str(user_id), Conversation.conversation_id == conversation_id
+        )).first()
+
+    def _append(self, session, user_id, conversation_id, messages):
+        now = datetime.utcnow()
+        conv = self._conversation(session, user_id, conversation_id)
+        if conv is None:
+            conv = Conversation(user_id=str(user_id), conversation_id=conversation_id,
+                                message_count=0, summary_upto=0, created_at=now)
+            session.add(conv)
+            session.flush()
+        for offset, message in enumerate(messages):
+            session.add(ConversationMessage(
+                conversation_pk=conv.id, seq=conv.message_count + offset,
+                sender=message["sender"], text=message["text"], timestamp=message.get("timestamp"),
+            ))
+        conv.message_count += len(messages)
+        conv.updated_at = now
+
+    def push_messages(self, user_id, conversation_id, messages):
+        self.push_message_batches([((user_id, conversation_id), messages)])
+
+    def push_message_batches(self, batches):
+        # One transaction for the whole batch; retried once if a concurrent writer
+        # created one of the conversations first
+        for attempt in range(2):
+            try:
+                with self.Session.begin() as session:
+                    for (user_id, conversation_id), messages in batches:
+                        self._append(session, user_id, conversation_id, messages)
+                return
+            except IntegrityError:
+                if attempt:
+                    raise
+
+    def get_conversation(self, user_id, conversation_id, limit, start=None):
+        with self.Session() as session:
+            conv = self._conversation(session, user_id, conversation_id)
+            if conv is None:
+                return None
+            query = select(ConversationMessage).where(ConversationMessage.conversation_pk == conv.id)
+            if start is None:
+                rows = list(session.scalars(query.order_by(ConversationMessage.seq.desc()).limit(limit)))[::-1]
+            else:
+                rows = list(session.scalars(
+                    query.where(ConversationMessage.seq >= start).order_by(ConversationMessage.seq).limit(limit)
+                ))
+            return {
+                "messages": [{"sender": r.sender, "text": r.text, "timestamp": r.timestamp} for r in rows],
+                "message_count": conv.message_count,
+                "summary": conv.summary,
+                "summary_upto": conv.summary_upto,
+                "created_at": conv.created_at,
+                "updated_at": conv.updated_at,
+            }
+
+    def set_message_text(self, user_id, conversation_id, message_index, text):
+        with self.Session.begin() as session:
+            conv = self._conversation(session, user_id, conversation_id)
+            if conv is None:
+                return
+            session.execute(update(ConversationMessage).where(
+                ConversationMessage.conversation_pk == conv.id, ConversationMessage.seq == message_index
+            ).values(text=text))
+            conv.updated_at = datetime.utcnow()
+
+    def update_summary(self, user_id, conversation_id, summary, summary_upto, previous_upto):
+        with self.Session.begin() as session:
+            result = session.execute(update(Conversation).where(
+                Conversation.user_id == str(user_id),
+                Conversation.conversation_id == conversation_id,
+                Conversation.summary_upto == (previous_upto or 0),
+            ).values(summary=summary, summary_upto=summary_upto))
+            return result.rowcount == 1
+
+    # Bulk load
+
+    def load_records(self, collection_name, chunks):
+        """Replace a table's rows with the given chunks of records in one transaction."""
+        model = MODELS[collection_name]
+        columns = {column.name for column in model.__table__.columns}
+        loaded = 0
+        with self.Session.begin() as session:
+            session.query(model).delete()
+            for records in chunks:
+                rows = [{k: v for k, v in record.items() if k in columns} for record in records]
+                if rows:
+                    session.execute(model.__table__.insert(), rows)
+                    loaded += len(rows)
+        return loaded
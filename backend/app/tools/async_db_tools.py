@@ -0,0 +1,134 @@
+import asyncio
+from app.services.storage import get_backend
+from app.tools.geo import center_index, nearest_center_result, user_location
+from app.tools.inventory import inventory_snapshot
+from app.tools.order_history import parse_options, order_page, status_summary
+from app.tools.product_search import product_index, parse_filters
+from app.tools.tool_cache import cached_tool, tool_cache, TOOL_CACHE_ENABLED
+
+# Async counterparts of app.tools.db_tools, used by the async /api/chat path.
+# Function names match db_tools so the two modules are interchangeable.
+
+@cached_tool("orders")
+async def query_orders_by_order_id(order_id: str):
+    return await get_backend().query_orders_by_order_id_async(int(order_id))
+
+@cached_tool("products")
+async def query_products_by_name(name: str):
+    if product_index.ready:
+        return product_index.best(name)
+    return await get_backend().query_products_by_name_async(name)
+
+@cached_tool("products")
+async def search_products(query: str, *filters: str):
+    if not product_index.ready:
+        product = await get_backend().query_products_by_name_async(query)
+        return [product] if product else []
+    return [product for _, product in product_index.search(query, **parse_filters(filters))]
+
+@cached_tool("users")
+async def query_user_by_email(email: str):
+    return await get_backend().query_user_by_email_async(email)
+
+@cached_tool("inventory_items")
+async def query_inventory_by_product_id(product_id: str):
+    return await get_backend().query_inventory_by_product_id_async(int(product_id))
+
+@cached_tool("inventory_stock")
+async def query_product_stock(product_id: str):
+    if not inventory_snapshot.ready:
+        await asyncio.to_thread(inventory_snapshot.refresh)
+    return inventory_snapshot.product_stock(int(product_id))
+
+@cached_tool("distribution_centers")
+async def query_distribution_center_by_id(dc_id: str):
+    return await get_backend().query_distribution_center_by_id_async(int(dc_id))
+
+@cached_tool("order_items")
+async def query_order_items_by_order_and_user(order_id: str, user_id: str):
+    return await get_backend().query_order_items_by_order_and_user_async(int(order_id), int(user_id))
+
+@cached_tool("order_history")
+async def query_orders_by_user_id(user_id: str, *options: str):
+    summary, limit, before = parse_options(options)
+    if summary:
+        return status_summary(int(user_id), await get_backend().query_order_status_counts_async(int(user_id)))
+    return order_page(int(user_id), await get_backend().query_orders_by_user_id_async(int(user_id), limit + 1, before), limit)
+
+@cached_tool("products")
+async def query_product_by_id(product_id: str):
+    return await get_backend().query_product_by_id_async(int(product_id))
+
+@cached_tool("users")
+async def query_user_by_id(user_id: str):
+    return await get_backend().query_user_by_id_async(int(user_id))
+
+@cached_tool("inventory_items")
+async def query_inventory_item_by_id(item_id: str):
+    return await get_backend().query_inventory_item_by_id_async(int(item_id))
+
+@cached_tool("order_items")
+async def query_order_item_by_id(order_item_id: str):
+    return await get_backend().query_order_item_by_id_async(int(order_item_id))
+
+@cached_tool("order_summaries")
+async def query_order_summary(order_id: str):
+    return await get_backend().query_order_summary_async(int(order_id))
+
+@cached_tool("nearest_distribution_centers")
+async def query_nearest_distribution_center(*location: str):
+    if not center_index.ready:
+        await asyncio.to_thread(center_index.refresh)
+    if len(location) == 2:
+        return nearest_center_result(float(location[0]), float(location[1]))
+    user = user_location(await get_backend().query_user_location_async(int(location[0])))
+    return nearest_center_result(user["latitude"], user["longitude"], user) if user else None
+
+
+# Single-key lookups that can be answered for many keys with one `$in` query:
+# function name -> (collection, field, key type). Used by the batch chat endpoint.
+BATCH_LOOKUPS = {
+    "query_orders_by_order_id": ("orders", "order_id", int),
+    "query_products_by_name": ("products", "name", str),
+    "query_user_by_email": ("users", "email", str),
+    "query_inventory_by_product_id": ("inventory_items", "product_id", int),
+    "query_distribution_center_by_id": ("distribution_centers", "id", int),
+    "query_product_by_id": ("products", "id", int),
+    "query_user_by_id": ("users", "id", int),
+    "query_inventory_item_by_id": ("inventory_items", "id", int),
+    "query_order_item_by_id": ("order_items", "id", int),
+    "query_order_summary": ("order_summaries", "order_id", int),
+}
+# Lookups on a field many records share (a product has many inventory items): the
+# database returns only the first record per key instead of every match
+FIRST_MATCH_LOOKUPS = {"query_products_by_name", "query_inventory_by_product_id"}
+
+async def prefetch(function_name, keys):
+    """
+    Load `function_name(key)` for every key with a single query and store the results
+    (including "not found") in the tool cache, so the individual calls that follow are
+    cache hits. Returns the number of keys that were fetched from the database.
+    """
+    if not TOOL_CACHE_ENABLED or function_name not in BATCH_LOOKUPS:
+        return 0
+    if function_name == "query_products_by_name" and product_index.ready:
+        return 0  # answered from the in-memory search index, and not by exact name
+    collection, field, key_type = BATCH_LOOKUPS[function_name]
+    missing = {}
+    for key in dict.fromkeys(keys):
+        if tool_cache.contains((collection, function_name, (key,))):
+            continue
+        try:
+            missing[key] = key_type(key)
+        except ValueError:
+            continue  # the individual call reports the bad id
+    if not missing:
+        return 0
+    found = {}
+    first = function_name in FIRST_MATCH_LOOKUPS
+    for doc in await get_backend().find_many_async(collection, field, list(set(missing.values())), first=first):
+        # Keep the first match per key, like the find_one behind the single lookup
+        found.setdefault(doc[field], doc)
+    for key, value in missing.items():
+        tool_cache.put((collection, function_name, (key,)), found.get(value))
+    return len(missing)
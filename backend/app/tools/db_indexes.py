@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+from pymongo import ASCENDING, DESCENDING
+from app.services.database import get_mongo_db
+
+# Indexes backing the lookups in app/tools/db_tools.py and the conversation store.
+# collection -> list of (keys, options)
+INDEX_SPECS = {
+    "orders": [
+        ([("order_id", ASCENDING)], {}),
+        # User order history in page order (order_id breaks ties); also serves plain user_id lookups
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)], {}),
+    ],
+    "users": [
+        ([("id", ASCENDING)], {}),
+        ([("email", ASCENDING)], {}),
+    ],
+    "products": [
+        ([("id", ASCENDING)], {}),
+        ([("name", ASCENDING)], {}),
+    ],
+    "inventory_items": [
+        ([("id", ASCENDING)], {}),
+        ([("product_id", ASCENDING)], {}),
+    ],
+    "order_items": [
+        ([("id", ASCENDING)], {}),
+        ([("order_id", ASCENDING), ("user_id", ASCENDING)], {}),
+    ],
+    "distribution_centers": [
+        ([("id", ASCENDING)], {}),
+    ],
+    "order_summaries": [
+        ([("order_id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING)], {}),
+    ],
+    "conversations": [
+        ([("user_id", ASCENDING), ("conversation_id", ASCENDING)], {"unique": True}),
+    ],
+}
+
+# Query shape of each tool, used by check mode to explain() the real filters
+TOOL_QUERIES = {
+    "query_orders_by_order_id": ("orders", {"order_id": 1}),
+    "query_orders_by_user_id": ("orders", {"user_id": 1}),
+    "query_order_status_counts": ("orders", {"user_id": 1}),
+    "query_products_by_name": ("products", {"name": ""}),
+    "query_product_by_id": ("products", {"id": 1}),
+    "query_user_by_email": ("users", {"email": ""}),
+    "query_user_by_id": ("users", {"id": 1}),
+    "query_inventory_by_product_id": ("inventory_items", {"product_id": 1}),
+    "query_inventory_item_by_id": ("inventory_items", {"id": 1}),
+    "query_distribution_center_by_id": ("distribution_centers", {"id": 1}),
+    "query_order_items_by_order_and_user": ("order_items", {"order_id": 1, "user_id": 1}),
+    "query_order_item_by_id": ("order_items", {"id": 1}),
+    "query_order_summary": ("order_summaries", {"order_id": 1}),
+    "get_conversation": ("conversations", {"user_id": 1, "conversation_id": ""}),
+}
+
+
+def ensure_indexes(collections=None):
+    """Create any index from INDEX_SPECS that does not exist yet. Returns the names created."""
+    created = []
+    for collection_name, specs in INDEX_SPECS.items():
+        if collections and collection_name not in collections:
+            continue
+        collection = get_mongo_db()[collection_name]
+        existing = {tuple(info["key"]) for info in collection.index_information().values()}
+        for keys, options in specs:
+            if tuple(keys) in existing:
+                continue
+            created.append(f"{collection_name}.{collection.create_index(keys, **options)}")
+    return created
+
+def plan_stages(plan):
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+def check_indexes():
+    """explain() every tool query; returns the tools whose winning plan is a COLLSCAN."""
+    collscans = []
+    for tool_name, (collection_name, query) in TOOL_QUERIES.items():
+        explain = get_mongo_db()[collection_name].find(query).explain()
+        planner = explain.get("queryPlanner", {})
+        if "COLLSCAN" in plan_stages(planner.get("winningPlan", {})):
+            collscans.append(tool_name)
+    return collscans
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or check the indexes used by the chatbot tools")
+    parser.add_argument("--check", action="store_true", help="fail if any tool query would do a COLLSCAN")
+    args = parser.parse_args()
+    if args.check:
+        failing = check_indexes()
+        for tool_name in failing:
+            print(f"COLLSCAN: {tool_name} on '{TOOL_QUERIES[tool_name][0]}'")
+        if failing:
+            sys.exit(1)
+        print("All tool queries use an index.")
+    else:
+        created = ensure_indexes()
+        print(f"Created {len(created)} indexes: {', '.join(created)}" if created else "All indexes already exist.")
@@ -1,33 +1,83 @@
-def query_orders_by_user_id(user_id: str):
-    return list(db.orders.find({"user_id": int(user_id)}))
+from app.services.storage import get_backend
+from app.tools.geo import nearest_center_result, user_location
+from app.tools.inventory import inventory_snapshot
+from app.tools.order_history import parse_options, order_page, status_summary
+from app.tools.product_search import product_index, parse_filters
+from app.tools.tool_cache import cached_tool
 
+@cached_tool("order_history")
+def query_orders_by_user_id(user_id: str, *options: str):
+    # A page of the most recent orders, or counts per status with the "summary" option
+    summary, limit, before = parse_options(options)
+    if summary:
+        return status_summary(int(user_id), get_backend().query_order_status_counts(int(user_id)))
+    return order_page(int(user_id), get_backend().query_orders_by_user_id(int(user_id), limit + 1, before), limit)
+
+@cached_tool("products")
 def query_product_by_id(product_id: str):
-    return db.products.find_one({"id": int(product_id)})
+    return get_backend().query_product_by_id(int(product_id))
 
+@cached_tool("users")
 def query_user_by_id(user_id: str):
-    return db.users.find_one({"id": int(user_id)})
+    return get_backend().query_user_by_id(int(user_id))
 
+@cached_tool("inventory_items")
 def query_inventory_item_by_id(item_id: str):
-    return db.inventory_items.find_one({"id": int(item_id)})
+    return get_backend().query_inventory_item_by_id(int(item_id))
 
+@cached_tool("order_items")
 def query_order_item_by_id(order_item_id: str):
-    return db.order_items.find_one({"id": int(order_item_id)})
-from app.services.database import db
+    return get_backend().query_order_item_by_id(int(order_item_id))
 
+@cached_tool("orders")
 def query_orders_by_order_id(order_id: str):
-    return db.orders.find_one({"order_id": int(order_id)})
+    return get_backend().query_orders_by_order_id(int(order_id))
 
+@cached_tool("products")
 def query_products_by_name(name: str):
-    return db.products.find_one({"name": name})
+    # Typo-tolerant once the search index is built; exact name match until then
+    if product_index.ready:
+        return product_index.best(name)
+    return get_backend().query_products_by_name(name)
+
+@cached_tool("products")
+def search_products(query: str, *filters: str):
+    if not product_index.ready:
+        product = get_backend().query_products_by_name(query)
+        return [product] if product else []
+    return [product for _, product in product_index.search(query, **parse_filters(filters))]
 
+@cached_tool("users")
 def query_user_by_email(email: str):
-    return db.users.find_one({"email": email})
+    return get_backend().query_user_by_email(email)
 
+@cached_tool("inventory_items")
 def query_inventory_by_product_id(product_id: str):
-    return db.inventory_items.find_one({"product_id": int(product_id)})
+    return get_backend().query_inventory_by_product_id(int(product_id))
+
+@cached_tool("inventory_stock")
+def query_product_stock(product_id: str):
+    # Stock count, holding distribution centers and average cost, from the inventory snapshot
+    if not inventory_snapshot.ready:
+        inventory_snapshot.refresh()
+    return inventory_snapshot.product_stock(int(product_id))
 
+@cached_tool("distribution_centers")
 def query_distribution_center_by_id(dc_id: str):
-    return db.distribution_centers.find_one({"id": int(dc_id)})
+    return get_backend().query_distribution_center_by_id(int(dc_id))
 
+@cached_tool("order_items")
 def query_order_items_by_order_and_user(order_id: str, user_id: str):
-    return list(db.order_items.find({"order_id": int(order_id), "user_id": int(user_id)}))
+    return get_backend().query_order_items_by_order_and_user(int(order_id), int(user_id))
+
+@cached_tool("order_summaries")
+def query_order_summary(order_id: str):
+    return get_backend().query_order_summary(int(order_id))
+
+@cached_tool("nearest_distribution_centers")
+def query_nearest_distribution_center(*location: str):
+    # A user id, or a latitude and longitude
+    if len(location) == 2:
+        return nearest_center_result(float(location[0]), float(location[1]))
+    user = user_location(get_backend().query_user_location(int(location[0])))
+    return nearest_center_result(user["latitude"], user["longitude"], user) if user else None
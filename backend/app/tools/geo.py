@@ -0,0 +1,150 @@
+import argparse
+import time
+import numpy as np
+from app.services.snapshots import Snapshot, register
+
+# Nearest distribution center for a point, with the great-circle (haversine) distance.
+# The centers are held as NumPy arrays of radians, so one lookup is a single vectorized
+# pass over all of them and a batch of N points is an N x centers matrix.
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_MILE = 1.609344
+# Points per block in nearest_centers, bounding the temporary N x centers matrices
+BATCH_BLOCK = 65536
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance between points given in radians; arguments broadcast like NumPy arrays."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class DistributionCenterIndex(Snapshot):
+    collection = "distribution_centers"
+    fields = ("id", "name", "latitude", "longitude")
+
+    def __init__(self):
+        super().__init__()
+        self._state = ((), np.zeros(0), np.zeros(0))  # centers, latitudes, longitudes (radians)
+
+    def apply(self, records):
+        centers = tuple(record for record in records if record.get("latitude") is not None and record.get("longitude") is not None)
+        previous = self.centers
+        if centers == previous:
+            return 0
+        # A handful of centers: compare them all
+        changed = sum(center not in previous for center in centers) + sum(center not in centers for center in previous)
+        self._state = (
+            centers,
+            np.radians([center["latitude"] for center in centers]),
+            np.radians([center["longitude"] for center in centers]),
+        )
+        return changed
+
+    def nearest(self, latitude, longitude, count=1):
+        """[(distance_km, center)] for the `count` closest centers to one point, closest first."""
+        centers, lat, lon = self._state
+        if not centers:
+            return []
+        distances = haversine_km(np.radians(latitude), np.radians(longitude), lat, lon)
+        order = np.argsort(distances, kind="stable")[:count]
+        return [(float(distances[i]), centers[i]) for i in order]
+
+    def nearest_centers(self, latitudes, longitudes):
+        """
+        Batch mode: for arrays of points (degrees), the index into `centers` of each
+        point's nearest center and the distance to it in km.
+        """
+        _, center_lat, center_lon = self._state
+        lat = np.radians(np.asarray(latitudes, dtype=float))
+        lon = np.radians(np.asarray(longitudes, dtype=float))
+        indexes = np.empty(len(lat), dtype=np.intp)
+        distances = np.empty(len(lat))
+        for start in range(0, len(lat), BATCH_BLOCK):
+            block = slice(start, start + BATCH_BLOCK)
+            matrix = haversine_km(lat[block, None], lon[block, None], center_lat[None, :], center_lon[None, :])
+            indexes[block] = matrix.argmin(axis=1)
+            distances[block] = matrix[np.arange(len(matrix)), indexes[block]]
+        return indexes, distances
+
+    @property
+    def centers(self):
+        return self._state[0]
+
+
+center_index = register(DistributionCenterIndex())
+
+
+def nearest_center_result(latitude, longitude, location=None, alternatives=2):
+    """Tool result for the center closest to a point, plus the next `alternatives` closest."""
+    if not center_index.ready:
+        center_index.refresh()
+    found = center_index.nearest(latitude, longitude, count=1 + alternatives)
+    if not found:
+        return None
+    distance, center = found[0]
+    return {
+        **(location or {"latitude": latitude, "longitude": longitude}),
+        "distribution_center_id": center["id"],
+        "distribution_center": center["name"],
+        "distance_km": round(distance, 1),
+        "distance_miles": round(distance / KM_PER_MILE, 1),
+        "alternatives": [
+            {"distribution_center_id": other["id"], "distribution_center": other["name"], "distance_km": round(km, 1)}
+            for km, other in found[1:]
+        ],
+    }
+
+def user_location(user):
+    """The location part of a tool result for a query_user_location record, or None without coordinates."""
+    if not user or user.get("latitude") is None or user.get("longitude") is None:
+        return None
+    return {"user_id": user["id"], **{key: user.get(key) for key in ("city", "state", "country", "latitude", "longitude")}}
+
+def assign_users(batch_size=None):
+    """
+    Nearest center of every user with coordinates, streaming the users table once:
+    yields (user ids, center ids, distances in km) arrays per batch.
+    """
+    from app.services.storage import get_backend
+    from app.services.storage.base import SCAN_BATCH_SIZE
+    batch_size = batch_size or SCAN_BATCH_SIZE
+    if not center_index.ready:
+        center_index.refresh()
+    center_ids = np.array([center["id"] for center in center_index.centers])
+    ids, lats, lons = [], [], []
+
+    def flush():
+        indexes, distances = center_index.nearest_centers(lats, lons)
+        result = (np.array(ids), center_ids[indexes], distances)
+        ids.clear()
+        lats.clear()
+        lons.clear()
+        return result
+
+    for user in get_backend().iter_collection("users", ("id", "latitude", "longitude")):
+        if user["latitude"] is None or user["longitude"] is None:
+            continue
+        ids.append(user["id"])
+        lats.append(user["latitude"])
+        lons.append(user["longitude"])
+        if len(ids) >= batch_size:
+            yield flush()
+    if ids:
+        yield flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign every user to their nearest distribution center")
+    parser.add_argument("--batch-size", type=int, help="users per vectorized batch")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    counts, totals = {}, {}
+    for _, centers, distances in assign_users(args.batch_size):
+        for center_id in np.unique(centers).tolist():
+            mask = centers == center_id
+            counts[center_id] = counts.get(center_id, 0) + int(mask.sum())
+            totals[center_id] = totals.get(center_id, 0.0) + float(distances[mask].sum())
+    names = {center["id"]: center["name"] for center in center_index.centers}
+    for center_id in sorted(counts, key=counts.get, reverse=True):
+        print(f"{names[center_id]:45} {counts[center_id]:>8} users, mean {totals[center_id] / counts[center_id]:.0f} km")
+    print(f"Assigned {sum(counts.values())} users in {time.perf_counter() - started:.2f}s.")
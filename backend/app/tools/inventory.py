@@ -0,0 +1,208 @@
+import argparse
+import sys
+import time
+import numpy as np
+from app.services.snapshots import Snapshot, register
+from app.tools.geo import center_index
+
+# Stock questions (how many units of a product are in stock, at which distribution
+# centers, at what cost) answered from a columnar copy of inventory_items instead of a
+# collection scan. Every item is one row of small NumPy columns, in stock while its
+# sold_at is null, and the totals per (product, distribution center) are kept sorted
+# by product, so a lookup is one binary search and a short slice.
+# A refresh re-scans the collection into new columns; the totals are only adjusted for
+# the items that changed unless they are more than this share of all items, then they
+# are regrouped.
+REGROUP_RATIO = 0.1
+# Distribution center id of items that have none
+NO_CENTER = -1
+
+
+def _int_column(values):
+    """The smallest signed integer array that holds `values`."""
+    values = np.array(values, dtype=np.int64)
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return values
+
+def _group_keys(products, centers):
+    # Product in the high 32 bits, so all centers of a product form one sorted run
+    return (products.astype(np.int64) << 32) | (centers.astype(np.int64) & 0xFFFFFFFF)
+
+def _center_id(key):
+    center = key & 0xFFFFFFFF
+    return center - (1 << 32) if center >= 1 << 31 else center
+
+
+class _State:
+    """One immutable version of the snapshot: item columns sorted by id, and the totals."""
+
+    columns = ("ids", "products", "centers", "costs", "in_stock")
+    totals = ("keys", "units", "stock", "cost_sums", "stock_cost_sums")
+
+    def __init__(self, ids=(), products=(), centers=(), costs=(), in_stock=()):
+        order = np.argsort(np.asarray(ids, dtype=np.int64), kind="stable")
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.products = _int_column(products)[order]
+        self.centers = _int_column(centers)[order]
+        self.costs = np.asarray(costs, dtype=np.float32)[order]
+        self.in_stock = np.asarray(in_stock, dtype=bool)[order]
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.units = self.stock = np.zeros(0, dtype=np.int32)
+        self.cost_sums = self.stock_cost_sums = np.zeros(0)
+
+    @classmethod
+    def from_records(cls, records):
+        # Streams the records: only the columns are held, never the whole collection as dicts
+        ids, products, centers, costs, in_stock = [], [], [], [], []
+        for record in records:
+            product = record.get("product_id")
+            if product is None:
+                continue
+            center = record.get("product_distribution_center_id")
+            ids.append(record["id"])
+            products.append(product)
+            centers.append(NO_CENTER if center is None else center)
+            costs.append(record.get("cost") or 0.0)
+            in_stock.append(record.get("sold_at") is None)
+        return cls(ids, products, centers, costs, in_stock)
+
+    def row_keys(self, rows=slice(None)):
+        return _group_keys(self.products[rows], self.centers[rows])
+
+    def group(self):
+        self.keys, groups = np.unique(self.row_keys(), return_inverse=True)
+        self._set_totals(groups, len(self.keys))
+
+    def move(self, previous, removed, added):
+        """Totals of `previous` with its `removed` rows taken out and this state's `added` rows put in."""
+        self.keys = previous.keys
+        out = np.searchsorted(self.keys, previous.row_keys(removed))
+        into = np.searchsorted(self.keys, self.row_keys(added))
+        size = len(self.keys)
+
+        def delta(weights_out=None, weights_in=None):
+            return (np.bincount(into, weights_in, minlength=size)
+                    - np.bincount(out, weights_out, minlength=size))
+
+        self.units = previous.units + delta().astype(np.int32)
+        self.stock = previous.stock + delta(previous.in_stock[removed], self.in_stock[added]).astype(np.int32)
+        self.cost_sums = previous.cost_sums + delta(previous.costs[removed], self.costs[added])
+        self.stock_cost_sums = previous.stock_cost_sums + delta(
+            previous.costs[removed] * previous.in_stock[removed], self.costs[added] * self.in_stock[added])
+
+    def _set_totals(self, groups, size):
+        self.units = np.bincount(groups, minlength=size).astype(np.int32)
+        self.stock = np.bincount(groups, self.in_stock, minlength=size).astype(np.int32)
+        self.cost_sums = np.bincount(groups, self.costs, minlength=size)
+        self.stock_cost_sums = np.bincount(groups, self.costs * self.in_stock, minlength=size)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.columns + self.totals)
+
+
+class InventorySnapshot(Snapshot):
+    collection = "inventory_items"
+    fields = ("id", "product_id", "product_distribution_center_id", "cost", "sold_at")
+
+    def __init__(self):
+        super().__init__()
+        self._state = _State()
+
+    @property
+    def size(self):
+        return len(self._state.ids)
+
+    @property
+    def nbytes(self):
+        return self._state.nbytes
+
+    def apply(self, records):
+        previous = self._state
+        state = _State.from_records(records)
+        if not len(previous.ids):
+            state.group()
+            self._state = state
+            return len(state.ids)
+        # Match every item to its previous row by id
+        positions = np.minimum(np.searchsorted(previous.ids, state.ids), len(previous.ids) - 1)
+        found = previous.ids[positions] == state.ids
+        same = found.copy()
+        for name in _State.columns[1:]:
+            same &= getattr(previous, name)[positions] == getattr(state, name)
+        kept = np.zeros(len(previous.ids), dtype=bool)
+        kept[positions[same]] = True
+        added = np.flatnonzero(~same)
+        removed = np.flatnonzero(~kept)
+        changed = len(added) + len(previous.ids) - int(found.sum())
+        if not changed:
+            return 0
+        if (len(added) + len(removed) > REGROUP_RATIO * len(state.ids)
+                or not np.isin(state.row_keys(added), previous.keys).all()):
+            state.group()
+        else:
+            state.move(previous, removed, added)
+        self._state = state
+        return changed
+
+    def product_stock(self, product_id):
+        """
+        Units of a product in stock and in total, its average cost, and the distribution
+        centers that hold it (most units first); None for a product with no items.
+        """
+        state = self._state
+        start, end = np.searchsorted(state.keys, [product_id << 32, (product_id + 1) << 32])
+        units = int(state.units[start:end].sum())
+        if not units:
+            return None
+        in_stock = int(state.stock[start:end].sum())
+        names = {center["id"]: center["name"] for center in center_index.centers}
+        centers = []
+        for key, stock in zip(state.keys[start:end].tolist(), state.stock[start:end].tolist()):
+            center = _center_id(key)
+            if stock and center != NO_CENTER:
+                centers.append({"distribution_center_id": center, "distribution_center": names.get(center), "in_stock": stock})
+        stock_costs = float(state.stock_cost_sums[start:end].sum())
+        return {
+            "product_id": product_id,
+            "in_stock": in_stock,
+            "sold": units - in_stock,
+            "units": units,
+            "average_cost": round(float(state.cost_sums[start:end].sum()) / units, 2),
+            "average_in_stock_cost": round(stock_costs / in_stock, 2) if in_stock else None,
+            "distribution_centers": sorted(centers, key=lambda center: -center["in_stock"]),
+        }
+
+
+inventory_snapshot = register(InventorySnapshot())
+
+
+def dict_bytes(records):
+    """Memory held by a list of flat dicts: the list, the dicts, and every distinct key and value."""
+    seen = set()
+    total = sys.getsizeof(records)
+    for record in records:
+        total += sys.getsizeof(record)
+        for item in (*record.keys(), *record.values()):
+            if id(item) not in seen:
+                seen.add(id(item))
+                total += sys.getsizeof(item)
+    return total
+
+
+if __name__ == "__main__":
+    from app.services.storage import get_backend
+    parser = argparse.ArgumentParser(description="Build the inventory snapshot and compare its memory with the documents as dicts")
+    parser.parse_args()
+    started = time.perf_counter()
+    records = list(get_backend().iter_collection(InventorySnapshot.collection, InventorySnapshot.fields))
+    print(f"Scanned {len(records)} inventory items in {time.perf_counter() - started:.2f}s.")
+    started = time.perf_counter()
+    inventory_snapshot.apply(records)
+    print(f"Built the snapshot in {time.perf_counter() - started:.2f}s.")
+    as_dicts = dict_bytes(records)
+    print(f"As dicts:        {as_dicts / 2**20:8.1f} MiB")
+    print(f"As NumPy arrays: {inventory_snapshot.nbytes / 2**20:8.1f} MiB ({as_dicts / max(inventory_snapshot.nbytes, 1):.0f}x smaller)")
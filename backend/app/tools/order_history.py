@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timezone
+from app.services.storage.base import ORDER_HISTORY_LIMIT
+
+# Options of the query_orders_by_user_id tool, after the user id:
+#   summary              - order counts and latest dates per status, aggregated by the database
+#   limit=<n>            - orders per page (default ORDER_HISTORY_LIMIT, at most ORDER_HISTORY_MAX_LIMIT)
+#   before=<next_before> - the page after the one whose `next_before` this is; a plain
+#                          datetime lists the orders created before it
+# A page is the user's most recent orders, so memory and prompt size stay the same
+# however many orders the user has. Pages run in (created_at, order_id) order, newest
+# first, with undated orders last; `next_before` is the "created_at,order_id" key of a
+# page's last order (created_at empty when it has none), so orders sharing a timestamp
+# are never split from or skipped across a page boundary.
+ORDER_HISTORY_MAX_LIMIT = int(os.getenv("ORDER_HISTORY_MAX_LIMIT", "50"))
+SUMMARY_OPTIONS = {"summary", "by_status", "status"}
+
+
+def parse_before(value):
+    """
+    Keyset bound of a page as (created_at, order_id): created_at is naive UTC, like the
+    stored datetimes, or None for undated orders; order_id is None for a plain datetime.
+    """
+    created_at, _, order_id = value.strip().partition(",")
+    created_at, order_id = created_at.strip(), order_id.strip()
+    if not created_at and not order_id:
+        raise ValueError(f"Invalid before bound: {value!r}")
+    before = None
+    if created_at:
+        before = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        if before.tzinfo is not None:
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+    return before, int(order_id) if order_id else None
+
+def parse_options(options):
+    """("summary", "limit=5", "before=2023-05-01 10:00:00,123") -> (summary, limit, before); other options are ignored."""
+    summary, limit, before = False, ORDER_HISTORY_LIMIT, None
+    for option in options:
+        key, _, value = option.partition("=")
+        key = key.strip().lower()
+        if key in SUMMARY_OPTIONS and not value:
+            summary = True
+        elif key == "limit" and value.strip().isdigit():
+            limit = max(1, min(int(value), ORDER_HISTORY_MAX_LIMIT))
+        elif key == "before" and value.strip():
+            before = parse_before(value)
+    return summary, limit, before
+
+def _datetime(value):
+    # SQLite returns the stored datetimes as they were written, possibly with a timezone
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def order_page(user_id, orders, limit):
+    """
+    Tool result for one page of orders fetched with limit + 1, so whether there is a
+    next page is known without counting. None when the user has no orders in the range.
+    """
+    if not orders:
+        return None
+    page = orders[:limit]
+    result = {"user_id": user_id, "orders": page}
+    if len(orders) > limit:
+        created_at = _datetime(page[-1].get("created_at"))
+        result["next_before"] = f"{created_at.isoformat(sep=' ') if created_at is not None else ''},{page[-1]['order_id']}"
+    return result
+
+def status_summary(user_id, statuses):
+    if not statuses:
+        return None
+    return {"user_id": user_id, "total_orders": sum(status["count"] for status in statuses), "statuses": statuses}
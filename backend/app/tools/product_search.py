@@ -0,0 +1,155 @@
+import os
+import re
+import numpy as np
+from app.services.snapshots import Snapshot, register
+
+# In-process fuzzy search over product names, so a misspelled or partial name from a
+# TOOL_CALL still finds the product instead of costing the user another round trip.
+# Names are indexed by character trigrams (with the word boundaries padded, so
+# prefixes count): a query scores each product by the share of its trigrams found in
+# the name, blended with the Dice coefficient so names of similar length rank first.
+# One typo only breaks the (up to three) trigrams around it.
+PRODUCT_SEARCH_ENABLED = os.getenv("PRODUCT_SEARCH", "1") == "1"
+PRODUCT_SEARCH_LIMIT = int(os.getenv("PRODUCT_SEARCH_LIMIT", "5"))
+# Scores run from 0 to 1 (exact name). Results below the first are dropped; the
+# single-product lookup only takes a match above the second.
+PRODUCT_SEARCH_MIN_SCORE = float(os.getenv("PRODUCT_SEARCH_MIN_SCORE", "0.3"))
+PRODUCT_MATCH_MIN_SCORE = float(os.getenv("PRODUCT_MATCH_MIN_SCORE", "0.5"))
+FILTER_FIELDS = ("brand", "category", "department")
+# A refresh patches the index in place unless more than this share of it would be
+# replaced or removed products, then it is rebuilt
+REBUILD_RATIO = 0.25
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    return _NON_WORD.sub(" ", str(text or "").lower()).strip()
+
+def trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def parse_filters(filters):
+    """["brand=Nike", "department=Men"] -> {"brand": "Nike", "department": "Men"}; other keys are ignored."""
+    parsed = {}
+    for item in filters:
+        field, _, value = item.partition("=")
+        if field.strip().lower() in FILTER_FIELDS and value.strip():
+            parsed[field.strip().lower()] = value.strip()
+    return parsed
+
+
+class _State:
+    """One immutable version of the index; a refresh builds the next one aside."""
+
+    def __init__(self):
+        self.docs = []           # slot -> product (replaced and removed products keep their slot, dead)
+        self.names = []          # slot -> normalized name
+        self.slots = {}          # product id -> live slot
+        self.alive = np.zeros(0, dtype=bool)
+        self.gram_counts = np.zeros(0, dtype=np.int32)
+        self.postings = {}       # trigram -> array of slots
+        self.facets = {field: ({}, np.zeros(0, dtype=np.int32)) for field in FILTER_FIELDS}  # value -> code, slot -> code
+
+    def extend(self, products, removed=()):
+        """A copy of this state with `products` added or replaced and `removed` ids dropped."""
+        state = _State()
+        start = len(self.docs)
+        state.docs = self.docs + products
+        state.names = self.names + [normalize(product.get("name")) for product in products]
+        state.slots = dict(self.slots)
+        alive = np.concatenate([self.alive, np.ones(len(products), dtype=bool)])
+        for product_id in removed:
+            alive[state.slots.pop(product_id)] = False
+        additions = {}
+        counts = np.empty(len(products), dtype=np.int32)
+        for offset, product in enumerate(products):
+            slot = start + offset
+            if product["id"] in state.slots:
+                alive[state.slots[product["id"]]] = False
+            state.slots[product["id"]] = slot
+            grams = trigrams(state.names[slot])
+            counts[offset] = len(grams)
+            for gram in grams:
+                additions.setdefault(gram, []).append(slot)
+        state.alive = alive
+        state.gram_counts = np.concatenate([self.gram_counts, counts])
+        state.postings = dict(self.postings)
+        for gram, slots in additions.items():
+            added = np.array(slots, dtype=np.intp)
+            state.postings[gram] = np.concatenate([self.postings[gram], added]) if gram in self.postings else added
+        for field in FILTER_FIELDS:
+            values, codes = self.facets[field]
+            values = dict(values)
+            new_codes = [values.setdefault(normalize(product.get(field)), len(values)) for product in products]
+            state.facets[field] = (values, np.concatenate([codes, np.array(new_codes, dtype=np.int32)]))
+        return state
+
+
+class ProductSearchIndex(Snapshot):
+    collection = "products"
+
+    def __init__(self):
+        super().__init__()
+        self._state = _State()
+
+    @property
+    def size(self):
+        return len(self._state.slots)
+
+    def apply(self, records):
+        state = self._state
+        current = {product["id"]: product for product in records}
+        upserts = [product for product_id, product in current.items()
+                   if product_id not in state.slots or state.docs[state.slots[product_id]] != product]
+        removed = [product_id for product_id in state.slots if product_id not in current]
+        if not upserts and not removed:
+            return 0
+        dead = len(state.docs) - len(state.slots) + len(removed) + sum(p["id"] in state.slots for p in upserts)
+        if dead > REBUILD_RATIO * (len(state.docs) + len(upserts)):
+            self._state = _State().extend(list(current.values()))
+        else:
+            self._state = state.extend(upserts, removed)
+        return len(upserts) + len(removed)
+
+    def search(self, query, brand=None, category=None, department=None,
+               limit=PRODUCT_SEARCH_LIMIT, min_score=PRODUCT_SEARCH_MIN_SCORE):
+        """[(score, product)], best first, optionally restricted to a brand, category and department."""
+        state = self._state
+        query_grams = trigrams(normalize(query))
+        postings = [state.postings[gram] for gram in query_grams if gram in state.postings]
+        if not postings:
+            return []
+        matched = np.bincount(np.concatenate(postings), minlength=len(state.docs))
+        # A score is at most 1.3x the share of query trigrams matched, so only these slots can reach min_score
+        candidates = np.flatnonzero(matched >= min_score / 1.3 * len(query_grams))
+        candidates = candidates[state.alive[candidates]]
+        for field, value in zip(FILTER_FIELDS, (brand, category, department)):
+            if value:
+                values, codes = state.facets[field]
+                code = values.get(normalize(value))
+                if code is None:
+                    return []
+                candidates = candidates[codes[candidates] == code]
+        hits = matched[candidates]
+        scores = 0.7 * hits / len(query_grams) + 0.6 * hits / (len(query_grams) + state.gram_counts[candidates])
+        if len(scores) > limit:
+            # Everything scoring at least the limit-th best, without sorting all candidates
+            kth = -np.partition(-scores, limit - 1)[limit - 1]
+            top = np.flatnonzero(scores >= max(kth, min_score))
+        else:
+            top = np.flatnonzero(scores >= min_score)
+        # Best first; equal scores keep slot (load) order
+        ranked = top[np.lexsort((top, -scores[top]))][:limit]
+        return [(round(float(scores[i]), 3), state.docs[candidates[i]]) for i in ranked]
+
+    def best(self, name):
+        """The product `name` most likely refers to, or None."""
+        results = self.search(name, limit=1, min_score=PRODUCT_MATCH_MIN_SCORE)
+        return results[0][1] if results else None
+
+
+product_index = ProductSearchIndex()
+if PRODUCT_SEARCH_ENABLED:
+    register(product_index)
@@ -0,0 +1,81 @@
+import os
+from datetime import datetime
+
+# Fields returned by the tool lookups, per collection. Everything the reply templates
+# (Think41ChatBot.format_tool_result) and the prompts use, and nothing else: no `_id`,
+# no addresses, coordinates or traffic sources of users, no denormalised product
+# columns on inventory items. Set TOOL_PROJECTIONS=0 to return whole documents.
+TOOL_FIELDS = {
+    "orders": ("order_id", "user_id", "status", "num_of_item", "created_at", "shipped_at", "delivered_at", "returned_at"),
+    "order_items": ("id", "order_id", "user_id", "product_id", "status", "created_at", "shipped_at", "delivered_at", "returned_at"),
+    "products": ("id", "name", "brand", "category", "department", "retail_price", "cost", "sku", "distribution_center_id"),
+    "users": ("id", "first_name", "last_name", "email", "age", "gender", "city", "state", "country"),
+    "inventory_items": ("id", "product_id", "product_name", "cost", "created_at", "sold_at"),
+    "distribution_centers": ("id", "name", "latitude", "longitude"),
+    "order_summaries": ("order_id", "user_id", "status", "num_of_item", "created_at", "shipped_at", "delivered_at", "returned_at", "total", "items"),
+}
+TOOL_PROJECTIONS = os.getenv("TOOL_PROJECTIONS", "1") == "1"
+
+# The subset that goes into LLM prompts. Internal costs, SKUs and coordinates are left
+# out; the model never needs them to answer a customer.
+PROMPT_FIELDS = {
+    "orders": ("order_id", "status", "num_of_item", "created_at", "shipped_at", "delivered_at", "returned_at"),
+    "order_items": ("id", "product_id", "status", "shipped_at", "delivered_at", "returned_at"),
+    "products": ("name", "brand", "category", "department", "retail_price"),
+    "users": ("first_name", "last_name", "email", "city", "state", "country"),
+    "inventory_items": ("product_id", "product_name", "created_at", "sold_at"),
+    "distribution_centers": ("id", "name"),
+    "order_summaries": ("order_id", "status", "created_at", "shipped_at", "delivered_at", "returned_at", "total", "items"),
+    "nearest_distribution_centers": ("city", "state", "country", "distribution_center", "distance_km", "distance_miles", "alternatives"),
+    "inventory_stock": ("product_id", "in_stock", "sold", "average_cost", "distribution_centers"),
+    "order_history": ("total_orders", "statuses", "orders", "next_before"),
+}
+# Fields of nested records (lists of dicts) that go into prompts; all of them by default
+PROMPT_ITEM_FIELDS = {
+    "order_summaries": ("product_name", "brand", "retail_price", "status", "distribution_center"),
+    "nearest_distribution_centers": ("distribution_center", "distance_km"),
+    "inventory_stock": ("distribution_center", "in_stock"),
+    # Pages of orders and the per-status summary
+    "order_history": PROMPT_FIELDS["orders"] + ("count", "latest_created_at", "latest_shipped_at",
+                                                "latest_delivered_at", "latest_returned_at"),
+}
+# Multi-row results (e.g. all orders of a user) are cut to this many rows in prompts
+PROMPT_MAX_ROWS = int(os.getenv("PROMPT_MAX_ROWS", "20"))
+
+
+def tool_fields(collection):
+    return TOOL_FIELDS.get(collection) if TOOL_PROJECTIONS else None
+
+def mongo_projection(collection):
+    fields = tool_fields(collection)
+    if fields is None:
+        return None
+    projection = {"_id": 0}
+    projection.update({field: 1 for field in fields})
+    return projection
+
+def _compact_value(value, item_fields=None):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, list):
+        return "[" + " | ".join(_compact_record(v, item_fields) if isinstance(v, dict) else _compact_value(v) for v in value) + "]"
+    return str(value)
+
+def _compact_record(record, fields, item_fields=None):
+    keys = fields or [key for key in record if key != "_id"]
+    return "; ".join(f"{key}={_compact_value(record[key], item_fields)}" for key in keys if record.get(key) not in (None, ""))
+
+def compact(result, collection=None, max_rows=PROMPT_MAX_ROWS):
+    """Short `key=value; ...` text of a tool result for prompts, one line per row."""
+    fields = PROMPT_FIELDS.get(collection)
+    item_fields = PROMPT_ITEM_FIELDS.get(collection)
+    if isinstance(result, list):
+        lines = [_compact_record(row, fields, item_fields) for row in result[:max_rows]]
+        if len(result) > max_rows:
+            lines.append(f"... and {len(result) - max_rows} more")
+        return "\n".join(lines)
+    if isinstance(result, dict):
+        return _compact_record(result, fields, item_fields)
+    return str(result)
@@ -0,0 +1,142 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a tool result stays valid, per collection. Reference data that only changes on
+# a CSV reload is kept for long; orders change status and are kept briefly.
+COLLECTION_TTLS = {
+    "distribution_centers": 3600,
+    "products": 600,
+    "users": 300,
+    "inventory_items": 60,
+    "inventory_stock": 60,
+    "orders": 30,
+    "order_items": 30,
+    "order_summaries": 30,
+    "order_history": 30,
+    "nearest_distribution_centers": 300,
+}
+DEFAULT_TTL = 60
+# Results built from several collections are cached under their own name and dropped
+# whenever one of their sources is invalidated
+DERIVED_COLLECTIONS = {
+    "orders": ("order_summaries", "order_history"),
+    "order_items": ("order_summaries",),
+    "products": ("order_summaries",),
+    "inventory_items": ("inventory_stock",),
+    "distribution_centers": ("order_summaries", "nearest_distribution_centers", "inventory_stock"),
+    "users": ("nearest_distribution_centers",),
+}
+# "Not found" results are cached too, but for less time so new rows show up quickly
+NEGATIVE_TTL = int(os.getenv("TOOL_CACHE_NEGATIVE_TTL", "15"))
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "4096"))
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "1") == "1"
+
+_MISSING = object()
+
+
+class ToolResultCache:
+    """Size-bounded LRU of tool results with a per-entry expiry time."""
+
+    def __init__(self, maxsize=TOOL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # (collection, tool, args) -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def _count(self, collection, counter):
+        stats = self.stats.setdefault(collection, {"hits": 0, "misses": 0, "negative_hits": 0, "evictions": 0})
+        stats[counter] += 1
+
+    def get(self, key):
+        collection = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._count(collection, "misses")
+                return _MISSING
+            self._entries.move_to_end(key)
+            self._count(collection, "hits")
+            if not entry[1]:
+                self._count(collection, "negative_hits")
+            return entry[1]
+
+    def contains(self, key):
+        # Like get() but without touching the LRU order or the stats
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def put(self, key, value):
+        collection = key[0]
+        ttl = COLLECTION_TTLS.get(collection, DEFAULT_TTL) if value else NEGATIVE_TTL
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._count(evicted[0], "evictions")
+
+    def invalidate(self, collection=None):
+        with self._lock:
+            if collection is None:
+                self._entries.clear()
+                return
+            collections = {collection, *DERIVED_COLLECTIONS.get(collection, ())}
+            for key in [k for k in self._entries if k[0] in collections]:
+                del self._entries[key]
+
+    def snapshot(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize,
+                    "collections": {c: dict(s) for c, s in self.stats.items()}}
+
+
+tool_cache = ToolResultCache()
+
+
+def cached_tool(collection):
+    """
+    Cache a db_tools lookup under `collection`'s TTL. Works for both the sync tools and
+    their async_db_tools counterparts. Cached documents are shared, so callers must not
+    mutate them.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args):
+                if not TOOL_CACHE_ENABLED:
+                    return await func(*args)
+                key = (collection, func.__name__, args)
+                value = tool_cache.get(key)
+                if value is _MISSING:
+                    value = await func(*args)
+                    tool_cache.put(key, value)
+                return value
+            async_wrapper.collection = collection
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            if not TOOL_CACHE_ENABLED:
+                return func(*args)
+            key = (collection, func.__name__, args)
+            value = tool_cache.get(key)
+            if value is _MISSING:
+                value = func(*args)
+                tool_cache.put(key, value)
+            return value
+        wrapper.collection = collection
+        return wrapper
+    return decorator
+
+def invalidate_collection(collection=None):
+    tool_cache.invalidate(collection)
+
+def cache_stats():
+    return tool_cache.snapshot()
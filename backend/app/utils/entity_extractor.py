@@ -0,0 +1,128 @@
+import os
+import re
+from collections import OrderedDict
+
+# All entity patterns compiled once into a single alternation so a message is scanned
+# in one finditer pass. The alternation sits in a lookahead, so a long match (e.g. a
+# product name running to the end of the line) does not hide entities inside it.
+ENTITY_PATTERN = re.compile(
+    r"""
+    (?=(?:
+      (?P<email>[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})
+    | order[\s\w]*?\bitems?\b[\s\w]*?\border[\s_]?id[\s:]*(?P<items_order_id>[A-Za-z0-9-]{3,})\b
+      [\s\w,]*?\buser[\s_]?id[\s:]*(?P<items_user_id>[A-Za-z0-9-]{3,})\b
+    | (?:what(?:'s|\s+is|\s+was|\s+were)\s+in|contents?\s+of|summary\s+of|where\s+is)\s+(?:my\s+|the\s+)?
+      order(?:\s*(?:id|number|no\.?))?[\s:\#]*(?P<summary_order_id>[0-9]{3,})\b
+    | (?:how\s+many|in\s+stock|which\s+(?:distribution\s+centers?|warehouses?|dcs?)\s+(?:has|have|holds?|stocks?))
+      [\s\w]*?product[\s_]?id[\s:]*(?P<stock_product_id>[A-Za-z0-9-]{3,})\b
+    | average\s+cost[\s\w]*?product[\s_]?id[\s:]*(?P<cost_product_id>[A-Za-z0-9-]{3,})\b
+    | order[\s\w]*?id[\s:]*(?P<order_id>[A-Za-z0-9-]{3,})\b
+    | product[\s_]?id[\s:]*(?P<product_id>[A-Za-z0-9-]{3,})\b
+    | product[\s\w]*?name[\s:]*['"]?(?P<product_name>[^'"\n]{3,})['"]?
+    | distribution[\s\w]*?center[\s\w]*?id[\s:]*(?P<dc_id>[A-Za-z0-9-]{3,})\b
+    | user[\s\w]*?id[\s:]*(?P<user_id>[A-Za-z0-9-]{3,})\b
+    ))
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+COMMON_WORDS = {"is", "it", "the", "a", "an"}
+STOPWORDS = {
+    "order_id": COMMON_WORDS | {"status", "order", "id"},
+    "items_order_id": COMMON_WORDS | {"status", "order", "id"},
+    "summary_order_id": set(),
+    "stock_product_id": COMMON_WORDS | {"id", "product"},
+    "cost_product_id": COMMON_WORDS | {"id", "product"},
+    "items_user_id": COMMON_WORDS | {"status", "order", "id", "user"},
+    "user_id": COMMON_WORDS | {"status", "order", "id", "user"},
+    "product_name": COMMON_WORDS | {"name", "product"},
+    "product_id": COMMON_WORDS | {"id", "product"},
+    "dc_id": COMMON_WORDS | {"id", "center", "distribution"},
+    "email": set(),
+}
+
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "1024"))
+
+
+def scan(text, entities=None):
+    """
+    Single pass over `text`. Records the first valid value of each entity type into
+    `entities` (existing values are kept, so earlier messages win) and returns it.
+    """
+    entities = {} if entities is None else entities
+    for match in ENTITY_PATTERN.finditer(text):
+        for name, value in match.groupdict().items():
+            if value is None or name in entities:
+                continue
+            value = value.strip()
+            if value.lower() not in STOPWORDS[name]:
+                entities[name] = value
+    # A full "order items" mention also provides the order and user ids
+    if "items_order_id" in entities and "items_user_id" in entities:
+        entities.setdefault("order_id", entities["items_order_id"])
+        entities.setdefault("user_id", entities["items_user_id"])
+    return entities
+
+def route(entities):
+    """Pick the tool call for the extracted entities, in the chatbot's routing priority."""
+    # An explicit "order items ... order id X ... user id Y" mention is more specific
+    # than a bare order id, so it is checked first
+    if "items_order_id" in entities and "items_user_id" in entities:
+        return "query_order_items", [entities["items_order_id"], entities["items_user_id"]]
+    # "what's in / where is order X" is answered from the order summary read model
+    if "summary_order_id" in entities:
+        return "query_order_summary", [entities["summary_order_id"]]
+    # Stock and cost questions about a product are answered from the inventory snapshot
+    if "stock_product_id" in entities:
+        return "query_product_stock", [entities["stock_product_id"]]
+    if "cost_product_id" in entities:
+        return "query_product_average_cost", [entities["cost_product_id"]]
+    if "order_id" in entities:
+        return "query_order_by_id", [entities["order_id"]]
+    if "product_name" in entities:
+        return "query_product_by_name", [entities["product_name"]]
+    if "email" in entities:
+        return "query_user_by_email", [entities["email"]]
+    if "product_id" in entities:
+        return "query_inventory_by_product_id", [entities["product_id"]]
+    if "dc_id" in entities:
+        return "query_distribution_center", [entities["dc_id"]]
+    return None, []
+
+
+class EntityExtractor:
+    """
+    Caches the entities found so far in each conversation, keyed like ConversationContext,
+    so a turn only scans the messages added since the previous turn.
+    """
+
+    def __init__(self, cache_size=ENTITY_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # key -> (scanned message_count, entities)
+
+    def entities_for(self, ctx, message):
+        key = ctx.key if ctx.user_id and ctx.conversation_id else None
+        cached = self._cache.get(key) if key else None
+        lines = list(ctx.lines)
+        if cached and 0 <= ctx.message_count - cached[0] <= len(lines):
+            entities = dict(cached[1])
+            new_lines = lines[len(lines) - (ctx.message_count - cached[0]):]
+        else:
+            entities = {}
+            new_lines = lines
+        for line in new_lines:
+            scan(line, entities)
+        # The current message may not be persisted yet; scanning it again later is harmless
+        scan(message, entities)
+        if key:
+            self._cache[key] = (ctx.message_count, entities)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entities
+
+    def extract(self, ctx, message):
+        return route(self.entities_for(ctx, message))
+
+    def clear(self):
+        self._cache.clear()
@@ -1,16 +1,106 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "json" (one object per line) or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Prompt/response bodies are cut to this many characters (0 = no limit) and only
+# logged for this fraction of calls
+LOG_BODY_CHARS = int(os.getenv("LOG_BODY_CHARS", "300"))
+LOG_BODY_SAMPLE_RATE = float(os.getenv("LOG_BODY_SAMPLE_RATE", "1.0"))
 
-logger = logging.getLogger("think41_chatbot")
-logger.setLevel(LOG_LEVEL)
+# Set per request by the middleware in app.main and by the chat routes
+request_id_var = ContextVar("request_id", default=None)
+conversation_id_var = ContextVar("conversation_id", default=None)
 
-handler = logging.StreamHandler()
-formatter = logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
-handler.setFormatter(formatter)
 
-if not logger.hasHandlers():
-    logger.addHandler(handler)
+class ContextFilter(logging.Filter):
+    """Stamps the current request and conversation ids on the record in the calling thread."""
 
-# Usage: from app.utils.logger import logger
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.conversation_id = conversation_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "module": record.module,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "conversation_id": getattr(record, "conversation_id", None),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The stock prepare()
+    formats the message before enqueueing, which puts the cost back on the request.
+    Records never leave the process, so the args do not need to be flattened.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class Truncated:
+    """Lazy log argument: the text is only cut (and copied) if the record is formatted."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        text = str(self.text)
+        if LOG_BODY_CHARS and len(text) > LOG_BODY_CHARS:
+            return f"{text[:LOG_BODY_CHARS]}... (+{len(text) - LOG_BODY_CHARS} chars)"
+        return text
+
+
+def setup_logging():
+    logger = logging.getLogger("think41_chatbot")
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    if logger.handlers:
+        return logger, None
+    handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s [%(request_id)s]: %(message)s'))
+    # Writes happen on the listener's thread; the request path only enqueues
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(ContextFilter())
+    listener = logging.handlers.QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(queue_handler)
+    return logger, listener
+
+
+logger, listener = setup_logging()
+
+def log_body(message, *args, level=logging.DEBUG):
+    """
+    Log a prompt, tool result or LLM reply (the last of `args`): lazily formatted,
+    truncated to LOG_BODY_CHARS and sampled at LOG_BODY_SAMPLE_RATE.
+    """
+    if logger.isEnabledFor(level) and (LOG_BODY_SAMPLE_RATE >= 1 or random.random() < LOG_BODY_SAMPLE_RATE):
+        logger.log(level, message, *args[:-1], Truncated(args[-1]), stacklevel=2)
+
+# Usage: from app.utils.logger import logger, log_body
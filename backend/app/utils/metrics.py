@@ -0,0 +1,136 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# In-process metrics rendered in the Prometheus text format on GET /metrics.
+# Stage timings are also collected per request for the Server-Timing response header.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Per-request {stage: seconds}, set by the HTTP middleware in app.main
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def _label_value(value):
+    # Exposition format escapes: backslash, double quote and line feed
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels)
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {entry[-2]:.6f}")
+                lines.append(f"{self.name}_count{_label_text(key)} {entry[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("think41_stage_duration_seconds", "Time spent in each stage of a chat turn")
+REQUEST_SECONDS = Histogram("think41_http_request_duration_seconds", "HTTP request duration by route")
+TOOL_CALLS = Counter("think41_tool_calls_total", "Database tool calls by tool and outcome")
+LLM_CALLS = Counter("think41_llm_calls_total", "LLM calls by purpose")
+LLM_TOKENS = Counter("think41_llm_tokens_total", "LLM tokens by purpose and direction")
+TURN_ROUTES = Counter("think41_turn_routes_total", "How each turn was answered: context extraction, LLM TOOL_CALL or plain LLM reply")
+SINGLE_FLIGHT_CALLS = Counter("think41_single_flight_calls_total", "Calls executed vs coalesced onto an identical in-flight call")
+LLM_QUEUE_DEPTH = Gauge("think41_llm_queue_depth", "LLM calls waiting for a concurrency slot")
+LLM_QUEUE_WAIT_SECONDS = Histogram("think41_llm_queue_wait_seconds", "Time LLM calls waited for a slot, by priority")
+LLM_REJECTED = Counter("think41_llm_rejected_total", "LLM calls rejected by the scheduler, by reason and priority")
+
+METRICS = [STAGE_SECONDS, REQUEST_SECONDS, TOOL_CALLS, LLM_CALLS, LLM_TOKENS, TURN_ROUTES, SINGLE_FLIGHT_CALLS,
+           LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_REJECTED]
+
+
+@contextmanager
+def timed(stage):
+    """Time a stage of the current turn into the stage histogram and the request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+def start_request_timings():
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+def server_timing_header(timings, total=None):
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+def record_llm_call(purpose, prompt_tokens, completion_tokens):
+    LLM_CALLS.inc(purpose=purpose)
+    LLM_TOKENS.inc(prompt_tokens, purpose=purpose, direction="prompt")
+    LLM_TOKENS.inc(completion_tokens, purpose=purpose, direction="completion")
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from app.utils.metrics import SINGLE_FLIGHT_CALLS
+
+# Coalesces identical concurrent calls: while a call for a key is in flight, callers
+# with the same key wait for it and share its result (or exception) instead of
+# starting their own. Nothing is kept once the call finishes; caching is a separate
+# layer (app/tools/tool_cache.py). Shared results must not be mutated by callers.
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}        # key -> _Call (threads)
+        self._tasks = {}        # key -> asyncio.Task (event loop)
+
+    def do(self, key, fn):
+        """Run fn() unless an identical call is already in flight on another thread."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, outcome="coalesced")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        SINGLE_FLIGHT_CALLS.inc(group=self.name, outcome="executed")
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key, fn):
+        """
+        Await fn() unless an identical call is already in flight. The call runs as its
+        own task, so a caller that is cancelled (e.g. client disconnect) does not cancel
+        it for the others.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, outcome="executed")
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+        else:
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, outcome="coalesced")
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        return len(self._calls) + len(self._tasks)
@@ -0,0 +1,120 @@
+"""
+Microbenchmark: the previous regex-per-entity extract_info_from_context vs the
+precompiled single-pass EntityExtractor with its per-conversation cache.
+
+Run from backend/:  python -m benchmarks.bench_entity_extractor [--turns 200]
+"""
+import argparse
+import random
+import re
+import time
+from collections import deque
+from app.utils.entity_extractor import EntityExtractor
+
+
+def legacy_match_context(context):
+    # Previous Think41ChatBot.extract_info_from_context body (minus logging)
+    order_id_match = re.search(r"order[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
+    if order_id_match:
+        order_id = order_id_match.group(1)
+        if order_id.lower() not in {"is", "it", "the", "a", "an", "status", "order", "id"}:
+            return "query_order_by_id", [order_id]
+    product_name_match = re.search(r"product[\s\w]*name[\s:]*['\"]?([^'\"\n]{3,})['\"]?", context, re.IGNORECASE)
+    if product_name_match:
+        pname = product_name_match.group(1).strip()
+        if pname.lower() not in {"is", "it", "the", "a", "an", "name", "product"}:
+            return "query_product_by_name", [pname]
+    email_match = re.search(r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", context)
+    if email_match:
+        return "query_user_by_email", [email_match.group(1)]
+    oi_order_id = re.search(r"order[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
+    oi_user_id = re.search(r"user[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
+    if oi_order_id and oi_user_id:
+        oid = oi_order_id.group(1)
+        uid = oi_user_id.group(1)
+        if oid.lower() not in {"is", "it", "the", "a", "an", "status", "order", "id"} and uid.lower() not in {"is", "it", "the", "a", "an", "status", "order", "id", "user"}:
+            return "query_order_items", [oid, uid]
+    product_id_match = re.search(r"product[\s_]?id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
+    if product_id_match:
+        pid = product_id_match.group(1)
+        if pid.lower() not in {"is", "it", "the", "a", "an", "id", "product"}:
+            return "query_inventory_by_product_id", [pid]
+    dc_id_match = re.search(r"distribution[\s\w]*center[\s\w]*id[\s:]*([A-Za-z0-9-]{3,})\b", context, re.IGNORECASE)
+    if dc_id_match:
+        dcid = dc_id_match.group(1)
+        if dcid.lower() not in {"is", "it", "the", "a", "an", "id", "center", "distribution"}:
+            return "query_distribution_center", [dcid]
+    return None, []
+
+
+class BenchContext:
+    # Minimal stand-in for ConversationContext (no database needed)
+    def __init__(self, key, window):
+        self.user_id, self.conversation_id = key
+        self.key = key
+        self.lines = deque(maxlen=window)
+        self.message_count = 0
+
+    def add(self, sender, text):
+        self.lines.append(f"{sender.capitalize()}: {text}\n")
+        self.message_count += 1
+
+    @property
+    def history(self):
+        return "".join(self.lines)
+
+
+CHATTER = [
+    "hi there, I have a question about something I bought last week",
+    "Sure! Think41 is happy to help. What would you like to know today",
+    "the jacket I got is a bit small and the sleeves are too short for me",
+    "I am sorry to hear that. Could you share a few more details please",
+    "it is the blue one with the hood and the zipper on the side pocket",
+]
+
+def synthetic_turns(turns, seed=41):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(turns):
+        if i == turns // 2:
+            messages.append(f"can you check the status of my order id {rng.randint(10000, 99999)}")
+        else:
+            messages.append(rng.choice(CHATTER))
+    return messages
+
+def run(turns, window):
+    messages = synthetic_turns(turns)
+
+    ctx = BenchContext((1, "legacy"), window)
+    legacy_results = []
+    started = time.perf_counter()
+    for message in messages:
+        ctx.add("user", message)
+        legacy_results.append(legacy_match_context(ctx.history + f"User: {message}\n"))
+        ctx.add("bot", "Thanks, let me look into that for you.")
+    legacy_elapsed = time.perf_counter() - started
+
+    extractor = EntityExtractor()
+    ctx = BenchContext((1, "extractor"), window)
+    new_results = []
+    started = time.perf_counter()
+    for message in messages:
+        ctx.add("user", message)
+        new_results.append(extractor.extract(ctx, message))
+        ctx.add("bot", "Thanks, let me look into that for you.")
+    new_elapsed = time.perf_counter() - started
+
+    agree = sum(a == b for a, b in zip(legacy_results, new_results))
+    print(f"turns={turns} window={window}")
+    print(f"  legacy:    {legacy_elapsed * 1e6 / turns:8.1f} us/turn")
+    print(f"  extractor: {new_elapsed * 1e6 / turns:8.1f} us/turn "
+          f"({legacy_elapsed / new_elapsed if new_elapsed else 0:.1f}x faster)")
+    print(f"  same routing on {agree}/{turns} turns")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--window", type=int, default=50, help="history messages kept per turn")
+    args = parser.parse_args()
+    for turns in sorted({50, args.turns}):
+        run(turns, args.window)
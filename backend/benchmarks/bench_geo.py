@@ -0,0 +1,84 @@
+"""
+Nearest distribution center: a plain-Python haversine loop over the centers vs the
+vectorized NumPy lookup in app/tools/geo.py, for single points and for assigning the
+whole users table in one pass (arrays only, and streamed from the database).
+
+Runs on a throwaway SQLite database seeded from dataset/archive where present (the full
+users table) and synthetic users otherwise.
+
+Run from backend/:  python -m benchmarks.bench_geo [--users 100000] [--lookups 5000]
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="think41_geo_")
+# Must be set before the app modules are imported
+os.environ["STORAGE_BACKEND"] = "sql"
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'geo.db')}"
+
+import numpy as np
+from benchmarks.dataset import prepare_dataset
+from app.services import load_data
+from app.services.storage import get_backend
+from app.tools.geo import center_index, assign_users, EARTH_RADIUS_KM
+
+
+def python_nearest(latitude, longitude, centers):
+    best = None
+    for center in centers:
+        lat1, lon1 = math.radians(latitude), math.radians(longitude)
+        lat2, lon2 = math.radians(center["latitude"]), math.radians(center["longitude"])
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+        if best is None or distance < best[0]:
+            best = (distance, center)
+    return best
+
+def per_call_us(fn, points):
+    started = time.perf_counter()
+    results = [fn(lat, lon) for lat, lon in points]
+    return (time.perf_counter() - started) * 1e6 / len(points), results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000, help="synthetic users when users.csv is missing")
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    folder = os.path.join(WORK_DIR, "csv")
+    prepare_dataset(folder, users=args.users)
+    load_data.CSV_FOLDER = folder
+    load_data.load_csv_to_sql(["users", "distribution_centers"])
+    center_index.refresh()
+    centers = center_index.centers
+    users = [user for user in get_backend().iter_collection("users", ("id", "latitude", "longitude"))
+             if user["latitude"] is not None]
+    print(f"{len(users)} users, {len(centers)} distribution centers")
+
+    rng = random.Random(41)
+    points = [(user["latitude"], user["longitude"]) for user in rng.sample(users, min(args.lookups, len(users)))]
+    python_us, python_results = per_call_us(lambda lat, lon: python_nearest(lat, lon, centers), points)
+    numpy_us, numpy_results = per_call_us(lambda lat, lon: center_index.nearest(lat, lon)[0], points)
+    same = sum(a[1]["id"] == b[1]["id"] for a, b in zip(python_results, numpy_results))
+    print(f"single lookup:  python {python_us:6.1f} us   numpy {numpy_us:6.1f} us   (same center for {same}/{len(points)})")
+
+    latitudes = np.array([user["latitude"] for user in users])
+    longitudes = np.array([user["longitude"] for user in users])
+    started = time.perf_counter()
+    python_all = [python_nearest(lat, lon, centers)[1]["id"] for lat, lon in zip(latitudes.tolist(), longitudes.tolist())]
+    python_s = time.perf_counter() - started
+    started = time.perf_counter()
+    indexes, _ = center_index.nearest_centers(latitudes, longitudes)
+    numpy_s = time.perf_counter() - started
+    center_ids = np.array([center["id"] for center in centers])
+    same = int((center_ids[indexes] == np.array(python_all)).sum())
+    print(f"assign all users (in memory):  python {python_s * 1000:7.1f} ms   numpy {numpy_s * 1000:7.1f} ms "
+          f"({python_s / numpy_s:.0f}x faster, same center for {same}/{len(users)})")
+
+    started = time.perf_counter()
+    assigned = sum(len(ids) for ids, _, _ in assign_users())
+    print(f"assign_users() streamed from the database: {assigned} users in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,97 @@
+"""
+Stock questions per product (units in stock, holding distribution centers, average
+cost): a GROUP BY over the indexed inventory_items table vs the columnar inventory
+snapshot (app/tools/inventory.py). Reports per-lookup latency, build and incremental
+refresh times, and the snapshot's memory next to the same rows held as dicts.
+
+Runs on a throwaway SQLite database seeded from dataset/archive where present (the full
+inventory) and synthetic inventory for --users users otherwise (~6 items per user).
+
+Run from backend/:  python -m benchmarks.bench_inventory [--users 80000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="think41_inventory_")
+# Must be set before the app modules are imported
+os.environ["STORAGE_BACKEND"] = "sql"
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'inventory.db')}"
+
+from sqlalchemy import case, func, select
+from benchmarks.dataset import prepare_dataset
+from app.models.models import InventoryItem
+from app.services import load_data
+from app.services.storage import get_backend
+from app.tools.geo import center_index
+from app.tools.inventory import InventorySnapshot, inventory_snapshot, dict_bytes
+
+
+def sql_stock(session, product_id):
+    rows = session.execute(
+        select(InventoryItem.product_distribution_center_id, func.count(),
+               func.sum(case((InventoryItem.sold_at.is_(None), 1), else_=0)), func.sum(InventoryItem.cost))
+        .where(InventoryItem.product_id == product_id)
+        .group_by(InventoryItem.product_distribution_center_id)
+    ).all()
+    units = sum(row[1] for row in rows)
+    if not units:
+        return None
+    return sum(row[2] for row in rows), units, round(sum(row[3] for row in rows) / units, 2)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+def measure(label, lookup, product_ids):
+    timings, results = [], []
+    for product_id in product_ids:
+        started = time.perf_counter()
+        results.append(lookup(product_id))
+        timings.append((time.perf_counter() - started) * 1e6)
+    print(f"  {label:22} p50 {percentile(timings, 50):8.1f} us   p99 {percentile(timings, 99):8.1f} us")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=80000, help="synthetic users when inventory_items.csv is missing")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    folder = os.path.join(WORK_DIR, "csv")
+    prepare_dataset(folder, users=args.users)
+    load_data.CSV_FOLDER = folder
+    load_data.load_csv_to_sql(["inventory_items", "distribution_centers"])
+    center_index.refresh()
+
+    started = time.perf_counter()
+    records = list(get_backend().iter_collection(InventorySnapshot.collection, InventorySnapshot.fields))
+    scanned = time.perf_counter() - started
+    started = time.perf_counter()
+    inventory_snapshot.apply(records)
+    print(f"{len(records)} inventory items: scanned in {scanned * 1000:.0f} ms, "
+          f"snapshot built in {(time.perf_counter() - started) * 1000:.0f} ms")
+    as_dicts = dict_bytes(records)
+    print(f"memory: dicts {as_dicts / 2**20:.1f} MiB, NumPy snapshot {inventory_snapshot.nbytes / 2**20:.1f} MiB "
+          f"({as_dicts / inventory_snapshot.nbytes:.0f}x smaller)")
+
+    rng = random.Random(41)
+    product_ids = rng.sample(sorted({record["product_id"] for record in records}), args.lookups)
+    print("per-product stock lookup:")
+    with get_backend().Session() as session:
+        expected = measure("SQL GROUP BY (indexed)", lambda product_id: sql_stock(session, product_id), product_ids)
+    found = measure("snapshot", inventory_snapshot.product_stock, product_ids)
+    same = sum(e == (f["in_stock"], f["units"], f["average_cost"]) for e, f in zip(expected, found))
+    print(f"  same answer for {same}/{len(product_ids)} products")
+
+    for share in (0.001, 0.01):
+        changed = [dict(record) for record in records]
+        for record in rng.sample(changed, int(len(changed) * share)):
+            record["sold_at"] = None if record["sold_at"] else record.get("created_at") or time.time()
+        started = time.perf_counter()
+        count = inventory_snapshot.apply(changed)
+        print(f"incremental refresh of {count} changed items: {(time.perf_counter() - started) * 1000:.0f} ms "
+              f"(includes re-reading all {len(changed)} rows)")
+        records = changed
@@ -0,0 +1,102 @@
+"""
+Microbenchmark: per-request logging overhead on the request thread, comparing the
+previous chat_controller setup (eager f-strings at INFO, synchronous StreamHandler)
+with app.utils.logger (lazy args, bodies at DEBUG via log_body, queue handler with
+JSON formatting on the listener thread).
+
+Replays the log calls of one LLM-routed tool turn with a realistic prompt, tool result
+and reply. Output goes to a temp file standing in for stderr.
+
+Run from backend/:  python -m benchmarks.bench_logging [--requests 2000]
+"""
+import argparse
+import logging
+import logging.handlers
+import queue
+import tempfile
+import time
+from app.utils import logger as log_module
+from app.utils.logger import ContextFilter, DeferredQueueHandler, JsonFormatter, Truncated, request_id_var
+
+PROMPT = "You are Think41's AI customer service assistant.\n" + "User: where is my order?\nBot: Let me check.\n" * 60
+RESULT = {"order_id": 12345, "user_id": 678, "status": "Shipped", "gender": "F", "num_of_item": 3,
+          "created_at": "2023-05-01T10:00:00Z", "shipped_at": "2023-05-02T10:00:00Z"}
+REPLY = "Your order 12345 has shipped and should arrive soon. " * 8
+
+
+def legacy_request(logger):
+    # Previous chat_controller calls for a turn routed by an LLM TOOL_CALL
+    logger.info(f"Prompt sent to Gemini: {PROMPT}")
+    logger.info(f"Gemini response: TOOL_CALL: query_order_by_id 12345")
+    logger.info("TOOL_CALL detected in Gemini response. Attempting to parse and call the appropriate tool.")
+    logger.info(f"Parsed TOOL_CALL: query_order_by_id with params {['12345']}")
+    logger.info(f"Tool query_order_by_id called with params {['12345']}: {RESULT}")
+    logger.info(f"Prompt sent to Gemini for summarization: {PROMPT}\nDatabase info: {RESULT}")
+    logger.info(f"LLM summary response: {REPLY}")
+
+def current_request(logger, log_body):
+    log_body("Prompt sent to Gemini: %s", PROMPT)
+    log_body("Gemini response: %s", "TOOL_CALL: query_order_by_id 12345")
+    logger.debug("TOOL_CALL detected in Gemini response. Attempting to parse and call the appropriate tool.")
+    logger.info("Parsed TOOL_CALL: %s with params %s", "query_order_by_id", ["12345"])
+    log_body("Tool %s called with params %s: %s", "query_order_by_id", ["12345"], RESULT)
+    log_body("Prompt sent to Gemini for summarization: %s", PROMPT)
+    log_body("LLM summary response: %s", REPLY)
+
+def time_requests(run, requests):
+    started = time.perf_counter()
+    for i in range(requests):
+        request_id_var.set(f"req-{i}")
+        run()
+    return (time.perf_counter() - started) / requests * 1e6
+
+def legacy_logger(stream):
+    logger = logging.getLogger("bench_legacy")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s: %(message)s'))
+    logger.addHandler(handler)
+    return logger
+
+def queued_logger(stream, level):
+    logger = logging.getLogger(f"bench_queued_{level}")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(level)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(ContextFilter())
+    listener = logging.handlers.QueueListener(queue_handler.queue, handler)
+    listener.start()
+    logger.addHandler(queue_handler)
+    return logger, listener
+
+def make_log_body(logger):
+    # Same as app.utils.logger.log_body, bound to the benchmark logger
+    def log_body(message, *args, level=logging.DEBUG):
+        if logger.isEnabledFor(level):
+            logger.log(level, message, *args[:-1], Truncated(args[-1]), stacklevel=2)
+    return log_body
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryFile("w") as stream:
+        legacy = legacy_logger(stream)
+        legacy_us = time_requests(lambda: legacy_request(legacy), args.requests)
+        print(f"legacy (eager f-strings, sync INFO):       {legacy_us:8.1f} us/request")
+
+        for level, label in ((logging.INFO, "INFO, bodies dropped"), (logging.DEBUG, f"DEBUG, bodies cut to {log_module.LOG_BODY_CHARS}")):
+            logger, listener = queued_logger(stream, level)
+            log_body = make_log_body(logger)
+            request_us = time_requests(lambda: current_request(logger, log_body), args.requests)
+            drain_started = time.perf_counter()
+            listener.stop()
+            drain_ms = (time.perf_counter() - drain_started) * 1000
+            print(f"queued JSON ({label}): {request_us:8.1f} us/request on the request thread "
+                  f"({legacy_us / request_us:.1f}x less), listener drained in {drain_ms:.0f} ms")
@@ -0,0 +1,76 @@
+"""
+query_orders_by_user_id for a heavy buyer: the previous full fetch of every order vs a
+page of the most recent orders and the per-status summary. Reports latency, rows
+materialized, tracemalloc peak and prompt tokens as the user's history grows.
+
+Runs on a throwaway SQLite database; the Mongo backend runs the same queries against
+the (user_id, created_at) index.
+
+Run from backend/:  python -m benchmarks.bench_order_history [--orders 1000 10000 50000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+WORK_DIR = tempfile.mkdtemp(prefix="think41_history_")
+# Must be set before the app modules are imported
+os.environ["STORAGE_BACKEND"] = "sql"
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'history.db')}"
+
+from sqlalchemy import insert
+from app.controllers.context_builder import estimate_tokens
+from app.models.models import Order
+from app.services.storage import get_backend
+from app.tools.order_history import order_page, status_summary, ORDER_HISTORY_LIMIT
+from app.tools.projections import compact
+
+STATUSES = ("Processing", "Shipped", "Complete", "Returned", "Cancelled")
+
+
+def add_orders(backend, user_id, count, rng):
+    start = datetime(2019, 1, 1)
+    rows = []
+    for i in range(count):
+        created = start + timedelta(minutes=rng.randrange(3_000_000))
+        rows.append({"order_id": user_id * 10_000_000 + i, "user_id": user_id, "status": rng.choice(STATUSES),
+                     "gender": "F", "created_at": created, "shipped_at": created + timedelta(days=1),
+                     "delivered_at": None, "returned_at": None, "num_of_item": rng.randint(1, 4)})
+    with backend.Session() as session:
+        session.execute(insert(Order), rows)
+        session.commit()
+
+def measure(label, call, collection, repeat):
+    tracemalloc.start()
+    result = call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    elapsed = (time.perf_counter() - started) * 1000 / repeat
+    rows = result.get("orders") or result.get("statuses") if isinstance(result, dict) else result
+    print(f"  {label:16} {elapsed:8.2f} ms   {len(rows):>6} rows   peak {peak / 1024:8.0f} KiB   "
+          f"prompt {estimate_tokens(compact(result, collection)):>5} tokens")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    backend = get_backend()
+    backend.ensure_schema()
+    rng = random.Random(41)
+    for user_id, count in enumerate(args.orders, start=1):
+        add_orders(backend, user_id, count, rng)
+        print(f"user with {count} orders:")
+        measure("full history", lambda: backend.query_orders_by_user_id(user_id, limit=None), "orders", args.repeat)
+        measure(f"page of {ORDER_HISTORY_LIMIT}", lambda: order_page(
+            user_id, backend.query_orders_by_user_id(user_id, ORDER_HISTORY_LIMIT + 1), ORDER_HISTORY_LIMIT),
+            "order_history", args.repeat)
+        measure("status summary", lambda: status_summary(user_id, backend.query_order_status_counts(user_id)),
+                "order_history", args.repeat)
@@ -0,0 +1,111 @@
+"""
+Product name lookups over the whole product catalog: the exact-name match behind the old
+query_products_by_name vs the trigram search index (app/tools/product_search.py), on
+exact, misspelled (one random edit) and partial (first word, usually the brand,
+dropped) names. Reports top-1 accuracy, per-query latency, the build time and the time
+of an incremental refresh.
+
+Uses dataset/archive/products.csv when present (the full catalog), otherwise a
+synthetic catalog of --products rows.
+
+Run from backend/:  python -m benchmarks.bench_product_search [--queries 2000] [--products 30000]
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+import pandas as pd
+from benchmarks.dataset import prepare_dataset
+from app.services.load_data import convert_chunk
+from app.tools.product_search import ProductSearchIndex, PRODUCT_MATCH_MIN_SCORE
+from app.tools.projections import TOOL_FIELDS
+
+
+def load_products(products):
+    folder = os.path.join(tempfile.mkdtemp(prefix="think41_search_"), "csv")
+    prepare_dataset(folder, users=products * 2)
+    frame = pd.read_csv(os.path.join(folder, "products.csv"))
+    fields = [field for field in TOOL_FIELDS["products"] if field in frame.columns]
+    return [{field: record[field] for field in fields} for record in convert_chunk(frame, "products")]
+
+def misspell(name, rng):
+    # One deletion, insertion, substitution or transposition inside a word
+    positions = [i for i, c in enumerate(name) if c.isalpha()]
+    i = rng.choice(positions)
+    op = rng.choice(("delete", "insert", "substitute", "transpose"))
+    if op == "delete":
+        return name[:i] + name[i + 1:]
+    if op == "insert":
+        return name[:i] + rng.choice(string.ascii_lowercase) + name[i:]
+    if op == "substitute":
+        return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+    return name[:i] + name[i + 1:i + 2] + name[i] + name[i + 2:] if i + 1 < len(name) else name[:i]
+
+def partial(name):
+    words = name.split()
+    if len(words) < 3:
+        return name
+    return " ".join(words[1:])
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+def measure(label, lookup, queries):
+    timings, correct = [], 0
+    for query, expected_id in queries:
+        started = time.perf_counter()
+        product = lookup(query)
+        timings.append((time.perf_counter() - started) * 1e6)
+        correct += bool(product) and product["id"] == expected_id
+    print(f"  {label:24} top-1 {correct / len(queries):6.1%}   p50 {percentile(timings, 50):7.1f} us   "
+          f"p99 {percentile(timings, 99):7.1f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=30000, help="synthetic catalog size when products.csv is missing")
+    args = parser.parse_args()
+
+    products = load_products(args.products)
+    index = ProductSearchIndex()
+    started = time.perf_counter()
+    index.apply(products)
+    print(f"{len(products)} products, index built in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    # Reference: exact name match, like find_one({"name": name}) on an index
+    by_name = {}
+    for product in products:
+        by_name.setdefault(product["name"], product)
+
+    rng = random.Random(41)
+    sample = rng.sample(products, min(args.queries, len(products)))
+    # Duplicate names make "the" right answer ambiguous; count any product with that name
+    sample = [product for product in sample if by_name[product["name"]] is product]
+    query_sets = {
+        "exact": [(product["name"], product["id"]) for product in sample],
+        "one typo": [(misspell(product["name"], rng), product["id"]) for product in sample],
+        "partial": [(partial(product["name"]), product["id"]) for product in sample],
+    }
+    for name, queries in query_sets.items():
+        print(f"{name} names:")
+        measure("exact match", by_name.get, queries)
+        measure(f"index (min {PRODUCT_MATCH_MIN_SCORE})", index.best, queries)
+
+    filtered = [(product["name"].split()[-1], product) for product in sample[:500]]
+    timings = []
+    for query, product in filtered:
+        started = time.perf_counter()
+        index.search(query, brand=product["brand"], department=product["department"])
+        timings.append((time.perf_counter() - started) * 1e6)
+    print(f"filtered search (brand + department): p50 {percentile(timings, 50):.1f} us, p99 {percentile(timings, 99):.1f} us")
+
+    changed = [dict(product, name=product["name"] + " v2") for product in rng.sample(products, len(products) // 100)]
+    updated = {product["id"]: product for product in products}
+    updated.update({product["id"]: product for product in changed})
+    started = time.perf_counter()
+    count = index.apply(list(updated.values()))
+    print(f"incremental refresh of {count} changed products: {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"(includes diffing all {len(updated)})")
@@ -0,0 +1,86 @@
+"""
+Bytes and prompt tokens per tool result: whole documents formatted with str() (the
+previous prompt text) vs projected fields (app/tools/projections.py) formatted with
+compact().
+
+By default runs against the SQL backend on a throwaway SQLite database seeded like the
+load test; pass --mongo to measure the configured MongoDB instead (which also
+counts the `_id` ObjectIds the projections drop).
+
+Run from backend/:  python -m benchmarks.bench_projections [--samples 50] [--mongo]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+USE_MONGO = "--mongo" in sys.argv
+WORK_DIR = tempfile.mkdtemp(prefix="think41_projections_")
+if not USE_MONGO:
+    # Must be set before the app modules are imported
+    os.environ["STORAGE_BACKEND"] = "sql"
+    os.environ["SQL_DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'projections.db')}"
+
+from benchmarks.dataset import prepare_dataset
+from benchmarks.load_test import read_csv
+from app.controllers.context_builder import estimate_tokens
+from app.services.storage import get_backend
+from app.tools import projections
+from app.tools.projections import compact
+
+# backend method -> (collection, csv, csv column used as the argument, argument type)
+TOOLS = {
+    "query_orders_by_order_id": ("orders", "orders.csv", "order_id", int),
+    "query_orders_by_user_id": ("orders", "orders.csv", "user_id", int),
+    "query_products_by_name": ("products", "products.csv", "name", str),
+    "query_user_by_email": ("users", "users.csv", "email", str),
+    "query_inventory_by_product_id": ("inventory_items", "inventory_items.csv", "product_id", int),
+    "query_distribution_center_by_id": ("distribution_centers", "distribution_centers.csv", "id", int),
+    "query_order_item_by_id": ("order_items", "order_items.csv", "id", int),
+}
+
+
+def wire_bytes(result):
+    return len(json.dumps(result, default=str).encode())
+
+def measure(method, collection, keys):
+    backend = get_backend()
+    totals = {"full_bytes": 0, "projected_bytes": 0, "full_tokens": 0, "compact_tokens": 0}
+    for key in keys:
+        projections.TOOL_PROJECTIONS = False
+        full = getattr(backend, method)(key)
+        projections.TOOL_PROJECTIONS = True
+        projected = getattr(backend, method)(key)
+        if not full:
+            continue
+        totals["full_bytes"] += wire_bytes(full)
+        totals["projected_bytes"] += wire_bytes(projected)
+        totals["full_tokens"] += estimate_tokens(str(full))
+        totals["compact_tokens"] += estimate_tokens(compact(projected, collection))
+    return {name: round(value / len(keys), 1) for name, value in totals.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--mongo", action="store_true", help="measure the configured MongoDB instead of SQLite")
+    args = parser.parse_args()
+
+    folder = os.path.join(WORK_DIR, "csv")
+    prepare_dataset(folder)
+    if not USE_MONGO:
+        from app.services import load_data
+        load_data.CSV_FOLDER = folder
+        load_data.load_csv_to_sql()
+
+    rng = random.Random(41)
+    print(f"{'tool':34} {'bytes full':>10} {'projected':>10} {'saved':>6}   {'tokens str()':>12} {'compact':>8} {'saved':>6}")
+    for method, (collection, csv_name, column, key_type) in TOOLS.items():
+        rows = read_csv(folder, csv_name)
+        keys = [key_type(row[column]) for row in rng.sample(rows, min(args.samples, len(rows)))]
+        m = measure(method, collection, keys)
+        bytes_saved = 1 - m["projected_bytes"] / m["full_bytes"] if m["full_bytes"] else 0
+        tokens_saved = 1 - m["compact_tokens"] / m["full_tokens"] if m["full_tokens"] else 0
+        print(f"{method:34} {m['full_bytes']:>10} {m['projected_bytes']:>10} {bytes_saved:>6.0%}   "
+              f"{m['full_tokens']:>12} {m['compact_tokens']:>8} {tokens_saved:>6.0%}")
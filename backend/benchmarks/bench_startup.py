@@ -0,0 +1,112 @@
+"""
+Startup cost: how long `import app.main` takes in a fresh interpreter, which modules
+dominate it (python -X importtime), and how long the lifespan startup (schema, connection
+warm-up, chatbot construction) takes before /ready turns 200.
+
+Uses the SQL backend on a throwaway SQLite file so no database server is needed.
+
+Run from backend/:
+    python -m benchmarks.bench_startup [--runs 5] [--baseline old.json --max-regression 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+LIFESPAN_SCRIPT = """
+import asyncio, time
+import httpx
+from app.main import app
+
+async def main():
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            status = (await client.get("/ready")).status_code
+        print(time.perf_counter() - started, status)
+
+asyncio.run(main())
+"""
+
+
+def run_python(args, env):
+    result = subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return result
+
+def top_imports(env, count):
+    """Slowest top-level packages pulled in by app.main, by cumulative import time."""
+    # -X importtime writes "import time: self [us] | cumulative | imported package" to stderr
+    result = run_python(["-X", "importtime", "-c", "import app.main"], env)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if "." not in name and name != "app":
+            packages[name] = max(packages.get(name, 0), int(cumulative) / 1000)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+    return [{"package": name, "cumulative_ms": round(ms, 1)} for name, ms in slowest]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app import and startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to report")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "startup.json"))
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="think41_startup_")
+    env = dict(os.environ,
+               STORAGE_BACKEND="sql",
+               SQL_DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'startup.db')}",
+               LOG_LEVEL="WARNING")
+    env.setdefault("GOOGLE_API_KEY", "startup-benchmark")
+
+    import_s = [float(run_python(["-c", IMPORT_SCRIPT], env).stdout.split()[-1]) for _ in range(args.runs)]
+    startup_s = []
+    for _ in range(args.runs):
+        elapsed, status = run_python(["-c", LIFESPAN_SCRIPT], env).stdout.split()[-2:]
+        if status != "200":
+            raise RuntimeError(f"/ready returned {status} after startup")
+        startup_s.append(float(elapsed))
+
+    result = {
+        "runs": args.runs,
+        "import_ms": {"median": round(statistics.median(import_s) * 1000, 1), "min": round(min(import_s) * 1000, 1)},
+        "lifespan_startup_ms": {"median": round(statistics.median(startup_s) * 1000, 1), "min": round(min(startup_s) * 1000, 1)},
+        "slowest_imports": top_imports(env, args.top),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = []
+        for key in ("import_ms", "lifespan_startup_ms"):
+            previous, current = baseline[key]["median"], result[key]["median"]
+            if previous and (current - previous) / previous * 100 > args.max_regression:
+                regressions.append(f"{key}: {previous} -> {current} ms")
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,72 @@
+"""
+Lookup latency of each tool query on the Mongo and SQL storage backends.
+
+Calls the backends directly, so the tool result cache is not involved. Load the same
+data into both first (python -m app.services.load_data, once more with
+STORAGE_BACKEND=sql for the SQL side), then run this with the default STORAGE_BACKEND
+so the Mongo client is available.
+
+Run from backend/:  python -m benchmarks.bench_storage_backends [--backends mongo sql] [--iterations 200]
+"""
+import argparse
+import random
+import statistics
+import time
+
+# tool -> function building its arguments from a random id
+TOOL_ARGS = {
+    "query_orders_by_order_id": lambda i: (i,),
+    "query_orders_by_user_id": lambda i: (i,),
+    "query_products_by_name": lambda i: (f"Product {i}",),
+    "query_product_by_id": lambda i: (i,),
+    "query_user_by_email": lambda i: (f"user{i}@example.com",),
+    "query_user_by_id": lambda i: (i,),
+    "query_inventory_by_product_id": lambda i: (i,),
+    "query_inventory_item_by_id": lambda i: (i,),
+    "query_distribution_center_by_id": lambda i: (i % 10 + 1,),
+    "query_order_items_by_order_and_user": lambda i: (i, i),
+    "query_order_item_by_id": lambda i: (i,),
+}
+
+
+def make_backend(name):
+    if name == "sql":
+        from app.services.storage.sql_backend import SqlBackend
+        return SqlBackend()
+    from app.services.storage.mongo_backend import MongoBackend
+    return MongoBackend()
+
+def bench(backend, iterations, max_id, seed=41):
+    rng = random.Random(seed)
+    results = {}
+    for tool_name, make_args in TOOL_ARGS.items():
+        method = getattr(backend, tool_name)
+        timings = []
+        for _ in range(iterations):
+            args = make_args(rng.randint(1, max_id))
+            started = time.perf_counter()
+            method(*args)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[tool_name] = (statistics.median(timings), timings[int(len(timings) * 0.95) - 1])
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["mongo", "sql"], choices=["mongo", "sql"])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--max-id", type=int, default=1000, help="ids are drawn from 1..max-id")
+    args = parser.parse_args()
+
+    all_results = {}
+    for name in args.backends:
+        try:
+            all_results[name] = bench(make_backend(name), args.iterations, args.max_id)
+        except Exception as e:
+            print(f"Skipping {name} backend: {e}")
+
+    names = list(all_results)
+    print(f"{'tool':40}" + "".join(f"{n + ' p50/p95 ms':>24}" for n in names))
+    for tool_name in TOOL_ARGS:
+        row = "".join(f"{all_results[n][tool_name][0]:>14.3f} /{all_results[n][tool_name][1]:>8.3f}" for n in names)
+        print(f"{tool_name:40}{row}")
@@ -0,0 +1,92 @@
+"""
+Local dataset for the benchmarks: the CSVs from dataset/archive where present, with
+synthetic rows (same columns as the data dictionary in readme.md) for any that are missing.
+"""
+import csv
+import os
+import random
+import shutil
+
+ARCHIVE_FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "archive")
+
+CATEGORIES = ["Jeans", "Tops & Tees", "Outerwear & Coats", "Sweaters", "Socks", "Active"]
+BRANDS = ["Levi's", "Nike", "Carhartt", "Columbia", "Hanes", "Calvin Klein"]
+STATUSES = ["Processing", "Shipped", "Complete", "Cancelled", "Returned"]
+HEADERS = {
+    "products.csv": ["id", "cost", "category", "name", "brand", "retail_price", "department", "sku",
+                     "distribution_center_id"],
+    "users.csv": ["id", "first_name", "last_name", "email", "age", "gender", "state", "street_address",
+                  "postal_code", "city", "country", "latitude", "longitude", "traffic_source", "created_at"],
+    "orders.csv": ["order_id", "user_id", "status", "gender", "created_at", "returned_at", "shipped_at",
+                   "delivered_at", "num_of_item"],
+    "order_items.csv": ["id", "order_id", "user_id", "product_id", "inventory_item_id", "status", "created_at",
+                        "shipped_at", "delivered_at", "returned_at"],
+    "inventory_items.csv": ["id", "product_id", "created_at", "sold_at", "cost", "product_category",
+                            "product_name", "product_brand", "product_retail_price", "product_department",
+                            "product_sku", "product_distribution_center_id"],
+    "distribution_centers.csv": ["id", "name", "latitude", "longitude"],
+}
+
+
+def synthetic_rows(users=2000, seed=41):
+    """Rows for every CSV, consistent with each other (orders reference users, items reference products...)."""
+    rng = random.Random(seed)
+    centers = [(i, f"Center {i}", round(rng.uniform(25, 48), 4), round(rng.uniform(-122, -70), 4))
+               for i in range(1, 11)]
+    products = []
+    for i in range(1, users // 2 + 1):
+        brand = rng.choice(BRANDS)
+        category = rng.choice(CATEGORIES)
+        products.append((i, round(rng.uniform(5, 50), 2), category, f"{brand} {category} {i}", brand,
+                         round(rng.uniform(20, 150), 2), rng.choice(["Men", "Women"]), f"SKU{i:08d}",
+                         rng.randint(1, len(centers))))
+    user_rows = [(i, f"First{i}", f"Last{i}", f"user{i}@example.com", rng.randint(18, 70), rng.choice("MF"),
+                  "Texas", f"{i} Main St", "75001", "Dallas", "United States", round(rng.uniform(25, 48), 4),
+                  round(rng.uniform(-122, -70), 4), "Search", "2022-01-01 00:00:00+00:00")
+                 for i in range(1, users + 1)]
+    orders, order_items, inventory = [], [], []
+    item_id = 1
+    for order_id in range(1, users * 2 + 1):
+        user_id = rng.randint(1, users)
+        status = rng.choice(STATUSES)
+        created = f"2023-{rng.randint(1, 9):02d}-{rng.randint(10, 28)} 10:00:00+00:00"
+        count = rng.randint(1, 4)
+        orders.append((order_id, user_id, status, rng.choice("MF"), created, "", created, "", count))
+        for _ in range(count):
+            p = rng.choice(products)
+            inventory.append((item_id, p[0], "2023-01-01 00:00:00+00:00", created, p[1], p[2], p[3], p[4], p[5],
+                              p[6], p[7], p[8]))
+            order_items.append((item_id, order_id, user_id, p[0], item_id, status, created, "", "", ""))
+            item_id += 1
+    for _ in range(users):
+        p = rng.choice(products)
+        inventory.append((item_id, p[0], "2023-01-01 00:00:00+00:00", "", p[1], p[2], p[3], p[4], p[5], p[6],
+                          p[7], p[8]))
+        item_id += 1
+    return {
+        "distribution_centers.csv": centers,
+        "products.csv": products,
+        "users.csv": user_rows,
+        "orders.csv": orders,
+        "order_items.csv": order_items,
+        "inventory_items.csv": inventory,
+    }
+
+def prepare_dataset(folder, users=2000, seed=41):
+    """Fill `folder` with every dataset CSV. Returns the names that were synthesized."""
+    os.makedirs(folder, exist_ok=True)
+    synthesized = []
+    rows = None
+    for name, header in HEADERS.items():
+        source = os.path.join(ARCHIVE_FOLDER, name)
+        target = os.path.join(folder, name)
+        if os.path.exists(source):
+            shutil.copyfile(source, target)
+            continue
+        rows = rows or synthetic_rows(users, seed)
+        with open(target, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows[name])
+        synthesized.append(name)
+    return synthesized
@@ -0,0 +1,244 @@
+"""
+End-to-end load test for /api/chat.
+
+Drives the FastAPI app in-process (httpx ASGI transport) against the SQL backend on a
+throwaway SQLite database seeded from dataset/archive (synthetic rows for missing CSVs),
+with a deterministic fake LLM in place of Gemini. Replays multi-turn conversations over
+the main tool paths and writes throughput, latency percentiles, DB round trips per turn
+and LLM calls per turn to a JSON file.
+
+Run from backend/:
+    python -m benchmarks.load_test [--conversations 200] [--concurrency 20] [--baseline old.json]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+WORK_DIR = tempfile.mkdtemp(prefix="think41_load_")
+# Must be set before the app modules are imported
+os.environ["STORAGE_BACKEND"] = "sql"
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'load_test.db')}"
+os.environ.setdefault("GOOGLE_API_KEY", "load-test")
+
+import httpx
+from benchmarks.dataset import prepare_dataset
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """Deterministic stand-in for ChatGoogleGenerativeAI with a fixed simulated latency."""
+
+    def __init__(self, latency_ms=50):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def reply(self, prompt):
+        self.calls += 1
+        if "Database info:" in prompt:
+            return "Thanks for waiting! Here is what I found for you at Think41."
+        if prompt.startswith("You maintain a running summary"):
+            return "The customer asked Think41 about their orders and products."
+        last = prompt.rsplit("User: ", 1)[-1]
+        quoted = re.search(r'"([^"]+)"', last)
+        if quoted:
+            return f"TOOL_CALL: query_product_by_name {quoted.group(1)}"
+        order = re.search(r"order (\d+)", last)
+        user = re.search(r"customer number is (\d+)", last)
+        if order and user:
+            return f"TOOL_CALL: query_order_items {order.group(1)} {user.group(1)}"
+        return "Hi, I'm Think41's assistant. How can I help you today?"
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return FakeResponse(self.reply(prompt))
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency)
+        return FakeResponse(self.reply(prompt))
+
+    async def astream(self, prompt):
+        await asyncio.sleep(self.latency)
+        for word in self.reply(prompt).split(" "):
+            yield FakeResponse(word + " ")
+
+
+def count_backend_calls(backend):
+    """Wrap every storage method on the backend instance so DB round trips can be counted."""
+    from app.services.storage.base import TOOL_METHODS, CONVERSATION_METHODS
+    counter = {"calls": 0}
+    for name in TOOL_METHODS + CONVERSATION_METHODS:
+        for attr in (name, f"{name}_async"):
+            method = getattr(backend, attr)
+            if asyncio.iscoroutinefunction(method):
+                async def wrapper(*args, _method=method, **kwargs):
+                    counter["calls"] += 1
+                    return await _method(*args, **kwargs)
+            else:
+                def wrapper(*args, _method=method, **kwargs):
+                    counter["calls"] += 1
+                    return _method(*args, **kwargs)
+            setattr(backend, attr, wrapper)
+    return counter
+
+def read_csv(folder, name):
+    with open(os.path.join(folder, name), newline="") as f:
+        return list(csv.DictReader(f))
+
+def build_conversations(folder, count, seed=41):
+    """Multi-turn scripts over the order status, product by name, user by email and order items paths."""
+    rng = random.Random(seed)
+    orders = read_csv(folder, "orders.csv")
+    products = read_csv(folder, "products.csv")
+    users = read_csv(folder, "users.csv")
+    scenarios = {
+        "order_status": lambda: [
+            "hi there",
+            f"what is the status of my order id {rng.choice(orders)['order_id']}?",
+            "thanks, that helps",
+        ],
+        "product_by_name": lambda: [
+            "hello, I'm looking for something",
+            f'do you have "{rng.choice(products)["name"]}" available?',
+        ],
+        "user_by_email": lambda: [
+            f"can you look up my account? my email is {rng.choice(users)['email']}",
+        ],
+        "order_items": lambda: (lambda o: [
+            "hey",
+            f"what was in order {o['order_id']}? my customer number is {o['user_id']}",
+        ])(rng.choice(orders)),
+    }
+    names = list(scenarios)
+    return [(names[i % len(names)], scenarios[names[i % len(names)]]()) for i in range(count)]
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def run(args):
+    synthesized = prepare_dataset(os.path.join(WORK_DIR, "csv"), users=args.users)
+    from app.services import load_data
+    load_data.CSV_FOLDER = os.path.join(WORK_DIR, "csv")
+    load_data.load_csv_to_sql()
+
+    from app.main import app
+    from app.controllers.chat_controller import get_chatbot
+    chatbot = get_chatbot()
+    from app.services.storage import get_backend
+    llm = FakeLLM(args.llm_latency_ms)
+    chatbot.llm = llm
+    chatbot.context_builder.llm = llm
+    db_counter = count_backend_calls(get_backend())
+
+    conversations = build_conversations(os.path.join(WORK_DIR, "csv"), args.conversations)
+    latencies, by_scenario, errors = [], {}, 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def replay(client, index, scenario, messages):
+        nonlocal errors
+        async with semaphore:
+            conversation_id = f"load-{index}"
+            for message in messages:
+                started = time.perf_counter()
+                response = await client.post("/api/chat", json={
+                    "user_id": index, "message": message, "conversation_id": conversation_id,
+                })
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    errors += 1
+                latencies.append(elapsed)
+                by_scenario.setdefault(scenario, []).append(elapsed)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+            db_counter["calls"] = llm.calls = 0
+            started = time.perf_counter()
+            await asyncio.gather(*(replay(client, i, s, m) for i, (s, m) in enumerate(conversations)))
+            duration = time.perf_counter() - started
+
+    turns = len(latencies)
+    latencies.sort()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "conversations": args.conversations,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "users": args.users,
+            "synthesized_csvs": synthesized,
+        },
+        "turns": turns,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(turns / duration, 2) if duration else 0,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 2) if latencies else 0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0,
+        },
+        "db_round_trips_per_turn": round(db_counter["calls"] / turns, 2) if turns else 0,
+        "llm_calls_per_turn": round(llm.calls / turns, 2) if turns else 0,
+        "p95_by_scenario_ms": {s: round(percentile(sorted(v), 95), 2) for s, v in by_scenario.items()},
+    }
+
+def compare(result, baseline, max_regression):
+    """Returns the list of metrics that regressed by more than max_regression percent."""
+    checks = [
+        ("throughput_rps", result["throughput_rps"], baseline["throughput_rps"], False),
+        ("latency_ms.p95", result["latency_ms"]["p95"], baseline["latency_ms"]["p95"], True),
+        ("latency_ms.p99", result["latency_ms"]["p99"], baseline["latency_ms"]["p99"], True),
+        ("db_round_trips_per_turn", result["db_round_trips_per_turn"], baseline["db_round_trips_per_turn"], True),
+        ("llm_calls_per_turn", result["llm_calls_per_turn"], baseline["llm_calls_per_turn"], True),
+    ]
+    regressions = []
+    for name, current, previous, lower_is_better in checks:
+        if not previous:
+            continue
+        change = (current - previous) / previous * 100
+        if (change if lower_is_better else -change) > max_regression:
+            regressions.append(f"{name}: {previous} -> {current} ({change:+.1f}%)")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test for /api/chat")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000, help="size of the synthetic dataset")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "load_test.json"))
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
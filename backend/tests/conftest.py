@@ -0,0 +1,74 @@
+import asyncio
+import os
+import tempfile
+
+# The app reads its configuration at import time: point it at a throwaway SQLite
+# database and a fake Gemini key before anything from app/ is imported
+os.environ["STORAGE_BACKEND"] = "sql"
+os.environ["SQL_DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='think41_tests_'), 'app.db')}"
+os.environ.setdefault("GOOGLE_API_KEY", "tests")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("SNAPSHOT_REFRESH_S", "0")
+
+import pytest
+from app.controllers.conversation_context import clear_history_cache
+from app.services import storage
+from app.services.storage.sql_backend import SqlBackend
+from app.tools.tool_cache import invalidate_collection
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """Replies with `reply(prompt)` (a fixed greeting by default) and records the prompts."""
+
+    def __init__(self, reply=None):
+        self.reply = reply or (lambda prompt: "Hi, I'm Think41's assistant.")
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return FakeResponse(self.reply(prompt))
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+    async def astream(self, prompt):
+        self.prompts.append(prompt)
+        for word in self.reply(prompt).split(" "):
+            yield FakeResponse(word + " ")
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    invalidate_collection()
+    clear_history_cache()
+    yield
+    invalidate_collection()
+    clear_history_cache()
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """A fresh SQL backend on its own SQLite file, used by get_backend()."""
+    sql = SqlBackend(f"sqlite:///{tmp_path / 'test.db'}")
+    sql.ensure_schema()
+    monkeypatch.setattr(storage, "_backend", sql)
+    yield sql
+    sql.close()
+
+
+@pytest.fixture
+def chatbot(backend, monkeypatch):
+    from app.controllers import chat_controller
+    bot = chat_controller.Think41ChatBot()
+    bot.llm = bot.context_builder.llm = FakeLLM()
+    monkeypatch.setattr(chat_controller, "_chatbot", bot)
+    return bot
+
+
+def run(coro):
+    return asyncio.run(coro)
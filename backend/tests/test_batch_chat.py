@@ -0,0 +1,74 @@
+from datetime import datetime
+import httpx
+import mongomock
+from app.main import app
+from app.services.storage.mongo_backend import first_per_value_pipeline
+from app.tools import async_db_tools
+from app.tools.projections import mongo_projection
+from app.tools.tool_cache import tool_cache
+from conftest import run
+
+ITEMS = [
+    {"id": 3, "product_id": 10, "product_name": "Tee", "cost": 5.0},
+    {"id": 1, "product_id": 10, "product_name": "Tee", "cost": 4.0},
+    {"id": 2, "product_id": 11, "product_name": "Cap", "cost": 3.0},
+    {"id": 4, "product_id": 11, "product_name": "Cap", "cost": 3.5},
+]
+
+
+def seed(backend):
+    backend.load_records("orders", [[{
+        "order_id": 12345, "user_id": 77, "status": "Shipped", "num_of_item": 1,
+        "created_at": datetime(2023, 5, 1, 10, 0),
+    }]])
+    backend.load_records("inventory_items", [[dict(item) for item in ITEMS]])
+
+
+async def post_batch(messages):
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/chat/batch", json={"requests": [
+                {"user_id": 77, "conversation_id": f"b{index}", "message": message}
+                for index, message in enumerate(messages)
+            ]})
+            return response.json()["responses"]
+
+
+def test_batch_items_report_tool_failures(backend, chatbot):
+    seed(backend)
+    responses = run(post_batch([
+        "What is the status of order id 12345?",
+        "What is the status of order id 99999?",
+        "What is the status of order id abc-1?",
+    ]))
+    assert responses[0] == {"conversation_id": "b0", "response": "Order 12345 status: Shipped.", "error": None}
+    assert responses[1]["error"].startswith("No data found for query_order_by_id")
+    assert responses[2]["error"].startswith("Error calling tool query_order_by_id")
+    # The user still gets the failure message as the reply
+    assert responses[1]["response"] == responses[1]["error"]
+
+
+def test_find_many_first_returns_one_record_per_value(backend):
+    found = backend.find_many("inventory_items", "product_id", [10, 11, 12], first=True)
+    assert found == []
+    seed(backend)
+    found = backend.find_many("inventory_items", "product_id", [10, 11, 12], first=True)
+    assert sorted((item["product_id"], item["id"]) for item in found) == [(10, 1), (11, 2)]
+    assert len(backend.find_many("inventory_items", "product_id", [10, 11])) == 4
+
+
+def test_first_per_value_pipeline():
+    collection = mongomock.MongoClient().db.inventory_items
+    collection.insert_many([dict(item) for item in sorted(ITEMS, key=lambda item: item["id"])])
+    found = list(collection.aggregate(first_per_value_pipeline("product_id", [10, 11], mongo_projection("inventory_items"))))
+    assert sorted((item["product_id"], item["id"]) for item in found) == [(10, 1), (11, 2)]
+    assert all("_id" not in item for item in found)
+
+
+def test_prefetch_caches_the_first_inventory_item_per_product(backend):
+    seed(backend)
+    fetched = run(async_db_tools.prefetch("query_inventory_by_product_id", ["10", "11", "12", "x"]))
+    assert fetched == 3
+    key = ("inventory_items", "query_inventory_by_product_id", ("10",))
+    assert tool_cache.get(key)["id"] == backend.query_inventory_by_product_id(10)["id"] == 1
+    assert tool_cache.get(("inventory_items", "query_inventory_by_product_id", ("12",))) is None
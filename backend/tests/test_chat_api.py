@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+import httpx
+from app.main import app
+from conftest import FakeResponse, run
+
+
+def seed_order(backend, order_id=12345, user_id=77, status="Shipped"):
+    backend.load_records("orders", [[{
+        "order_id": order_id, "user_id": user_id, "status": status, "num_of_item": 1,
+        "created_at": datetime(2023, 5, 1, 10, 0),
+    }]])
+
+
+async def post_chat(payloads):
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return [await client.post("/api/chat", json=payload) for payload in payloads]
+
+
+def test_order_status_is_answered_from_context_without_the_llm(backend, chatbot):
+    seed_order(backend)
+    responses = run(post_chat([
+        {"user_id": 77, "conversation_id": "c1", "message": "What is the status of order id 12345?"},
+    ]))
+    assert responses[0].status_code == 200
+    assert responses[0].json() == {"response": "Order 12345 status: Shipped."}
+    assert chatbot.llm.prompts == []
+
+
+def test_turns_are_stored_and_feed_the_next_prompt(backend, chatbot):
+    responses = run(post_chat([
+        {"user_id": 77, "conversation_id": "c2", "message": "Hello there"},
+        {"user_id": 77, "conversation_id": "c2", "message": "Anything new?"},
+    ]))
+    assert [r.status_code for r in responses] == [200, 200]
+    conversation = backend.get_conversation(77, "c2", 50)
+    assert [m["sender"] for m in conversation["messages"]] == ["user", "bot", "user", "bot"]
+    assert "User: Hello there" in chatbot.llm.prompts[-1]
+
+
+def test_stalled_llm_stream_ends_with_a_timeout_event(backend, chatbot, monkeypatch):
+    from app.services.llm_scheduler import llm_scheduler
+
+    async def stalled(prompt):
+        yield FakeResponse("Let me ")
+        await asyncio.sleep(60)
+
+    chatbot.llm.astream = stalled
+    monkeypatch.setattr(llm_scheduler, "timeout", 0.1)
+
+    async def stream():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post("/api/chat/stream", json={"user_id": 77, "conversation_id": "c3", "message": "Hello"})
+                return response.text
+
+    body = run(stream())
+    assert '"token": "Let me "' in body
+    assert "event: error" in body and '"status": 504' in body
+    assert llm_scheduler._active == 0
@@ -0,0 +1,57 @@
+from app.controllers import context_builder as context_builder_module
+from app.controllers.context_builder import ContextBuilder
+from app.controllers.conversation_context import ConversationContext
+from app.utils.entity_extractor import EntityExtractor
+from conftest import FakeLLM, run
+
+
+def conversation(count, user_id=77, conversation_id="c1"):
+    lines = [f"{'User' if i % 2 == 0 else 'Bot'}: message number {i} padded to about twenty tokens of text\n"
+             for i in range(count)]
+    return ConversationContext(user_id, conversation_id, lines, count)
+
+
+def test_history_keeps_the_newest_messages_within_the_budget():
+    builder = ContextBuilder(FakeLLM(), EntityExtractor(), budget=60)
+    ctx = conversation(10)
+    history = builder.history_for(ctx)
+    assert history.endswith(ctx.lines[-1])
+    assert ctx.lines[-4] in history and ctx.lines[-5] not in history
+    assert builder.first_verbatim_index(ctx) == 6
+
+
+def test_newest_message_is_kept_even_over_budget():
+    builder = ContextBuilder(FakeLLM(), EntityExtractor(), budget=1)
+    ctx = conversation(3)
+    assert builder.history_for(ctx) == ctx.lines[-1]
+
+
+def test_header_carries_the_summary_and_known_details():
+    builder = ContextBuilder(FakeLLM(), EntityExtractor(), budget=60)
+    ctx = conversation(10)
+    ctx.lines[0] = "User: my order id 12345 is late\n"
+    ctx.summary, ctx.summary_upto = "The user asked about a late order.", 4
+    history = builder.history_for(ctx)
+    assert history.startswith("Summary of earlier conversation: The user asked about a late order.\n")
+    assert "Known details: order id: 12345\n" in history
+
+
+def test_summary_is_folded_in_once_enough_messages_fall_out_of_the_window(backend, monkeypatch):
+    monkeypatch.setattr(context_builder_module, "SUMMARY_BATCH_SIZE", 4)
+    llm = FakeLLM(lambda prompt: "User 77 asked about order 12345.")
+    builder = ContextBuilder(llm, EntityExtractor(), budget=60)
+    ctx = ConversationContext.load(77, "c1")
+    for i in range(4):
+        ctx.add_message("user" if i % 2 == 0 else "bot", f"message {i} " + "padding " * 30)
+    assert not builder.needs_summary(ctx)
+    for i in range(4, 8):
+        ctx.add_message("user" if i % 2 == 0 else "bot", f"message {i} " + "padding " * 30)
+    assert builder.needs_summary(ctx)
+
+    run(builder.update_summary_async(ctx))
+    upto = builder.first_verbatim_index(ctx)
+    assert (ctx.summary, ctx.summary_upto) == ("User 77 asked about order 12345.", upto)
+    assert "message 0" in llm.prompts[-1] and f"message {upto}" not in llm.prompts[-1]
+    stored = backend.get_conversation(77, "c1", 50)
+    assert (stored["summary"], stored["summary_upto"]) == (ctx.summary, upto)
+    assert not builder.needs_summary(ctx)
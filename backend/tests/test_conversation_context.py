@@ -0,0 +1,38 @@
+from app.controllers import conversation_controller
+from app.controllers.conversation_context import ConversationContext, clear_history_cache
+from app.services.message_writer import MessageWriteBehind
+from conftest import run
+
+
+def test_history_is_cached_between_turns(backend):
+    ctx = ConversationContext.load(77, "c1")
+    ctx.add_message("user", "Hello")
+    ctx.add_message("bot", "Hi!")
+    # Messages stored by another worker are fetched on top of the cached lines
+    backend.push_messages(77, "c1", [{"sender": "user", "text": "Order id 12345?"}])
+    reloaded = ConversationContext.load(77, "c1")
+    assert reloaded.message_count == 3
+    assert reloaded.history == "User: Hello\nBot: Hi!\nUser: Order id 12345?\n"
+
+
+def test_reload_keeps_a_new_conversation_whose_messages_are_still_queued(backend, monkeypatch):
+    writer = MessageWriteBehind(backend.push_message_batches_async, flush_interval=60)
+    monkeypatch.setattr(conversation_controller, "message_writer", writer)
+
+    async def scenario():
+        writer.start()
+        ctx = await ConversationContext.load_async(77, "new")
+        await ctx.add_message_async("user", "Hello")
+        await ctx.add_message_async("bot", "Hi!")
+        # Nothing is stored yet, the reload comes from the history cache
+        assert await backend.get_conversation_async(77, "new", 50) is None
+        reloaded = await ConversationContext.load_async(77, "new")
+        await writer.stop()
+        return reloaded
+
+    reloaded = run(scenario())
+    assert reloaded.message_count == 2
+    assert reloaded.history == "User: Hello\nBot: Hi!\n"
+    clear_history_cache()
+    stored = ConversationContext.load(77, "new")
+    assert (stored.message_count, stored.history) == (2, "User: Hello\nBot: Hi!\n")
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+import pytest
+from app.utils import entity_extractor
+from app.utils.entity_extractor import EntityExtractor, route, scan
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("What is the status of order id 12345?", ("query_order_by_id", ["12345"])),
+    ("Show the order items for order id 555 and user id 777", ("query_order_items", ["555", "777"])),
+    ("What's in my order 98765?", ("query_order_summary", ["98765"])),
+    ("How many units of product id 4321 are in stock?", ("query_product_stock", ["4321"])),
+    ("What is the average cost of product id 4321?", ("query_product_average_cost", ["4321"])),
+    ("Tell me about product name 'Classic Tee'", ("query_product_by_name", ["Classic Tee"])),
+    ("Find the user with email jane.doe@example.com", ("query_user_by_email", ["jane.doe@example.com"])),
+    ("inventory for product id 1234", ("query_inventory_by_product_id", ["1234"])),
+    ("Where is distribution center id 101?", ("query_distribution_center", ["101"])),
+    ("user id 123 placed order id 456", ("query_order_by_id", ["456"])),
+    ("hello there", (None, [])),
+])
+def test_route(message, expected):
+    assert route(scan(message)) == expected
+
+
+def test_order_items_mention_also_provides_order_and_user_ids():
+    entities = scan("Show the order items for order id 555 and user id 777")
+    assert entities["order_id"] == "555"
+    assert entities["user_id"] == "777"
+
+
+def test_stopwords_are_not_entities():
+    assert "order_id" not in scan("what is the order id status")
+
+
+def test_earlier_values_win():
+    entities = scan("order id 111")
+    scan("order id 222", entities)
+    assert entities["order_id"] == "111"
+
+
+def conversation(lines):
+    return SimpleNamespace(key=("u1", "c1"), user_id="u1", conversation_id="c1",
+                           lines=list(lines), message_count=len(lines))
+
+
+def test_extractor_only_scans_messages_added_since_the_previous_turn(monkeypatch):
+    extractor = EntityExtractor()
+    ctx = conversation(["user: my order id 12345"])
+    assert extractor.extract(ctx, "what's its status?") == ("query_order_by_id", ["12345"])
+
+    scanned = []
+    real_scan = entity_extractor.scan
+    monkeypatch.setattr(entity_extractor, "scan", lambda text, entities=None: scanned.append(text) or real_scan(text, entities))
+    ctx.lines.append("assistant: it shipped")
+    ctx.message_count += 1
+    assert extractor.extract(ctx, "thanks") == ("query_order_by_id", ["12345"])
+    assert scanned == ["assistant: it shipped", "thanks"]
+
+
+def test_extractor_rescans_when_the_history_was_trimmed():
+    extractor = EntityExtractor()
+    ctx = conversation(["user: order id 12345"])
+    extractor.extract(ctx, "hi")
+    # More messages were added than the context holds: the cached entities cannot be
+    # extended, so the visible history is scanned again from scratch
+    ctx.lines = ["user: product id 4321"]
+    ctx.message_count = 10
+    assert extractor.extract(ctx, "hi") == ("query_inventory_by_product_id", ["4321"])
+
+
+def test_extractor_cache_is_bounded():
+    extractor = EntityExtractor(cache_size=2)
+    for conversation_id in ("c1", "c2", "c3"):
+        ctx = conversation([])
+        ctx.key = ("u1", conversation_id)
+        extractor.extract(ctx, "hi")
+    assert list(extractor._cache) == [("u1", "c2"), ("u1", "c3")]
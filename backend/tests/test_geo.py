@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from app.tools import geo
+from app.tools.geo import DistributionCenterIndex, haversine_km
+
+CENTERS = [
+    {"id": 1, "name": "Memphis TN", "latitude": 35.1174, "longitude": -89.9711},
+    {"id": 2, "name": "Chicago IL", "latitude": 41.8369, "longitude": -87.6847},
+    {"id": 3, "name": "Los Angeles CA", "latitude": 34.05, "longitude": -118.25},
+    {"id": 4, "name": "No coordinates", "latitude": None, "longitude": None},
+]
+
+
+@pytest.fixture
+def centers(backend, monkeypatch):
+    """A fresh center index over CENTERS in the test database, used by the geo tools."""
+    backend.load_records("distribution_centers", [[dict(center) for center in CENTERS]])
+    index = DistributionCenterIndex()
+    index.refresh()
+    monkeypatch.setattr(geo, "center_index", index)
+    return index
+
+
+def test_haversine_distance():
+    london, paris = np.radians([51.5074, -0.1278]), np.radians([48.8566, 2.3522])
+    assert haversine_km(london[0], london[1], paris[0], paris[1]) == pytest.approx(343.5, abs=1)
+    assert haversine_km(0.0, 0.0, 0.0, 0.0) == 0
+
+
+def test_nearest_center_and_alternatives(centers):
+    assert len(centers.centers) == 3
+    result = geo.nearest_center_result(40.7128, -74.0060)  # New York
+    assert result["distribution_center"] == "Chicago IL"
+    assert result["distance_km"] == pytest.approx(1145, abs=10)
+    assert result["distance_miles"] == pytest.approx(result["distance_km"] / geo.KM_PER_MILE, abs=0.1)
+    assert [other["distribution_center"] for other in result["alternatives"]] == ["Memphis TN", "Los Angeles CA"]
+
+
+def test_batch_assignment_matches_single_lookups(centers, backend):
+    rng = np.random.default_rng(41)
+    latitudes, longitudes = rng.uniform(25, 49, 300), rng.uniform(-124, -67, 300)
+    indexes, distances = centers.nearest_centers(latitudes, longitudes)
+    for i in range(0, 300, 37):
+        distance, center = centers.nearest(latitudes[i], longitudes[i])[0]
+        assert centers.centers[indexes[i]] == center
+        assert distances[i] == pytest.approx(distance)
+
+    backend.load_records("users", [[
+        {"id": 1, "latitude": 34.0, "longitude": -118.0},
+        {"id": 2, "latitude": 35.0, "longitude": -90.0},
+        {"id": 3, "latitude": None, "longitude": None},
+    ]])
+    batches = list(geo.assign_users(batch_size=1))
+    assert [(int(ids[0]), int(center_ids[0])) for ids, center_ids, _ in batches] == [(1, 3), (2, 1)]
+
+
+def test_refresh_counts_changed_centers(centers):
+    moved = [dict(center) for center in CENTERS[:3]]
+    moved[0]["latitude"] = 35.2
+    assert centers.apply(moved) == 2  # the old and the new version of the moved center
+    assert centers.apply(moved) == 0
@@ -0,0 +1,112 @@
+import random
+import numpy as np
+import pytest
+from app.tools.inventory import InventorySnapshot, NO_CENTER, _State
+
+
+def make_items(count=400, seed=41):
+    rng = random.Random(seed)
+    return [{
+        "id": item_id,
+        "product_id": rng.randrange(1, 40),
+        "product_distribution_center_id": rng.choice([1, 2, 3, None]),
+        "cost": round(rng.uniform(1, 50), 2),
+        "sold_at": rng.choice([None, "2023-01-01"]),
+    } for item_id in rng.sample(range(1, 10_000), count)]
+
+
+def totals(snapshot):
+    state = snapshot._state
+    return {name: getattr(state, name).tolist() for name in _State.totals}
+
+
+def rebuilt(records):
+    snapshot = InventorySnapshot()
+    snapshot.apply(records)
+    return snapshot
+
+
+def assert_same_totals(snapshot, records):
+    expected = totals(rebuilt(records))
+    found = totals(snapshot)
+    assert found["keys"] == expected["keys"]
+    for name in ("units", "stock"):
+        assert found[name] == expected[name]
+    for name in ("cost_sums", "stock_cost_sums"):
+        np.testing.assert_allclose(found[name], expected[name], atol=1e-6)
+
+
+@pytest.fixture
+def moves(monkeypatch):
+    """Counts the refreshes that adjusted the totals instead of regrouping."""
+    calls = []
+    real_move = _State.move
+    monkeypatch.setattr(_State, "move", lambda self, *args: calls.append(True) or real_move(self, *args))
+    return calls
+
+
+def test_unchanged_refresh_changes_nothing(moves):
+    records = make_items()
+    snapshot = rebuilt(records)
+    before = totals(snapshot)
+    assert snapshot.apply([dict(record) for record in reversed(records)]) == 0
+    assert totals(snapshot) == before
+    assert moves == []
+
+
+def test_incremental_refresh_matches_a_rebuild(moves):
+    records = make_items()
+    snapshot = rebuilt(records)
+    changed = [dict(record) for record in records]
+    for record in changed[:10]:
+        record["sold_at"] = None if record["sold_at"] else "2023-06-01"
+    changed[10]["cost"] += 1.5
+    assert snapshot.apply(changed) == 11
+    assert moves == [True]
+    assert_same_totals(snapshot, changed)
+
+
+def test_removed_and_added_items_are_moved(moves):
+    records = make_items()
+    snapshot = rebuilt(records)
+    existing = records[0]
+    changed = [dict(record) for record in records[5:]]
+    changed.append({**existing, "id": 20_000})
+    assert snapshot.apply(changed) == 6
+    assert moves == [True]
+    assert_same_totals(snapshot, changed)
+
+
+def test_new_product_or_large_change_regroups(moves):
+    records = make_items()
+    snapshot = rebuilt(records)
+    changed = records + [{"id": 30_000, "product_id": 999, "product_distribution_center_id": 1, "cost": 2.0, "sold_at": None}]
+    assert snapshot.apply(changed) == 1
+    assert moves == []
+    assert_same_totals(snapshot, changed)
+
+    relabelled = [{**record, "sold_at": None} for record in changed]
+    snapshot.apply(relabelled)
+    assert moves == []
+    assert_same_totals(snapshot, relabelled)
+
+
+def test_product_stock():
+    snapshot = rebuilt([
+        {"id": 1, "product_id": 7, "product_distribution_center_id": 2, "cost": 10.0, "sold_at": None},
+        {"id": 2, "product_id": 7, "product_distribution_center_id": 2, "cost": 20.0, "sold_at": "2023-01-01"},
+        {"id": 3, "product_id": 7, "product_distribution_center_id": 3, "cost": 30.0, "sold_at": None},
+        {"id": 4, "product_id": 7, "product_distribution_center_id": 3, "cost": 40.0, "sold_at": None},
+        {"id": 5, "product_id": 7, "product_distribution_center_id": None, "cost": 50.0, "sold_at": None},
+        {"id": 6, "product_id": 8, "product_distribution_center_id": 1, "cost": 5.0, "sold_at": None},
+        {"id": 7, "product_id": None, "product_distribution_center_id": 1, "cost": 5.0, "sold_at": None},
+    ])
+    stock = snapshot.product_stock(7)
+    assert (stock["in_stock"], stock["sold"], stock["units"]) == (4, 1, 5)
+    assert stock["average_cost"] == 30.0
+    assert stock["average_in_stock_cost"] == 32.5
+    # Items without a center count in the totals but are not listed
+    assert [(c["distribution_center_id"], c["in_stock"]) for c in stock["distribution_centers"]] == [(3, 2), (2, 1)]
+    assert snapshot.product_stock(9) is None
+    assert snapshot.size == 6
+    assert NO_CENTER not in [c["distribution_center_id"] for c in stock["distribution_centers"]]
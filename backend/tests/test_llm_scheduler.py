@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from app.services import llm_scheduler as scheduler_module
+from app.services.llm_scheduler import (LLMOverloaded, LLMScheduler, LLMTimeout, PRIORITY_BACKGROUND,
+                                        PRIORITY_RESPOND, PRIORITY_SUMMARIZE)
+from conftest import run
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "backoff_delay", lambda attempt: 0)
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_stream_yields_every_chunk_and_releases_the_slot():
+    scheduler = LLMScheduler(max_concurrency=1)
+
+    async def chunks():
+        for text in ("Hello", " there"):
+            yield text
+
+    assert run(collect(scheduler.stream(chunks))) == ["Hello", " there"]
+    assert scheduler._active == 0
+
+
+def test_stalled_stream_times_out_and_releases_the_slot():
+    scheduler = LLMScheduler(max_concurrency=1)
+    closed = []
+
+    async def stalled():
+        try:
+            yield "Hello"
+            await asyncio.sleep(60)
+            yield "never"
+        finally:
+            closed.append(True)
+
+    async def scenario():
+        received = []
+        with pytest.raises(LLMTimeout):
+            async for chunk in scheduler.stream(stalled, timeout=0.05):
+                received.append(chunk)
+        # The slot is free again: another call gets it straight away
+        async with scheduler.slot():
+            pass
+        return received
+
+    assert run(scenario()) == ["Hello"]
+    assert closed == [True]
+    assert scheduler._active == 0
+
+
+def test_rate_limit_before_the_first_chunk_is_retried():
+    scheduler = LLMScheduler()
+    attempts = []
+
+    async def chunks():
+        attempts.append(True)
+        if len(attempts) == 1:
+            raise RateLimited("429 resource exhausted")
+        yield "ok"
+
+    assert run(collect(scheduler.stream(chunks))) == ["ok"]
+    assert len(attempts) == 2
+
+
+def test_rate_limit_after_the_first_chunk_is_not_retried():
+    scheduler = LLMScheduler()
+    attempts = []
+
+    async def chunks():
+        attempts.append(True)
+        yield "partial"
+        raise RateLimited("429 resource exhausted")
+
+    with pytest.raises(RateLimited):
+        run(collect(scheduler.stream(chunks)))
+    assert len(attempts) == 1
+    assert scheduler._active == 0
+
+
+def test_run_times_out_and_rejects_when_the_queue_is_full():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1)
+
+    async def scenario():
+        with pytest.raises(LLMTimeout):
+            await scheduler.run(lambda: asyncio.sleep(60), timeout=0.05)
+        assert scheduler._active == 0
+        holder = asyncio.ensure_future(scheduler.run(lambda: asyncio.sleep(0.1)))
+        waiter = asyncio.ensure_future(scheduler.run(lambda: asyncio.sleep(0)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMOverloaded):
+            await scheduler.run(lambda: asyncio.sleep(0))
+        await asyncio.gather(holder, waiter)
+
+    run(scenario())
+
+
+def test_waiting_calls_get_slots_in_priority_order():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+
+    async def call(label):
+        order.append(label)
+
+    async def scenario():
+        holder = asyncio.ensure_future(scheduler.run(lambda: asyncio.sleep(0.05)))
+        await asyncio.sleep(0.01)
+        waiting = [asyncio.ensure_future(scheduler.run(lambda label=label: call(label), priority))
+                   for label, priority in (("polish", PRIORITY_BACKGROUND), ("summary", PRIORITY_SUMMARIZE),
+                                           ("reply", PRIORITY_RESPOND))]
+        await asyncio.gather(holder, *waiting)
+
+    run(scenario())
+    assert order == ["reply", "summary", "polish"]
@@ -0,0 +1,39 @@
+import pandas as pd
+from app.services import load_data
+from app.services.load_data import convert_chunk, take_unparsed
+
+
+def test_mixed_datetime_formats_in_one_chunk_are_all_parsed():
+    chunk = pd.DataFrame({
+        "id": ["1", "2", "3", "4"],
+        "product_id": ["10", "10", "11", "11"],
+        "product_distribution_center_id": ["1", "1", "2", "2"],
+        "created_at": ["2023-01-01 10:00:00+00:00", "2023-01-01 10:00:00.123456+00:00",
+                       "2023-01-02 08:30:00 UTC", "2023-01-03T09:00:00Z"],
+        "sold_at": ["2023-02-01 10:00:00.5+00:00", None, "2023-02-02 11:00:00 UTC", "2023-02-03 12:00:00+00:00"],
+    })
+    records = convert_chunk(chunk, "inventory_items")
+
+    assert [record["id"] for record in records] == [1, 2, 3, 4]
+    assert all(record["created_at"] is not None for record in records)
+    # Only the item without a sold_at is in stock
+    assert [record["sold_at"] is None for record in records] == [False, True, False, False]
+    assert records[1]["created_at"] == pd.Timestamp("2023-01-01 10:00:00.123456", tz="UTC")
+    assert records[2]["sold_at"] == pd.Timestamp("2023-02-02 11:00:00", tz="UTC")
+    assert take_unparsed("inventory_items") == 0
+
+
+def test_unparseable_datetimes_are_counted_and_stored_as_null():
+    chunk = pd.DataFrame({
+        "order_id": ["1", "2"],
+        "user_id": ["5", "5"],
+        "num_of_item": ["1", "2"],
+        "created_at": ["2023-01-01 10:00:00+00:00", "not a date"],
+    })
+    records = convert_chunk(chunk, "orders")
+
+    assert records[0]["created_at"] == pd.Timestamp("2023-01-01 10:00:00", tz="UTC")
+    assert records[1]["created_at"] is None
+    assert load_data.UNPARSED_DATETIMES[("orders", "created_at")] == 1
+    assert take_unparsed("orders") == 1
+    assert take_unparsed("orders") == 0
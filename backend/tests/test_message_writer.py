@@ -0,0 +1,123 @@
+import asyncio
+from pymongo.errors import BulkWriteError
+from app.services.message_writer import MessageWriteBehind
+from conftest import run
+
+
+class Store:
+    """write_batches double: records each flush, failing while `down` is set."""
+
+    def __init__(self):
+        self.flushes = []
+        self.attempts = 0
+        self.down = False
+
+    async def write_batches(self, batches):
+        self.attempts += 1
+        if self.down:
+            raise ConnectionError("store unavailable")
+        self.flushes.append(batches)
+
+
+def test_flush_groups_messages_per_conversation_in_arrival_order():
+    store = Store()
+    writer = MessageWriteBehind(store.write_batches)
+
+    async def scenario():
+        await writer.enqueue(1, "a", "a1")
+        await writer.enqueue(2, "b", "b1")
+        await writer.enqueue(1, "a", "a2")
+        await writer.flush()
+
+    run(scenario())
+    assert store.flushes == [[((1, "a"), ["a1", "a2"]), ((2, "b"), ["b1"])]]
+    assert writer.stats["written"] == 3
+
+
+def test_failed_flush_keeps_messages_in_order_for_the_next_one():
+    store = Store()
+    writer = MessageWriteBehind(store.write_batches)
+
+    async def scenario():
+        await writer.enqueue(1, "a", "a1")
+        store.down = True
+        await writer.flush()
+        await writer.enqueue(1, "a", "a2")
+        store.down = False
+        await writer.flush()
+
+    run(scenario())
+    assert store.flushes == [[((1, "a"), ["a1", "a2"])]]
+    assert writer.stats["failed_flushes"] == 1
+
+
+def test_backlog_is_capped_while_the_store_is_down():
+    store = Store()
+    writer = MessageWriteBehind(store.write_batches, flush_interval=60, max_pending=3)
+
+    async def scenario():
+        store.down = True
+        for i in range(10):
+            await writer.enqueue(1, "a", i)
+        return [message for _, _, message in writer._pending]
+
+    assert run(scenario()) == [7, 8, 9]
+    assert writer.stats["dropped"] == 7
+    # The first inline flush failed; later enqueues wait for the backoff instead of
+    # hammering the store with another failing flush each
+    assert store.attempts == 1
+
+
+def test_background_flushes_back_off_after_a_failure():
+    store = Store()
+    writer = MessageWriteBehind(store.write_batches, flush_interval=0.01, max_backoff=0.08)
+
+    async def scenario():
+        store.down = True
+        await writer.enqueue(1, "a", "a1")
+        writer.start()
+        await asyncio.sleep(0.2)
+        attempts_while_down = store.attempts
+        store.down = False
+        await asyncio.sleep(0.15)
+        await writer.stop()
+        return attempts_while_down
+
+    attempts_while_down = run(scenario())
+    # Without backoff the 10 ms loop would have retried ~20 times
+    assert 2 <= attempts_while_down <= 6
+    assert store.flushes == [[((1, "a"), ["a1"])]]
+    assert writer._backoff == 0
+
+
+def test_partly_applied_bulk_write_only_retries_the_failed_conversations():
+    stored = {}
+    broken = {(2, "b")}
+
+    async def write_batches(batches):
+        # Like an unordered bulk_write: every update but the failing ones is applied
+        errors = []
+        for index, (key, messages) in enumerate(batches):
+            if key in broken:
+                errors.append({"index": index, "code": 2, "errmsg": "cannot push"})
+            else:
+                stored.setdefault(key, []).extend(messages)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": 0,
+                                  "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []})
+
+    writer = MessageWriteBehind(write_batches)
+
+    async def scenario():
+        for user_id, conversation_id, message in ((1, "a", "a1"), (2, "b", "b1"), (3, "c", "c1"), (2, "b", "b2")):
+            await writer.enqueue(user_id, conversation_id, message)
+        await writer.flush()
+        assert [message for _, _, message in writer._pending] == ["b1", "b2"]
+        broken.clear()
+        await writer.enqueue(1, "a", "a2")
+        await writer.flush()
+
+    run(scenario())
+    assert stored == {(1, "a"): ["a1", "a2"], (2, "b"): ["b1", "b2"], (3, "c"): ["c1"]}
+    assert writer.stats["written"] == 5
+    assert writer.stats["failed_flushes"] == 1
@@ -0,0 +1,26 @@
+import httpx
+from app.main import app
+from app.utils.metrics import Counter, REQUEST_SECONDS
+from conftest import run
+
+
+def test_request_durations_are_labelled_by_route(backend, chatbot, monkeypatch):
+    monkeypatch.setattr(REQUEST_SECONDS, "_values", {})
+
+    async def scenario():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                for path in ("/wp-login.php", "/api/nothing/123", '/a"b\\c', "/ready"):
+                    await client.get(path)
+                return (await client.get("/metrics")).text
+
+    text = run(scenario())
+    paths = {dict(key)["path"] for key in REQUEST_SECONDS._values}
+    assert paths == {"unmatched", "/ready", "/metrics"}
+    assert "wp-login" not in text and "/api/nothing/123" not in text
+
+
+def test_label_values_are_escaped():
+    counter = Counter("test_total", "Test")
+    counter.inc(tool='say "hi"\\now\n')
+    assert counter.render()[-1] == 'test_total{tool="say \\"hi\\"\\\\now\\n"} 1'
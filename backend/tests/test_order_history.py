@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from app.services.storage.mongo_backend import MongoBackend
+from app.tools import db_tools
+from app.tools.order_history import order_page, parse_before, parse_options
+
+START = datetime(2023, 5, 1, 10, 0)
+# Two timestamps shared by several orders, so ties fall on page boundaries, and
+# orders without a created_at
+CREATED = {1: START, 2: START, 3: START, 4: START + timedelta(hours=1), 5: START + timedelta(hours=1),
+           6: START - timedelta(days=1), 7: None, 8: None, 9: None}
+EXPECTED = [5, 4, 3, 2, 1, 6, 9, 8, 7]
+
+
+def orders():
+    return [{"order_id": order_id, "user_id": 5, "status": "Shipped", "num_of_item": 1, "created_at": created_at}
+            for order_id, created_at in CREATED.items()]
+
+
+def all_pages(fetch, limit):
+    """Follow next_before from the first page to the last; returns the order ids of every page."""
+    pages, before = [], None
+    while True:
+        page = order_page(5, fetch(limit + 1, before), limit)
+        pages.append([order["order_id"] for order in page["orders"]])
+        if "next_before" not in page:
+            return pages
+        before = parse_before(page["next_before"])
+
+
+@pytest.fixture
+def mongo():
+    backend = MongoBackend.__new__(MongoBackend)
+    backend.db = mongomock.MongoClient().think41
+    backend.db.orders.insert_many(orders())
+    return backend
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4])
+def test_sql_pages_reach_every_order_once(backend, limit):
+    backend.load_records("orders", [orders()])
+    pages = all_pages(lambda size, before: backend.query_orders_by_user_id(5, size, before), limit)
+    assert [order_id for page in pages for order_id in page] == EXPECTED
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4])
+def test_mongo_pages_reach_every_order_once(mongo, limit):
+    pages = all_pages(lambda size, before: mongo.query_orders_by_user_id(5, size, before), limit)
+    assert [order_id for page in pages for order_id in page] == EXPECTED
+
+
+def test_next_before_encodes_the_last_order(backend):
+    backend.load_records("orders", [orders()])
+    first = db_tools.query_orders_by_user_id("5", "limit=2")
+    assert first["next_before"] == "2023-05-01 11:00:00,4"
+    second = db_tools.query_orders_by_user_id("5", "limit=5", f"before={first['next_before']}")
+    assert [order["order_id"] for order in second["orders"]] == [3, 2, 1, 6, 9]
+    assert second["next_before"] == ",9"
+    last = db_tools.query_orders_by_user_id("5", "limit=5", f"before={second['next_before']}")
+    assert [order["order_id"] for order in last["orders"]] == [8, 7]
+    assert "next_before" not in last
+
+
+def test_a_plain_datetime_lists_orders_created_before_it(backend):
+    backend.load_records("orders", [orders()])
+    page = db_tools.query_orders_by_user_id("5", "before=2023-05-01T10:00:00Z")
+    assert [order["order_id"] for order in page["orders"]] == [6]
+
+
+def test_parse_before():
+    assert parse_before("2023-05-01 10:00:00,12") == (START, 12)
+    assert parse_before("2023-05-01T12:00:00+02:00") == (START, None)
+    assert parse_before(" ,12 ") == (None, 12)
+    with pytest.raises(ValueError):
+        parse_before(",")
+    assert parse_options(["summary"]) == (True, 10, None)
+    assert parse_options(["limit=500", "before=,3"]) == (False, 50, (None, 3))
+
+
+def test_next_before_survives_the_tool_call_syntax(chatbot):
+    tool_name, params = chatbot.parse_tool_call("TOOL_CALL: query_orders_by_user_id 5 | limit=2 | before=2023-05-01 10:00:00,3")
+    assert tool_name == "query_orders_by_user_id"
+    assert parse_options(params[1:]) == (False, 2, (START, 3))
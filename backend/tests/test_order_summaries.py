@@ -0,0 +1,74 @@
+from datetime import datetime
+import mongomock
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from app.services.storage import mongo_backend
+from app.services.storage.mongo_backend import MongoBackend
+from conftest import run
+
+ORDER = {"order_id": 1, "user_id": 5, "status": "Shipped", "num_of_item": 2, "created_at": datetime(2023, 5, 1)}
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """A MongoBackend on mongomock, whose builds on read are recorded instead of run ($merge is not supported)."""
+    backend = MongoBackend.__new__(MongoBackend)
+    backend.db = mongomock.MongoClient().think41
+    client = AsyncMongoMockClient()
+    backend.async_db = client.think41
+    built = []
+
+    def build(order_ids, db=None):
+        built.append(sorted(order_ids))
+        backend.db.order_summaries.insert_many([{"order_id": order_id, "items": []} for order_id in order_ids])
+
+    monkeypatch.setattr(mongo_backend, "build_order_summaries", build)
+    backend.built = built
+    return backend
+
+
+def test_missing_summary_of_an_existing_order_is_built_on_read(mongo):
+    mongo.db.orders.insert_one(dict(ORDER))
+    assert mongo.query_order_summary(1) == {"order_id": 1, "items": []}
+    assert mongo.built == [[1]]
+    # Now in the read model: no second build
+    mongo.query_order_summary(1)
+    assert mongo.built == [[1]]
+
+
+def test_unknown_order_ids_are_not_built(mongo):
+    mongo.db.orders.insert_one(dict(ORDER))
+    assert mongo.query_order_summary(999) is None
+    found = mongo.find_many("order_summaries", "order_id", [1, 998, 999])
+    assert [doc["order_id"] for doc in found] == [1]
+    assert mongo.built == [[1]]
+
+
+def test_async_read_only_builds_existing_orders(mongo, monkeypatch):
+    pipelines = []
+    monkeypatch.setattr(mongo_backend, "summary_pipeline",
+                        lambda order_ids, refreshed_at: pipelines.append(sorted(order_ids)) or [{"$match": {"order_id": -1}}])
+    assert run(mongo.query_order_summary_async(999)) is None
+    assert pipelines == []
+    run(mongo.async_db.orders.insert_one(dict(ORDER)))
+    run(mongo.find_many_async("order_summaries", "order_id", [1, 999]))
+    assert pipelines == [[1]]
+
+
+def test_sql_summary_joins_items_products_and_centers(backend):
+    backend.load_records("distribution_centers", [[{"id": 7, "name": "Memphis TN", "latitude": 35.1, "longitude": -90.0}]])
+    backend.load_records("products", [[{"id": 20, "name": "Classic Tee", "brand": "Think", "category": "Tops",
+                                        "department": "Men", "retail_price": 25.0, "distribution_center_id": 7}]])
+    backend.load_records("orders", [[dict(ORDER)]])
+    backend.load_records("order_items", [[
+        {"id": 101, "order_id": 1, "user_id": 5, "product_id": 20, "status": "Shipped"},
+        {"id": 102, "order_id": 1, "user_id": 5, "product_id": 20, "status": "Shipped"},
+    ]])
+
+    summary = backend.query_order_summary(1)
+    assert summary["status"] == "Shipped"
+    assert [item["id"] for item in summary["items"]] == [101, 102]
+    assert summary["items"][0]["product_name"] == "Classic Tee"
+    assert summary["items"][0]["distribution_center"] == "Memphis TN"
+    assert summary["total"] == 50.0
+    assert backend.query_order_summary(999) is None
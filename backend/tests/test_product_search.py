@@ -0,0 +1,51 @@
+from app.tools.product_search import ProductSearchIndex, parse_filters
+
+PRODUCTS = [
+    {"id": 1, "name": "Classic Cotton Crew Tee", "brand": "Think", "category": "Tops", "department": "Men"},
+    {"id": 2, "name": "Classic Cotton Crew Tee", "brand": "Other", "category": "Tops", "department": "Women"},
+    {"id": 3, "name": "Slim Fit Denim Jeans", "brand": "Think", "category": "Jeans", "department": "Men"},
+    {"id": 4, "name": "Wool Blend Winter Coat", "brand": "North", "category": "Outerwear", "department": "Women"},
+    {"id": 5, "name": "Running Shorts", "brand": "Sprint", "category": "Active", "department": "Men"},
+]
+
+
+def built(products=PRODUCTS):
+    index = ProductSearchIndex()
+    index.apply([dict(product) for product in products])
+    return index
+
+
+def ids(results):
+    return [product["id"] for _, product in results]
+
+
+def test_exact_typo_and_partial_names_find_the_product():
+    index = built()
+    assert index.best("Slim Fit Denim Jeans")["id"] == 3
+    assert index.best("slim fit demin jeans")["id"] == 3
+    assert index.best("winter coat")["id"] == 4
+    assert index.best("garden hose") is None
+
+
+def test_search_ranks_and_filters():
+    index = built()
+    results = index.search("cotton crew tee")
+    # Equal scores keep load order
+    assert ids(results)[:2] == [1, 2]
+    assert results[0][0] >= results[-1][0]
+    assert ids(index.search("cotton crew tee", department="Women")) == [2]
+    assert index.search("cotton crew tee", brand="Nobody") == []
+    assert parse_filters(["brand=Think", "color=red", "department= "]) == {"brand": "Think"}
+
+
+def test_refresh_patches_changed_and_removed_products():
+    index = built()
+    changed = [dict(product) for product in PRODUCTS if product["id"] != 5]
+    changed[2] = {**changed[2], "name": "Relaxed Denim Jeans"}
+    assert index.apply(changed) == 2
+    assert index.size == 4
+    assert index.best("running shorts") is None
+    assert index.best("relaxed denim jeans")["id"] == 3
+    assert index.best("slim fit denim jeans")["id"] == 3  # still the closest name
+    assert ids(index.search("relaxed denim jeans")) == ids(built(changed).search("relaxed denim jeans"))
+    assert index.apply(changed) == 0
@@ -0,0 +1,34 @@
+from datetime import datetime
+from app.tools import db_tools
+from app.tools.projections import compact, mongo_projection
+
+USER = {"id": 5, "first_name": "Jane", "last_name": "Doe", "email": "jane@example.com", "age": 30,
+        "street_address": "1 Main St", "postal_code": "12345", "city": "Austin", "state": "TX",
+        "country": "United States", "latitude": 30.2, "longitude": -97.7, "traffic_source": "Search"}
+
+
+def test_lookups_only_return_the_projected_fields(backend):
+    backend.load_records("users", [[dict(USER)]])
+    user = db_tools.query_user_by_email("jane@example.com")
+    assert user["first_name"] == "Jane"
+    assert not {"street_address", "postal_code", "latitude", "longitude", "traffic_source"} & set(user)
+    assert mongo_projection("users")["_id"] == 0
+
+
+def test_compact_keeps_prompt_fields_and_drops_empty_values():
+    order = {"_id": "x", "order_id": 1, "user_id": 5, "status": "Shipped", "num_of_item": 2,
+             "created_at": datetime(2023, 5, 1, 10, 0, 30), "shipped_at": None, "returned_at": ""}
+    assert compact(order, "orders") == "order_id=1; status=Shipped; num_of_item=2; created_at=2023-05-01 10:00"
+
+
+def test_compact_cuts_long_lists_and_nested_items():
+    rows = [{"order_id": i, "status": "Complete"} for i in range(25)]
+    lines = compact(rows, "orders", max_rows=3).splitlines()
+    assert lines == ["order_id=0; status=Complete", "order_id=1; status=Complete",
+                     "order_id=2; status=Complete", "... and 22 more"]
+
+    summary = {"order_id": 1, "status": "Shipped", "total": 49.5, "items": [
+        {"product_name": "Tee", "brand": "Think", "retail_price": 24.75, "sku": "X1", "status": "Shipped"},
+    ]}
+    assert compact(summary, "order_summaries") == (
+        "order_id=1; status=Shipped; total=49.5; items=[product_name=Tee; brand=Think; retail_price=24.75; status=Shipped]")
@@ -0,0 +1,32 @@
+from app.controllers.conversation_context import ConversationContext
+from conftest import run
+
+USER = {"id": 5, "first_name": "Jane", "last_name": "Doe", "email": "jane@example.com", "age": 30}
+
+
+def seed_user(backend):
+    backend.load_records("users", [[dict(USER)]])
+
+
+def test_sync_path_answers_template_polish_tools_in_template_mode(backend, chatbot):
+    seed_user(backend)
+    ctx = ConversationContext.load(5, "c1")
+    reply = chatbot.handle_tool_call("query_user_by_email", ["jane@example.com"], ctx=ctx)
+
+    assert "Jane" in reply
+    assert ctx.pending_polish is None
+    stats = chatbot.response_stats
+    assert (stats["template"], stats["template_polish"]) == (1, 0)
+    assert (stats["llm_calls_saved"], stats["llm_calls_deferred"]) == (1, 0)
+    assert chatbot.llm.prompts == []
+
+
+def test_async_path_defers_the_polish(backend, chatbot):
+    seed_user(backend)
+    ctx = ConversationContext.load(5, "c1")
+    reply = run(chatbot.handle_tool_call_async("query_user_by_email", ["jane@example.com"], ctx=ctx))
+
+    assert "Jane" in reply
+    assert ctx.pending_polish[0] == "query_user_by_email"
+    stats = chatbot.response_stats
+    assert (stats["template_polish"], stats["llm_calls_deferred"], stats["llm_calls_saved"]) == (1, 1, 0)
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.utils.single_flight import SingleFlight
+from conftest import run
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(True)
+        release.wait(5)
+        return {"order_id": 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flight.in_flight() == 0:
+        time.sleep(0.001)
+    # Give the other threads time to find the call in flight
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"order_id": 1}] * 5
+    assert flight.in_flight() == 0
+
+
+def test_async_calls_share_the_result_and_the_error():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def lookup():
+        calls.append(True)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise LookupError("down")
+
+    async def scenario():
+        assert await asyncio.gather(*(flight.do_async("k", lookup) for _ in range(5))) == [42] * 5
+        errors = await asyncio.gather(*(flight.do_async("e", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(error, LookupError) for error in errors)
+        # Nothing is kept after the call: the next caller runs it again
+        await flight.do_async("k", lookup)
+
+    run(scenario())
+    assert len(calls) == 2
+    assert flight.in_flight() == 0
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight("test")
+
+    async def lookup():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do_async("k", lookup))
+        second = asyncio.ensure_future(flight.do_async("k", lookup))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert run(scenario()) == "done"
+
+
+def test_sync_errors_are_raised_and_not_kept():
+    flight = SingleFlight("test")
+
+    def failing():
+        raise LookupError("down")
+
+    with pytest.raises(LookupError):
+        flight.do("k", failing)
+    assert flight.in_flight() == 0
+    assert flight.do("k", lambda: 1) == 1
@@ -0,0 +1,35 @@
+import threading
+import httpx
+import app.main as main
+from app.main import app
+from app.services import snapshots
+from conftest import run
+
+
+def test_snapshots_build_in_the_background_after_startup(backend, chatbot, monkeypatch):
+    release, started = threading.Event(), threading.Event()
+
+    def slow_build(collection=None, build=False):
+        started.set()
+        release.wait(5)
+
+    monkeypatch.setattr(main, "refresh_snapshots", slow_build)
+    monkeypatch.setattr(main, "SNAPSHOT_WAIT_AT_STARTUP", False)
+    for snapshot in snapshots._snapshots:
+        monkeypatch.setattr(snapshot, "ready", False)
+
+    async def scenario():
+        async with app.router.lifespan_context(app):
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                    return await client.get("/ready")
+            finally:
+                release.set()
+
+    response = run(scenario())
+    # Serving while the (still blocked) build runs
+    assert started.is_set()
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["snapshots"] and not any(body["snapshots"].values())
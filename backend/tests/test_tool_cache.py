@@ -0,0 +1,94 @@
+import pytest
+from conftest import run
+from app.tools import tool_cache as tool_cache_module
+from app.tools.tool_cache import (COLLECTION_TTLS, NEGATIVE_TTL, ToolResultCache, cached_tool,
+                                  invalidate_collection, tool_cache)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test moves by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(tool_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def counted(collection, results):
+    calls = []
+
+    @cached_tool(collection)
+    def lookup(key):
+        calls.append(key)
+        return results.get(key)
+    return lookup, calls
+
+
+def test_results_are_cached_until_the_collection_ttl(clock):
+    lookup, calls = counted("orders", {1: {"order_id": 1}})
+    assert lookup(1) == {"order_id": 1}
+    clock[0] += COLLECTION_TTLS["orders"] - 1
+    assert lookup(1) == {"order_id": 1}
+    assert calls == [1]
+    clock[0] += 2
+    lookup(1)
+    assert calls == [1, 1]
+
+
+def test_not_found_results_expire_after_the_negative_ttl(clock):
+    lookup, calls = counted("products", {})
+    assert lookup(7) is None
+    clock[0] += NEGATIVE_TTL - 1
+    assert lookup(7) is None
+    assert calls == [7]
+    clock[0] += 2
+    lookup(7)
+    assert calls == [7, 7]
+    assert NEGATIVE_TTL < COLLECTION_TTLS["products"]
+
+
+def test_async_tools_share_the_cache(clock):
+    calls = []
+
+    @cached_tool("users")
+    async def lookup(key):
+        calls.append(key)
+        return {"id": key}
+
+    assert run(lookup(3)) == {"id": 3}
+    assert run(lookup(3)) == {"id": 3}
+    assert calls == [3]
+
+
+def test_invalidation_drops_the_collection_and_its_derived_results(clock):
+    orders, order_calls = counted("orders", {1: {"order_id": 1}})
+    summaries, summary_calls = counted("order_summaries", {1: {"order_id": 1, "items": []}})
+    products, product_calls = counted("products", {2: {"id": 2}})
+    for lookup, key in ((orders, 1), (summaries, 1), (products, 2)):
+        lookup(key)
+
+    invalidate_collection("orders")
+    for lookup, key in ((orders, 1), (summaries, 1), (products, 2)):
+        lookup(key)
+    assert (order_calls, summary_calls, product_calls) == ([1, 1], [1, 1], [2])
+
+    invalidate_collection()
+    products(2)
+    assert product_calls == [2, 2]
+
+
+def test_lru_eviction_is_counted(clock):
+    cache = ToolResultCache(maxsize=2)
+    for key in (1, 2, 3):
+        cache.put(("orders", "lookup", (key,)), {"order_id": key})
+    assert not cache.contains(("orders", "lookup", (1,)))
+    assert cache.contains(("orders", "lookup", (3,)))
+    assert cache.snapshot()["collections"]["orders"]["evictions"] == 1
+
+
+def test_stats_count_hits_misses_and_negative_hits(clock, monkeypatch):
+    monkeypatch.setattr(tool_cache, "stats", {})
+    lookup, _ = counted("distribution_centers", {})
+    lookup(1)
+    lookup(1)
+    stats = tool_cache.snapshot()["collections"]["distribution_centers"]
+    assert (stats["misses"], stats["hits"], stats["negative_hits"]) == (1, 1, 1)